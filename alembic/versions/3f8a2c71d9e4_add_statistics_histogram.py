@@ -0,0 +1,49 @@
+"""add statistics_histogram table
+
+Revision ID: 3f8a2c71d9e4
+Revises: 1ae68b9b0493
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f8a2c71d9e4"
+down_revision: str | Sequence[str] | None = "1ae68b9b0493"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: log-бакеты гистограмм латентности для timing-метрик."""
+    op.create_table(
+        "statistics_histogram",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("bucket_ts", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("type", sa.String(length=64), nullable=False),
+        sa.Column("subtype", sa.String(length=64), nullable=False, server_default=""),
+        sa.Column("channel_id", sa.BigInteger(), nullable=True),
+        sa.Column("le_idx", sa.SmallInteger(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # NULLS NOT DISTINCT — чтобы строки с channel_id=NULL участвовали в ON CONFLICT.
+    op.execute(
+        "CREATE UNIQUE INDEX statistics_histogram_pk ON statistics_histogram "
+        "(bucket_ts, type, subtype, channel_id, le_idx) NULLS NOT DISTINCT"
+    )
+    op.create_index(
+        "ix_statistics_histogram_type_bucket", "statistics_histogram", ["type", "bucket_ts"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_statistics_histogram_type_bucket", table_name="statistics_histogram")
+    op.execute("DROP INDEX statistics_histogram_pk")
+    op.drop_table("statistics_histogram")
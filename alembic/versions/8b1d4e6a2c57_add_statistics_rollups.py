@@ -0,0 +1,55 @@
+"""add statistics_hourly and statistics_daily rollup tables
+
+Revision ID: 8b1d4e6a2c57
+Revises: 3f8a2c71d9e4
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8b1d4e6a2c57"
+down_revision: str | Sequence[str] | None = "3f8a2c71d9e4"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+ROLLUP_TABLES = ("statistics_hourly", "statistics_daily")
+
+
+def upgrade() -> None:
+    """Upgrade schema: часовые и суточные агрегаты для длинных графиков.
+
+    Заполняются джобом ``StatisticsService.rollup`` — при первом запуске он сам
+    пересчитает всю историю из ``statistics``.
+    """
+    for table in ROLLUP_TABLES:
+        op.create_table(
+            table,
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("bucket_ts", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("type", sa.String(length=64), nullable=False),
+            sa.Column("subtype", sa.String(length=64), nullable=False, server_default=""),
+            sa.Column("channel_id", sa.BigInteger(), nullable=True),
+            sa.Column("count", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("sum_ms", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("samples", sa.Integer(), nullable=False, server_default="0"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        # NULLS NOT DISTINCT — чтобы строки с channel_id=NULL участвовали в ON CONFLICT.
+        op.execute(
+            f"CREATE UNIQUE INDEX {table}_pk ON {table} (bucket_ts, type, subtype, channel_id) NULLS NOT DISTINCT"
+        )
+        op.create_index(f"ix_{table}_type_bucket", table, ["type", "bucket_ts"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(ROLLUP_TABLES):
+        op.drop_index(f"ix_{table}_type_bucket", table_name=table)
+        op.execute(f"DROP INDEX {table}_pk")
+        op.drop_table(table)
@@ -0,0 +1,124 @@
+"""partition statistics by month on bucket_ts
+
+Revision ID: d7e3a9f15b02
+Revises: 8b1d4e6a2c57
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+from datetime import UTC, datetime
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d7e3a9f15b02"
+down_revision: str | Sequence[str] | None = "8b1d4e6a2c57"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Сколько месяцев вперёд создаём партиции сразу (дальше — джоб
+# ``StatisticsService.ensure_partitions``).
+MONTHS_AHEAD = 2
+
+
+def _add_months(dt: datetime, months: int) -> datetime:
+    month = dt.month - 1 + months
+    return dt.replace(year=dt.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def _create_partition(month_start: datetime) -> None:
+    month_end = _add_months(month_start, 1)
+    op.execute(
+        f"CREATE TABLE statistics_p{month_start:%Y_%m} PARTITION OF statistics "
+        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{month_end.isoformat()}')"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema: ``statistics`` → таблица, партиционированная по месяцам ``bucket_ts``.
+
+    Данные переносятся из старой таблицы. Уникальный индекс ``statistics_pk``
+    (для ``ON CONFLICT``) уже содержит ключ партиционирования, а первичный ключ
+    становится ``(id, bucket_ts)`` — Postgres требует ключ партиционирования в PK.
+    """
+    op.execute("ALTER TABLE statistics RENAME TO statistics_legacy")
+    op.execute("ALTER TABLE statistics_legacy RENAME CONSTRAINT statistics_pkey TO statistics_legacy_pkey")
+    op.execute("ALTER INDEX statistics_pk RENAME TO statistics_legacy_pk")
+    op.execute("ALTER INDEX ix_statistics_type_bucket RENAME TO ix_statistics_legacy_type_bucket")
+    op.execute("ALTER INDEX ix_statistics_bucket_ts RENAME TO ix_statistics_legacy_bucket_ts")
+
+    op.execute(
+        """
+        CREATE TABLE statistics (
+            id INTEGER NOT NULL DEFAULT nextval('statistics_id_seq'),
+            bucket_ts TIMESTAMP WITH TIME ZONE NOT NULL,
+            type VARCHAR(64) NOT NULL,
+            subtype VARCHAR(64) NOT NULL DEFAULT '',
+            channel_id BIGINT,
+            count INTEGER NOT NULL DEFAULT 0,
+            sum_ms BIGINT DEFAULT 0,
+            CONSTRAINT statistics_pkey PRIMARY KEY (id, bucket_ts)
+        ) PARTITION BY RANGE (bucket_ts)
+        """
+    )
+    op.execute("ALTER SEQUENCE statistics_id_seq OWNED BY statistics.id")
+    # NULLS NOT DISTINCT — чтобы строки с channel_id=NULL участвовали в ON CONFLICT.
+    op.execute(
+        "CREATE UNIQUE INDEX statistics_pk ON statistics (bucket_ts, type, subtype, channel_id) NULLS NOT DISTINCT"
+    )
+    op.create_index("ix_statistics_type_bucket", "statistics", ["type", "bucket_ts"], unique=False)
+    op.create_index("ix_statistics_bucket_ts", "statistics", ["bucket_ts"], unique=False)
+
+    first = op.get_bind().execute(sa.text("SELECT min(bucket_ts) FROM statistics_legacy")).scalar()
+    now = datetime.now(UTC)
+    month = (first or now).astimezone(UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = _add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), MONTHS_AHEAD)
+    while month <= last:
+        _create_partition(month)
+        month = _add_months(month, 1)
+    # Страховка: строки вне созданных партиций не теряются, а попадают сюда.
+    op.execute("CREATE TABLE statistics_default PARTITION OF statistics DEFAULT")
+
+    op.execute(
+        "INSERT INTO statistics (id, bucket_ts, type, subtype, channel_id, count, sum_ms) "
+        "SELECT id, bucket_ts, type, subtype, channel_id, count, sum_ms FROM statistics_legacy"
+    )
+    op.execute("DROP TABLE statistics_legacy")
+
+
+def downgrade() -> None:
+    """Downgrade schema: обратно в обычную таблицу (данные переносятся)."""
+    op.execute("ALTER TABLE statistics RENAME TO statistics_partitioned")
+    op.execute("ALTER TABLE statistics_partitioned RENAME CONSTRAINT statistics_pkey TO statistics_partitioned_pkey")
+    op.execute("ALTER INDEX statistics_pk RENAME TO statistics_partitioned_pk")
+    op.execute("ALTER INDEX ix_statistics_type_bucket RENAME TO ix_statistics_partitioned_type_bucket")
+    op.execute("ALTER INDEX ix_statistics_bucket_ts RENAME TO ix_statistics_partitioned_bucket_ts")
+    op.execute(
+        """
+        CREATE TABLE statistics (
+            id INTEGER NOT NULL DEFAULT nextval('statistics_id_seq'),
+            bucket_ts TIMESTAMP WITH TIME ZONE NOT NULL,
+            type VARCHAR(64) NOT NULL,
+            subtype VARCHAR(64) NOT NULL DEFAULT '',
+            channel_id BIGINT,
+            count INTEGER NOT NULL DEFAULT 0,
+            sum_ms BIGINT DEFAULT 0,
+            CONSTRAINT statistics_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE statistics_id_seq OWNED BY statistics.id")
+    op.execute(
+        "CREATE UNIQUE INDEX statistics_pk ON statistics (bucket_ts, type, subtype, channel_id) NULLS NOT DISTINCT"
+    )
+    op.create_index("ix_statistics_type_bucket", "statistics", ["type", "bucket_ts"], unique=False)
+    op.create_index("ix_statistics_bucket_ts", "statistics", ["bucket_ts"], unique=False)
+    op.execute(
+        "INSERT INTO statistics (id, bucket_ts, type, subtype, channel_id, count, sum_ms) "
+        "SELECT id, bucket_ts, type, subtype, channel_id, count, sum_ms FROM statistics_partitioned"
+    )
+    # Партиции удаляются вместе с родительской таблицей.
+    op.execute("DROP TABLE statistics_partitioned")
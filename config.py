@@ -1,3 +1,4 @@
+from typing import Literal
 from uuid import UUID
 
 from pydantic import AnyHttpUrl, SecretStr
@@ -67,6 +68,12 @@ class Settings(BaseSettings):
     direct_handle_messages: bool = True
     direct_sending_messages: bool = True
     direct_handle_rewards: bool = True
+    # Где хранить активных чаттерсов: "memory" — в процессе, "redis" — общий
+    # реестр для всех инстансов (in-memory остаётся как L1).
+    user_list_backend: Literal["memory", "redis"] = "memory"
+    # Рассылка SSE между инстансами через Redis pub/sub и учёт подключений в
+    # Redis — для нескольких воркеров/реплик веба. False — всё в процессе.
+    sse_distributed: bool = False
     exception_to_many_unsubscribes: int | None = 20
     slovotron_secret: UUID
     s3_url: AnyHttpUrl = "http://localhost:9000"
@@ -9,20 +9,26 @@ from services.ai import OpenAIClient
 from services.cache import Cache
 from services.eventsub_service import TwitchEventSubService
 from services.image_resizer import ImageResizer
+from services.loop_monitor import LoopMonitor
 from services.memes import MemealertsService
 from services.memes_v2 import MemealertsOAuthService, MemealertsV2Service
 from services.moderation import ModerationService
 from services.mqtt import MQTTClient
 from services.redis_state_manager import RedisStateManager, init_redis
+from services.redis_user_list_manager import RedisUserListManager
 from services.s3 import FileStorage
 from services.slovotron import SlovotronService
 from services.sse_manager import SSEManager
 from services.statistics import StatisticsService
 from services.stickers import StickersService
 from services.stickers_processor import StickerProcessor
+from services.streamer_cache import StreamerCache
+from services.tiered_state_manager import TieredStateManager
 from services.tts import TTSService
 from twitch.chat.bot import ChatBot
 from twitch.client.twitch import Twitch
+from twitch.state_manager import DEFAULT_STATE_TTL
+from twitch.user_list_manager import UserListManager
 
 
 class Container(containers.DeclarativeContainer):
@@ -44,6 +50,7 @@ class Container(containers.DeclarativeContainer):
             "routers.web.file_storage",
             "routers.security_helpers",
             "routers.sse",
+            "routers.ws.overlay",
         ]
     )
 
@@ -57,29 +64,46 @@ class Container(containers.DeclarativeContainer):
         binary=True,
         redis_url=settings.redis_url,
     )
-    state_manager = providers.Singleton(
+    statistics = providers.Singleton(
+        StatisticsService,
+        db_session_factory=db_session_factory,
+    )
+    loop_monitor = providers.Singleton(LoopMonitor, statistics=statistics)
+    redis_state_manager = providers.Singleton(
         RedisStateManager,
         # redis=redis,
-        default_ttl=24 * 60 * 60,
+        default_ttl=DEFAULT_STATE_TTL,
+    )
+    state_manager = providers.Singleton(
+        TieredStateManager,
+        backend=redis_state_manager,
+        statistics=statistics,
     )
     cache = providers.Singleton(
         Cache,
     )
-    statistics = providers.Singleton(
-        StatisticsService,
+    streamer_cache = providers.Singleton(
+        StreamerCache,
         db_session_factory=db_session_factory,
     )
     twitch = providers.Singleton(Twitch)
     mqtt = providers.Singleton(MQTTClient)
+    user_list_manager = providers.Selector(
+        providers.Object(settings.user_list_backend),
+        memory=providers.Singleton(UserListManager),
+        redis=providers.Singleton(RedisUserListManager),
+    )
     chat_bot = providers.Singleton(
         ChatBot,
         db_session_factory=db_session_factory,
         state_manager=state_manager,
         mqtt=mqtt,
         statistics=statistics,
+        streamer_cache=streamer_cache,
+        user_list_manager=user_list_manager,
     )
     ai = providers.Singleton(OpenAIClient, db_session_factory=db_session_factory, statistics=statistics)
-    sse_manager = providers.Singleton(SSEManager, statistics=statistics)
+    sse_manager = providers.Singleton(SSEManager, statistics=statistics, distributed=settings.sse_distributed)
     slovotron = providers.Singleton(
         SlovotronService, db_session_factory=db_session_factory, chat_bot=chat_bot, ssem=sse_manager
     )
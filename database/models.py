@@ -14,6 +14,7 @@ from sqlalchemy import (
     Index,
     Integer,
     Numeric,
+    SmallInteger,
     String,
     event,
     false,
@@ -405,6 +406,10 @@ class Statistics(Base):
     (см. ``statistics_pk`` с ``NULLS NOT DISTINCT`` — иначе ``channel_id=NULL``
     не схлопывался бы при ``ON CONFLICT DO UPDATE``). ``subtype`` для метрик без
     разделения хранится как пустая строка (``""``), а не NULL.
+
+    Таблица партиционирована по месяцам ``bucket_ts`` (``statistics_pYYYY_MM`` +
+    ``statistics_default``): партиции заранее создаёт
+    ``StatisticsService.ensure_partitions``, retention — ``DROP TABLE`` партиции.
     """
 
     __tablename__ = "statistics"
@@ -424,11 +429,14 @@ class Statistics(Base):
         ),
         Index("ix_statistics_type_bucket", "type", "bucket_ts"),
         Index("ix_statistics_bucket_ts", "bucket_ts"),
+        {"postgresql_partition_by": "RANGE (bucket_ts)"},
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Ключ партиционирования обязан входить в первичный ключ.
     bucket_ts: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         nullable=False,
         doc="Начало 10-минутного бакета (UTC, округлено вниз).",
     )
@@ -464,6 +472,101 @@ class Statistics(Base):
     )
 
 
+class StatisticsHistogram(Base):
+    """Гистограммы латентности timing-метрик по тем же 10-минутным бакетам.
+
+    Одна строка — один log-бакет гистограммы: ``le_idx`` — номер бакета
+    (границы см. ``HIST_BUCKETS`` в ``services/statistics.py``), ``count`` —
+    число замеров, попавших в него. Из этих строк считаются p50/p95/p99.
+    Ключ уникален так же, как в ``statistics`` (``NULLS NOT DISTINCT``).
+    """
+
+    __tablename__ = "statistics_histogram"
+    __table_args__ = (
+        Index(
+            "statistics_histogram_pk",
+            "bucket_ts",
+            "type",
+            "subtype",
+            "channel_id",
+            "le_idx",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+        Index("ix_statistics_histogram_type_bucket", "type", "bucket_ts"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    bucket_ts: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        doc="Начало 10-минутного бакета (UTC, округлено вниз).",
+    )
+    type: Mapped[str] = mapped_column(String(64), nullable=False, doc="Timing-метрика (message_processing_time, ...).")
+    subtype: Mapped[str] = mapped_column(String(64), nullable=False, default="", server_default="")
+    channel_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True, default=None)
+    le_idx: Mapped[int] = mapped_column(
+        SmallInteger,
+        nullable=False,
+        doc="Номер log-бакета: замеры в интервале (2^(i-1), 2^i] мс; последний — всё, что больше.",
+    )
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+class _StatisticsRollupColumns:
+    """Общие колонки часовых/суточных агрегатов ``statistics``.
+
+    ``count``/``sum_ms`` — суммы по исходным строкам, ``samples`` — сколько
+    исходных 10-минутных строк вошло в агрегат (для gauge-метрик среднее =
+    ``sum(count) / sum(samples)``, как ``avg(count)`` по исходной таблице).
+    """
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    bucket_ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    type: Mapped[str] = mapped_column(String(64), nullable=False)
+    subtype: Mapped[str] = mapped_column(String(64), nullable=False, default="", server_default="")
+    channel_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True, default=None)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+    sum_ms: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+    samples: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+class StatisticsHourly(_StatisticsRollupColumns, Base):
+    """Часовые агрегаты ``statistics`` (строит ``StatisticsService.rollup``)."""
+
+    __tablename__ = "statistics_hourly"
+    __table_args__ = (
+        Index(
+            "statistics_hourly_pk",
+            "bucket_ts",
+            "type",
+            "subtype",
+            "channel_id",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+        Index("ix_statistics_hourly_type_bucket", "type", "bucket_ts"),
+    )
+
+
+class StatisticsDaily(_StatisticsRollupColumns, Base):
+    """Суточные агрегаты (строятся из ``statistics_hourly``)."""
+
+    __tablename__ = "statistics_daily"
+    __table_args__ = (
+        Index(
+            "statistics_daily_pk",
+            "bucket_ts",
+            "type",
+            "subtype",
+            "channel_id",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+        Index("ix_statistics_daily_type_bucket", "type", "bucket_ts"),
+    )
+
+
 @event.listens_for(User, "after_insert")
 def create_settings(mapper, connection, target):
     connection.execute(TwitchUserSettings.__table__.insert().values(user_id=target.id))  # noqa
@@ -43,6 +43,9 @@ async def lifespan(app: "FastAPI | None" = None):
     state_manager = container.state_manager()
     cache = container.cache()
     statistics = container.statistics()
+    loop_monitor = container.loop_monitor()
+    streamer_cache = container.streamer_cache()
+    user_list_manager = container.user_list_manager()
     sse_manager = container.sse_manager()
     scheduler = container.scheduler()
     memealerts_auth = container.memealerts_auth()
@@ -52,6 +55,8 @@ async def lifespan(app: "FastAPI | None" = None):
     await state_manager.startup(redis)
     await cache.startup(redis, binary_redis)
     await statistics.startup(redis)
+    await streamer_cache.startup(redis)
+    await user_list_manager.startup(redis)
     await sse_manager.startup(redis)
     await memealerts_auth.startup(redis, statistics)
     await twitch.startup()
@@ -95,10 +100,32 @@ async def lifespan(app: "FastAPI | None" = None):
         statistics.flush_to_db,
         trigger="cron",
         minute="*/10",
-        second="0",
+        # Не ровно на границе бакета: сначала in-process буфер статистики должен
+        # успеть сбросить в Redis последние инкременты закрывшегося бакета.
+        second="5",
         id="flush_statistics",
         replace_existing=True,
     )
+    # Часовые/суточные агрегаты для длинных графиков — сразу после дампа бакетов.
+    scheduler.add_job(
+        statistics.rollup,
+        trigger="cron",
+        minute="*/10",
+        second="30",
+        id="rollup_statistics",
+        replace_existing=True,
+    )
+    # Месячные партиции statistics — заранее, на пару месяцев вперёд.
+    await statistics.ensure_partitions()
+    scheduler.add_job(
+        statistics.ensure_partitions,
+        trigger="cron",
+        hour="3",
+        minute="30",
+        second="0",
+        id="ensure_statistics_partitions",
+        replace_existing=True,
+    )
     # Суточная очистка статистики старше RETENTION_DAYS (~3 месяца).
     scheduler.add_job(
         statistics.cleanup_old_data,
@@ -133,7 +160,15 @@ async def lifespan(app: "FastAPI | None" = None):
     scheduler.start()
     print("Планировщик запущен")
 
-    async with mqtt.lifespan(), state_manager.lifespan():
+    async with (
+        loop_monitor.lifespan(),
+        mqtt.lifespan(),
+        state_manager.lifespan(),
+        streamer_cache.lifespan(),
+        user_list_manager.lifespan(),
+        statistics.lifespan(),
+        sse_manager.lifespan(),
+    ):
         yield
 
     scheduler.shutdown()
@@ -10,7 +10,18 @@ from container import Container
 from database.models import User
 from dependencies import get_db
 from routers.security_helpers import admin_auth, user_auth
-from schemas.api import AdminBalanceResponseSchema, AdminDepositRequestSchema, AdminDepositResponseSchema
+from schemas.api import (
+    AdminBalanceResponseSchema,
+    AdminDepositRequestSchema,
+    AdminDepositResponseSchema,
+    LoopMonitorResponseSchema,
+    SlowCallbackSchema,
+    StatsTopItemSchema,
+    StatsTopKind,
+    StatsTopResponseSchema,
+)
+from services.loop_monitor import LoopMonitor
+from services.statistics import StatisticsService
 from twitch.chat.bot import ChatBot
 
 router = APIRouter(prefix="/admin", tags=["Admin API"])
@@ -84,3 +95,55 @@ async def send_message(
         raise HTTPException(status_code=404, detail="User not found")
 
     await chat_bot.send_message(res, message)
+
+
+@router.get("/loop-monitor")
+@inject
+async def get_loop_monitor(
+    loop_monitor: Annotated[LoopMonitor, Depends(Provide[Container.loop_monitor])],
+    _: Annotated[None, Security(admin_auth)],
+) -> LoopMonitorResponseSchema:
+    """Лаг event loop'а и самые долгие недавние блокировки (со стеком)."""
+    return LoopMonitorResponseSchema(
+        last_lag_ms=loop_monitor.last_lag_ms,
+        max_lag_ms=loop_monitor.max_lag_ms,
+        offenders=[
+            SlowCallbackSchema(
+                task=o.task,
+                coro=o.coro,
+                started_at=o.started_at,
+                duration_ms=o.duration_ms,
+                stack=o.stack,
+            )
+            for o in loop_monitor.offenders
+        ],
+    )
+
+
+@router.get("/stats/top")
+@inject
+async def get_stats_top(
+    statistics: Annotated[StatisticsService, Depends(Provide[Container.statistics])],
+    _: Annotated[None, Security(admin_auth)],
+    kind: Annotated[
+        StatsTopKind,
+        Query(description="Чей топ: каналы, чаттеры или команды."),
+    ] = StatsTopKind.CHANNELS,
+    minutes: Annotated[
+        int,
+        Query(description="Окно в минутах (округляется до 10-минутных бакетов).", ge=1, le=24 * 60),
+    ] = 10,
+    limit: Annotated[int, Query(description="Сколько элементов вернуть.", ge=1, le=100)] = 20,
+) -> StatsTopResponseSchema:
+    """Самые «горячие» каналы/чаттеры/команды прямо сейчас (по всему сервису).
+
+    Считается потоковыми скетчами Space-Saving в памяти бота и суммируется
+    в Redis по бакетам — без запросов к таблице ``statistics``. ``count`` —
+    нижняя оценка частоты; отставание от реального времени — около секунды.
+    """
+    items = await statistics.get_top(kind, minutes=minutes, limit=limit)
+    return StatsTopResponseSchema(
+        kind=str(kind),
+        minutes=minutes,
+        items=[StatsTopItemSchema(item=item, count=count) for item, count in items],
+    )
@@ -13,6 +13,7 @@ from container import Container
 from database.models import MemealertsSettings, User
 from routers.security_helpers import user_auth
 from services.memes_v2 import MemealertsOAuthService
+from twitch.chat.bot import ChatBot
 from twitch.client.twitch import Twitch
 
 logger = logging.getLogger(__name__)
@@ -25,9 +26,11 @@ router = APIRouter(prefix="/memealerts", tags=["Memealerts"])
 async def delete_ma_tokens(
     memealerts: Annotated[MemealertsOAuthService, Depends(Provide[Container.memealerts_auth])],
     twitch: Annotated[Twitch, Depends(Provide[Container.twitch])],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     user: User = Security(user_auth),
 ):
     await memealerts.delete_token(user)
+    chat_bot.invalidate_streamer(user.twitch_id)
     # Отключаем награду на Twitch, чтобы зрители не могли её использовать,
     # пока интеграция с Memealerts отключена. Награда не удаляется —
     # при повторном подключении она будет включена обратно.
@@ -74,6 +77,7 @@ async def disable_reward(
 async def create_reward(
     twitch: Annotated[Twitch, Depends(Provide[Container.twitch])],
     db_session_factory: Annotated[Callable[[], AsyncSession], Depends(Provide[Container.db_session_factory])],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     user: User = Security(user_auth),
 ):
     try:
@@ -104,6 +108,7 @@ async def create_reward(
             .values(memealerts_reward=reward.id)
         )
         await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     await twitch.subscribe_reward(user, reward.id)
     return JSONResponse({"title": "Успешно", "message": "Награда создана."}, 201)
 
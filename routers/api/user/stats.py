@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Annotated
 
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Depends, Query, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
 
 from container import Container
 from database.models import User
@@ -49,6 +49,10 @@ async def get_stats(
         datetime | None,
         Query(alias="to", description="Конец диапазона (UTC). Если не задано — now()."),
     ] = None,
+    max_points: Annotated[
+        int | None,
+        Query(description="Прорядить ряд(ы) до стольких точек (LTTB). None — все бакеты.", ge=3, le=5000),
+    ] = None,
 ) -> StatsResponseSchema:
     """Возвращает ряд точек (UTC) для отрисовки графика Chart.js.
 
@@ -56,6 +60,9 @@ async def get_stats(
     (см. ``PERIOD_CONFIG`` в ``services/statistics.py``): если превышен —
     ``from`` сдвигается вперёд. Пустые бакеты внутри диапазона заполняются
     нулями, чтобы график был непрерывным.
+
+    Ответы кешируются до следующего дампа статистики в БД; ``max_points``
+    прореживает ряд алгоритмом LTTB (пики сохраняются).
     """
     points = await statistics.get_chart(
         type_,
@@ -64,6 +71,7 @@ async def get_stats(
         period=period,
         dt_from=dt_from,
         dt_to=dt_to,
+        max_points=max_points,
     )
     return StatsResponseSchema(
         type=str(type_),
@@ -99,6 +107,10 @@ async def get_stats_series(
         datetime | None,
         Query(alias="to", description="Конец диапазона (UTC)."),
     ] = None,
+    max_points: Annotated[
+        int | None,
+        Query(description="Прорядить ряд(ы) до стольких точек (LTTB). None — все бакеты.", ge=3, le=5000),
+    ] = None,
 ) -> StatsSeriesResponseSchema:
     """Возвращает топ-N подтипов с рядами точек для multi-line графика.
 
@@ -113,6 +125,7 @@ async def get_stats_series(
         dt_from=dt_from,
         dt_to=dt_to,
         top_n=top,
+        max_points=max_points,
     )
     return StatsSeriesResponseSchema(
         type=str(type_),
@@ -127,6 +140,73 @@ async def get_stats_series(
     )
 
 
+@router.get(
+    "/percentiles",
+    response_model=StatsSeriesResponseSchema,
+    responses={401: {"description": "Unauthorized"}},
+)
+@inject
+async def get_stats_percentiles(
+    statistics: Annotated[StatisticsService, Depends(Provide[Container.statistics])],
+    user: User = Security(user_auth),
+    type_: Annotated[
+        StatsType,
+        Query(alias="type", description="Timing-метрика (message_processing_time и т.п.)"),
+    ] = StatsType.MESSAGE_PROCESSING_TIME,
+    subtype: Annotated[
+        str | None,
+        Query(description="Подтип метрики. None — все подтипы вместе."),
+    ] = None,
+    percentiles: Annotated[
+        list[int],
+        Query(alias="p", description="Какие перцентили вернуть (1..99), можно несколько: ?p=50&p=99."),
+    ] = [50, 95, 99],  # noqa: B006
+    period: Annotated[StatsPeriod, Query(description="Период агрегации")] = StatsPeriod.TEN_MIN,
+    dt_from: Annotated[
+        datetime | None,
+        Query(alias="from", description="Начало диапазона (UTC)."),
+    ] = None,
+    dt_to: Annotated[
+        datetime | None,
+        Query(alias="to", description="Конец диапазона (UTC)."),
+    ] = None,
+    max_points: Annotated[
+        int | None,
+        Query(description="Прорядить ряд(ы) до стольких точек (LTTB). None — все бакеты.", ge=3, le=5000),
+    ] = None,
+) -> StatsSeriesResponseSchema:
+    """Возвращает ряды перцентилей времени (мс) — по одному на каждый ``p``.
+
+    Считаются по log-гистограммам из ``statistics_histogram``: внутри бакета
+    агрегации гистограммы суммируются, затем берётся перцентиль. Формат ответа —
+    как у ``/series`` (``subtype`` ряда — ``p50``/``p95``/...), чтобы фронт рисовал
+    его тем же multi-line графиком.
+    """
+    if not percentiles or any(not 1 <= p <= 99 for p in percentiles):
+        raise HTTPException(status_code=422, detail="Перцентили должны быть в диапазоне 1..99")
+    series = await statistics.get_percentiles(
+        type_,
+        percentiles=sorted(set(percentiles)),
+        subtype=subtype,
+        channel_id=None,
+        period=period,
+        dt_from=dt_from,
+        dt_to=dt_to,
+        max_points=max_points,
+    )
+    return StatsSeriesResponseSchema(
+        type=str(type_),
+        period=str(period),
+        series=[
+            StatsSeriesItemSchema(
+                subtype=name,
+                points=[StatsSeriesPointSchema(datetime=bucket, value=value) for bucket, value in points],
+            )
+            for name, points in series
+        ],
+    )
+
+
 @router.get(
     "/users-count",
     response_model=StatsResponseSchema,
@@ -123,6 +123,7 @@ async def update_settings(
 
     await db.commit()
     await db.refresh(user.settings)
+    chat_bot.invalidate_streamer(user.twitch_id)
 
     await chat_bot.update_bot_channels()
 
@@ -147,13 +148,16 @@ async def update_settings(
 
 
 @router.post("/memealerts/coins")
+@inject
 async def update_memealert_coins(
     db: Annotated[AsyncSession, Depends(get_db)],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     data: UpdateMemealertsCoinsSchema,
     user: Any = Security(user_auth),
 ):
     user.memealerts.coins_for_reward = data.count
     await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     return JSONResponse(
         {
             "title": "Сохранено",
@@ -167,6 +171,7 @@ async def update_memealert_coins(
 @inject
 async def setup_memealert(
     db: Annotated[AsyncSession, Depends(get_db)],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     twitch: Annotated[Twitch, Depends(Provide[Container.twitch])],
     memealerts: Annotated[MemealertsService, Depends(Provide[Container.memealerts])],
     user: User = Security(user_auth),
@@ -248,6 +253,7 @@ async def setup_memealert(
         if refresh:
             user.memealerts.memealerts_token = memealerts_token
             await db.commit()
+            chat_bot.invalidate_streamer(user.twitch_id)
             await db.refresh(user.memealerts)
             return JSONResponse({"title": "Успешно", "message": "Токен обновлён."}, 200)
 
@@ -275,6 +281,7 @@ async def setup_memealert(
         user.memealerts.memealerts_reward = reward.id
         user.memealerts.memealerts_token = memealerts_token
         await db.commit()
+        chat_bot.invalidate_streamer(user.twitch_id)
         await db.refresh(user.memealerts)
         await twitch.subscribe_reward(user, reward.id)
         return JSONResponse({"title": "Успешно", "message": "Награда создана."}, 201)
@@ -284,6 +291,7 @@ async def setup_memealert(
         pass
     user.memealerts.memealerts_reward = None
     await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     await db.refresh(user.memealerts)
     return JSONResponse({"title": "Успешно", "message": "Награда удалена."}, 200)
 
@@ -292,6 +300,7 @@ async def setup_memealert(
 @inject
 async def setup_ai_stickers(
     db: Annotated[AsyncSession, Depends(get_db)],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     twitch: Annotated[Twitch, Depends(Provide[Container.twitch])],
     user: Any = Security(user_auth),
     enable: bool = Query(default=True),
@@ -306,6 +315,7 @@ async def setup_ai_stickers(
             if "Награда не найдена" in problems:
                 user.settings.ai_sticker_reward_id = None
                 await db.commit()
+                chat_bot.invalidate_streamer(user.twitch_id)
                 await db.refresh(user.settings)
                 reward_id = None
             else:
@@ -342,6 +352,7 @@ async def setup_ai_stickers(
 
         user.settings.ai_sticker_reward_id = reward.id
         await db.commit()
+        chat_bot.invalidate_streamer(user.twitch_id)
         await db.refresh(user.settings)
         await twitch.subscribe_reward(user, reward.id)
         return JSONResponse({"title": "Успешно", "message": "Награда создана."}, 201)
@@ -351,6 +362,7 @@ async def setup_ai_stickers(
         pass
     user.settings.ai_sticker_reward_id = None
     await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     await db.refresh(user.settings)
     return JSONResponse({"title": "Успешно", "message": "Награда удалена."}, 200)
 
@@ -463,6 +475,7 @@ async def upload_reference(
 @inject
 async def setup_tts(
     db: Annotated[AsyncSession, Depends(get_db)],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     twitch: Annotated[Twitch, Depends(Provide[Container.twitch])],
     user: Any = Security(user_auth),
     enable: bool = Query(default=True),
@@ -479,6 +492,7 @@ async def setup_tts(
             if "Награда не найдена" in problems:
                 tts.tts_reward_id = None
                 await db.commit()
+                chat_bot.invalidate_streamer(user.twitch_id)
                 await db.refresh(tts)
                 reward_id = None
             else:
@@ -493,6 +507,7 @@ async def setup_tts(
                 except TwitchResourceNotFound:
                     tts.tts_reward_id = None
                     await db.commit()
+                    chat_bot.invalidate_streamer(user.twitch_id)
                     await db.refresh(tts)
                     reward_id = None
                 except TwitchAPIException as exc:
@@ -521,6 +536,7 @@ async def setup_tts(
 
         tts.tts_reward_id = reward.id
         await db.commit()
+        chat_bot.invalidate_streamer(user.twitch_id)
         await db.refresh(tts)
         await twitch.subscribe_reward(user, reward.id)
         return JSONResponse({"title": "Успешно", "message": "Награда TTS создана."}, 201)
@@ -530,13 +546,16 @@ async def setup_tts(
         pass
     tts.tts_reward_id = None
     await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     await db.refresh(tts)
     return JSONResponse({"title": "Успешно", "message": "Награда TTS удалена."}, 200)
 
 
 @router.post("/tts/settings")
+@inject
 async def update_tts_settings(
     db: Annotated[AsyncSession, Depends(get_db)],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     data: TTSSettingsUpdateSchema,
     user: Any = Security(user_auth),
 ):
@@ -547,12 +566,15 @@ async def update_tts_settings(
         if value is not None:
             setattr(tts, field, value)
     await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     return JSONResponse({"title": "Сохранено", "message": "Настройки TTS обновлены."}, 200)
 
 
 @router.post("/tts/permissions")
+@inject
 async def update_tts_permissions(
     db: Annotated[AsyncSession, Depends(get_db)],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     data: TTSPermissionsSchema,
     user: Any = Security(user_auth),
 ):
@@ -560,31 +582,38 @@ async def update_tts_permissions(
     tts = await ensure_tts_settings(db, user)
     tts.permissions = data.model_dump()
     await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     return JSONResponse({"title": "Сохранено", "message": "Матрица разрешений обновлена."}, 200)
 
 
 @router.post("/tts/reset-key")
+@inject
 async def reset_tts_external_key(
     db: Annotated[AsyncSession, Depends(get_db)],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     user: Any = Security(user_auth),
 ):
     """Сгенерировать новый внешний ключ для TTS."""
     tts = await ensure_tts_settings(db, user)
     tts.external_key = uuid4().hex
     await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     await db.refresh(tts)
     return JSONResponse({"title": "Готово", "message": "Новый ключ сгенерирован.", "key": tts.external_key}, 200)
 
 
 @router.post("/tts/delete-key")
+@inject
 async def delete_tts_external_key(
     db: Annotated[AsyncSession, Depends(get_db)],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     user: Any = Security(user_auth),
 ):
     """Удалить внешний ключ для TTS (отозвать доступ внешних интеграций)."""
     tts = await ensure_tts_settings(db, user)
     tts.external_key = None
     await db.commit()
+    chat_bot.invalidate_streamer(user.twitch_id)
     return JSONResponse({"title": "Готово", "message": "Внешний ключ удалён."}, 200)
 
 
@@ -15,6 +15,7 @@ from routers.web.obs_dock import router as obs_dock_router
 from routers.web.overlays import router as overlays_router
 from routers.web.pages import router as pages_routers
 from routers.web.service_routes import router as service_routes_router
+from routers.ws.overlay import router as ws_overlay_router
 
 # API
 api_router = APIRouter(prefix="/api", tags=["API"])
@@ -28,6 +29,7 @@ api_router.include_router(api_extension_router, tags=["Extension"])
 # User
 user_router = APIRouter(prefix="", tags=["User"])
 user_router.include_router(sse_router)
+user_router.include_router(ws_overlay_router)
 user_router.include_router(overlays_router)
 user_router.include_router(pages_routers)
 user_router.include_router(service_routes_router)
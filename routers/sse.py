@@ -3,7 +3,7 @@ from typing import Annotated, AsyncGenerator
 from uuid import UUID, uuid3
 
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
 from starlette.responses import StreamingResponse
@@ -25,6 +25,17 @@ router = APIRouter(prefix="/sse", tags=["SSE"])
 SSE_HEARTBEAT_S = 15
 
 
+def _parse_last_event_id(value: str | None) -> int | None:
+    """``Last-Event-ID`` -> id события; некорректное значение — реконнект без дозапроса."""
+    if value is None:
+        return None
+    try:
+        event_id = int(value)
+    except ValueError:
+        return None
+    return event_id if event_id >= 0 else None
+
+
 @router.get("/{user_id}/{channel}", response_class=StreamingResponse)
 @inject
 async def sse(
@@ -33,7 +44,9 @@ async def sse(
     request: Request,
     ssem: Annotated[SSEManager, Depends(Provide[Container.sse_manager])],
     db: Annotated[AsyncSession, Depends(get_db)],
-    secret: UUID | None = Query(default=None)
+    secret: UUID | None = Query(default=None),
+    # EventSource сам шлёт id последнего полученного события при реконнекте.
+    last_event_id: Annotated[str | None, Header(alias="Last-Event-ID")] = None,
 ):
     if channel == SSEChannel.SLOVOTRON:
         if secret is None:
@@ -46,27 +59,29 @@ async def sse(
                 raise HTTPException(404, "User not found")
             if secret != uuid3(namespace=settings.slovotron_secret, name=user.login_name):
                 raise HTTPException(403, "Invalid secret")
-    conn = await ssem.connect(user_id, channel)
-
-    def sse_format(data: str) -> str:
-        return "".join(f"data: {line}\n" for line in data.splitlines()) + "\n"
+    conn = await ssem.connect(user_id, channel, last_event_id=_parse_last_event_id(last_event_id))
 
-    async def event_generator() -> AsyncGenerator[str, None]:
+    async def event_generator() -> AsyncGenerator[bytes, None]:
         # Просим браузер реконнектиться через 1с (дефолт ~3с) — меньше шансов
         # попасть в окно между дисконнектом и новым connect().
-        yield "retry: 1000\n\n"
+        yield b"retry: 1000\n\n"
         try:
             while True:
                 if await request.is_disconnected():
                     break
 
                 try:
-                    data = await asyncio.wait_for(conn.queue.get(), timeout=SSE_HEARTBEAT_S)
-                    yield sse_format(data)
+                    event = await asyncio.wait_for(conn.queue.get(), timeout=SSE_HEARTBEAT_S)
+                    if event is None:
+                        # Клиент не успевал читать и очередь переполнилась
+                        # (политика disconnect) — закрываем, EventSource переподключится.
+                        break
+                    # Кадр уже закодирован в broadcast — общий для всех подключений.
+                    yield event.frame
                 except TimeoutError:
                     # SSE-комментарий-keepalive: не создаёт события у клиента,
                     # но держит TCP-соединение живым и сбрасывает idle-таймауты прокси.
-                    yield ": ping\n\n"
+                    yield b": ping\n\n"
         finally:
             await ssem.disconnect(user_id, channel, conn)
 
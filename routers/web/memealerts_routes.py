@@ -20,6 +20,7 @@ from exceptions import MATokenRefreshError
 from routers.security_helpers import user_auth
 from schemas.memealerts import MAChannel
 from services.memes_v2 import MemealertsOAuthService, MemealertsV2Service
+from twitch.chat.bot import ChatBot
 from twitch.client.twitch import Twitch
 
 logger = logging.getLogger(__name__)
@@ -48,6 +49,7 @@ async def callback(
     memealerts_v2: Annotated[MemealertsV2Service, Depends(Provide[Container.memealerts_v2])],
     twitch: Annotated[Twitch, Depends(Provide[Container.twitch])],
     db_session_factory: Annotated[Callable[[], AsyncSession], Depends(Provide[Container.db_session_factory])],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
     code: str,
     state: str,
     user: Any = Security(user_auth),
@@ -83,6 +85,8 @@ async def callback(
 
     if ma_user is not None and ma_user.channel is not None:
         await _store_channel_info(db_session_factory, user.id, ma_user.channel)
+    # Токены и ссылка на канал сохранены — !memealerts/!links должны увидеть их сразу.
+    chat_bot.invalidate_streamer(user.twitch_id)
 
     if user.memealerts.memealerts_reward:
         try:
@@ -17,6 +17,7 @@ from config import settings
 from container import Container
 from database.models import User
 from dependencies import get_db
+from twitch.chat.bot import ChatBot
 from twitch.client.twitch import Twitch
 
 router = APIRouter(prefix="", tags=["Service"])
@@ -39,6 +40,7 @@ async def callback(
     code: str,
     db: Annotated[AsyncSession, Depends(get_db)],
     twitch: Annotated[Twitch, Depends(Provide[Container.twitch])],
+    chat_bot: Annotated[ChatBot, Depends(Provide[Container.chat_bot])],
 ):
     tokens = await twitch.get_user_access_refresh_tokens_by_authorization_code(code)
     if tokens is None:
@@ -73,6 +75,8 @@ async def callback(
         db.add(user)
 
     await db.commit()
+    # Токены/логин стримера обновились — сбрасываем снапшот в кеше чат-бота.
+    chat_bot.invalidate_streamer(user_id)
     asyncio.create_task(login_callback_task(user))
 
     request.session["user_id"] = user_id
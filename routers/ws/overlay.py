@@ -0,0 +1,162 @@
+"""Мультиплексированный WebSocket для оверлеев.
+
+Оверлей, которому нужно несколько каналов (heat, tts, ai-sticker, slovotron),
+вместо отдельного EventSource на каждый открывает один сокет::
+
+    /ws/overlay/{user_id}?channel=heat&channel=tts[&resume=tts:<id>][&secret=<uuid>]
+
+Подписки регистрируются в том же ``SSEManager``, что и SSE — по
+``SSEConnection`` на канал, с теми же очередями и политиками переполнения, —
+поэтому ``has_clients``, snapshot-метрика и распределённый режим работают как
+для SSE. Keepalive — ping/pong самого WebSocket (держит uvicorn), отдельные
+heartbeat-генераторы не нужны.
+
+Сервер шлёт только бинарные сообщения. Одно сообщение — пачка событий,
+накопившихся за ``WS_BATCH_WINDOW_S`` по всем каналам; каждое событие
+(big-endian)::
+
+    u8 код канала (WS_CHANNEL_CODES) | u64 id события | u32 длина data | data (UTF-8)
+
+``resume`` — аналог ``Last-Event-ID`` у SSE, отдельно по каждому каналу.
+Если клиент не успевает читать канал с политикой disconnect, сокет
+закрывается с кодом 1013, и клиент переподключается с ``resume``.
+Сообщения от клиента игнорируются.
+"""
+
+import asyncio
+import logging
+import struct
+from collections.abc import Callable
+from typing import Annotated
+from uuid import UUID, uuid3
+
+import sqlalchemy as sa
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, WebSocketException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from container import Container
+from database.models import User
+from services.sse_manager import SSEConnection, SSEEvent, SSEManager
+from utils.enums import SSEChannel
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/ws", tags=["WebSocket"])
+
+# Коды каналов в бинарном кадре. Значения — часть протокола, не переиспользовать.
+WS_CHANNEL_CODES: dict[SSEChannel, int] = {
+    SSEChannel.AI_STICKER: 1,
+    SSEChannel.MESSAGE: 2,
+    SSEChannel.HEAT: 3,
+    SSEChannel.SLOVOTRON: 4,
+    SSEChannel.TTS: 5,
+}
+
+# Сколько копить события после первого перед отправкой пачки: всплеск кликов
+# Heat уходит одним сообщением, а не сотней.
+WS_BATCH_WINDOW_S = 0.02
+
+_RECORD_HEADER = struct.Struct("!BQI")
+
+
+def encode_batch(events: list[tuple[SSEChannel, SSEEvent]]) -> bytes:
+    parts: list[bytes] = []
+    for channel, event in events:
+        parts.append(_RECORD_HEADER.pack(WS_CHANNEL_CODES[channel], event.id, len(event.payload)))
+        parts.append(event.payload)
+    return b"".join(parts)
+
+
+def _parse_resume(values: list[str]) -> dict[SSEChannel, int]:
+    """``["tts:123", ...]`` -> ``{SSEChannel.TTS: 123}``; некорректные значения пропускаются."""
+    result: dict[SSEChannel, int] = {}
+    for value in values:
+        channel, _, event_id = value.rpartition(":")
+        try:
+            result[SSEChannel(channel)] = int(event_id)
+        except ValueError:
+            continue
+    return result
+
+
+async def _check_slovotron_secret(
+    db_session_factory: Callable[[], AsyncSession], user_id: int, secret: UUID | None
+) -> None:
+    if secret is None:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="No secret provided")
+    async with db_session_factory() as session:
+        user: User | None = (
+            await session.execute(sa.select(User).where(User.twitch_id == str(user_id)))
+        ).scalar_one_or_none()
+    if not user:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="User not found")
+    if secret != uuid3(namespace=settings.slovotron_secret, name=user.login_name):
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid secret")
+
+
+async def _send_loop(websocket: WebSocket, conns: dict[SSEChannel, SSEConnection], notify: asyncio.Event) -> None:
+    while True:
+        await notify.wait()
+        await asyncio.sleep(WS_BATCH_WINDOW_S)
+        notify.clear()
+        batch: list[tuple[SSEChannel, SSEEvent]] = []
+        for channel, conn in conns.items():
+            while not conn.queue.empty():
+                event = conn.queue.get_nowait()
+                if event is None:
+                    # Канал с политикой disconnect переполнился — закрываем весь сокет.
+                    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=f"{channel} overflow")
+                    return
+                batch.append((channel, event))
+        if batch:
+            await websocket.send_bytes(encode_batch(batch))
+
+
+async def _receive_loop(websocket: WebSocket) -> None:
+    # Входящие сообщения не нужны, но без чтения не узнать о закрытии сокета клиентом.
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/overlay/{user_id}")
+@inject
+async def overlay_ws(
+    websocket: WebSocket,
+    user_id: int,
+    ssem: Annotated[SSEManager, Depends(Provide[Container.sse_manager])],
+    db_session_factory: Annotated[Callable[[], AsyncSession], Depends(Provide[Container.db_session_factory])],
+    channels: Annotated[list[SSEChannel], Query(alias="channel", description="Каналы подписки")],
+    resume: Annotated[list[str], Query(description="Последний полученный id по каналу: channel:id")] = [],  # noqa: B006
+    secret: UUID | None = None,
+):
+    if SSEChannel.SLOVOTRON in channels:
+        await _check_slovotron_secret(db_session_factory, user_id, secret)
+    await websocket.accept()
+
+    resume_from = _parse_resume(resume)
+    notify = asyncio.Event()
+    conns: dict[SSEChannel, SSEConnection] = {}
+    tasks: list[asyncio.Task] = []
+    try:
+        for channel in dict.fromkeys(channels):
+            conns[channel] = await ssem.connect(user_id, channel, last_event_id=resume_from.get(channel), notify=notify)
+        tasks = [
+            asyncio.create_task(_send_loop(websocket, conns, notify)),
+            asyncio.create_task(_receive_loop(websocket)),
+        ]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                exc = task.exception()
+                if not isinstance(exc, WebSocketDisconnect):
+                    logger.error("Overlay websocket failed user=%s", user_id, exc_info=exc)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for channel, conn in conns.items():
+            await ssem.disconnect(user_id, channel, conn)
@@ -99,6 +99,9 @@ class StatsType(StrEnum):
 
     MESSAGE_INCOMING = "message_incoming"
     MESSAGE_OUTGOING = "message_outgoing"
+    # Counter: входящие сообщения, отсеянные префильтром ChatBot до загрузки
+    # стримера и обработки командами/handler'ами.
+    MESSAGE_PREFILTERED = "message_prefiltered"
     REWARD_MEMECOINS = "reward_memecoins"
     REWARD_AI_STICKERS = "reward_ai_stickers"
     COMMAND_HANDLED = "command_handled"
@@ -106,9 +109,14 @@ class StatsType(StrEnum):
     # В таблице: count — число замеров, sum_ms — суммарное время.
     MESSAGE_PROCESSING_TIME = "message_processing_time"
     # Count-метрика: число уникальных каналов, на которых были входящие/исходящие
-    # сообщения за бакет. В таблице: count = размер сета channel_id, sum_ms=0.
+    # сообщения за бакет. В таблице: count = PFCOUNT HyperLogLog'а channel_id, sum_ms=0.
     # Subtype: "incoming" | "outgoing".
     ACTIVE_CHANNELS = "active_channels"
+    # Уникальные чаттеры (HLL, как и ACTIVE_CHANNELS): без channel_id — по всему
+    # сервису, с channel_id — по каналу. Subtype пустой.
+    UNIQUE_CHATTERS = "unique_chatters"
+    # Уникальные пользователи, вызвавшие хотя бы одну команду (HLL).
+    UNIQUE_COMMAND_USERS = "unique_command_users"
     # Gauge-метрика: мгновенное число активных SSE-подключений (snapshot раз в
     # минуту). Subtype: "total" | "unique_users" | "unique_pairs" | <channel_name>.
     SSE_CONNECTIONS = "sse_connections"
@@ -137,6 +145,21 @@ class StatsType(StrEnum):
     TTS_BLOCKED = "tts_blocked"
     # Timing-метрика: avg время (мс) синтеза TTS во внешнем API.
     TTS_PROCESSING_TIME = "tts_processing_time"
+    # Counter: обращения к in-process кешу StateManager (TieredStateManager).
+    # Subtype: "hit" | "miss".
+    STATE_CACHE = "state_cache"
+    # Timing-метрика: длительность одного прогона ``flush_to_db`` (мс).
+    STATS_FLUSH_TIME = "stats_flush_time"
+    # Timing-метрика: насколько позже положенного просыпается таск-сэмплер
+    # event loop'а (мс) — см. ``services/loop_monitor.py``.
+    EVENT_LOOP_LAG = "event_loop_lag"
+    # Counter: шаги loop'а дольше порога LoopMonitor. Subtype — имя корутины.
+    SLOW_CALLBACKS = "slow_callbacks"
+    # Counter: сообщения SSE, выброшенные из переполненных очередей медленных
+    # клиентов (drop-oldest/coalesce-latest и хвост при disconnect). Subtype — SSE-канал.
+    SSE_DROPPED = "sse_dropped"
+    # Counter: SSE-подключения, закрытые из-за переполнения очереди. Subtype — SSE-канал.
+    SSE_SLOW_DISCONNECTS = "sse_slow_disconnects"
 
 
 class StatsPeriod(StrEnum):
@@ -149,6 +172,50 @@ class StatsPeriod(StrEnum):
     ONE_DAY = "1d"
 
 
+class StatsTopKind(StrEnum):
+    """Измерения топа «горячих» элементов (Space-Saving в ``StatisticsService``)."""
+
+    # login канала, по входящим сообщениям.
+    CHANNELS = "channels"
+    # login чаттера, по сообщениям во всех каналах.
+    CHATTERS = "chatters"
+    # Имя команды, по обработанным вызовам.
+    COMMANDS = "commands"
+
+
+class StatsTopItemSchema(BaseModel):
+    """Элемент топа: что и сколько раз (нижняя оценка Space-Saving)."""
+
+    item: str
+    count: int
+
+
+class StatsTopResponseSchema(BaseModel):
+    """Ответ ручки /api/admin/stats/top: самые частые элементы за последние ``minutes``."""
+
+    kind: str
+    minutes: int
+    items: list[StatsTopItemSchema]
+
+
+class SlowCallbackSchema(BaseModel):
+    """Шаг event loop'а, заблокировавший его дольше порога ``LoopMonitor``."""
+
+    task: str
+    coro: str
+    started_at: datetime
+    duration_ms: int
+    stack: list[str]
+
+
+class LoopMonitorResponseSchema(BaseModel):
+    """Ответ debug-ручки /api/admin/loop-monitor."""
+
+    last_lag_ms: int
+    max_lag_ms: int
+    offenders: list[SlowCallbackSchema]
+
+
 class StatsPointSchema(BaseModel):
     """Одна точка графика: начало бакета (UTC) и агрегированное значение."""
 
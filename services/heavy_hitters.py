@@ -0,0 +1,60 @@
+"""Space-Saving: потоковый топ самых частых элементов в фиксированной памяти.
+
+Хранит не больше ``capacity`` счётчиков. Новый элемент при заполненной
+таблице вытесняет элемент с минимальным счётчиком и наследует его значение
+как погрешность (``error``): истинная частота лежит в ``[count - error, count]``.
+Любой элемент с частотой больше ``N / capacity`` гарантированно в таблице.
+
+``take_deltas`` отдаёт прирост гарантированной части (``count - error``) с
+прошлого вызова — его можно суммировать в общем Redis ZSET'е от нескольких
+инстансов, не задваивая вытесненные счётчики.
+"""
+
+
+class SpaceSaving:
+    def __init__(self, capacity: int = 100) -> None:
+        self._capacity = capacity
+        self._counts: dict[str, int] = {}
+        self._errors: dict[str, int] = {}
+        # Сколько гарантированной частоты элемента уже отдано через take_deltas.
+        self._reported: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, item: str, weight: int = 1) -> None:
+        counts = self._counts
+        if item in counts:
+            counts[item] += weight
+            return
+        if len(counts) < self._capacity:
+            counts[item] = weight
+            self._errors[item] = 0
+            self._reported[item] = 0
+            return
+        # O(capacity) поиск минимума — только для новых элементов при полной
+        # таблице; при capacity ~100 это дешевле поддержки stream summary.
+        victim = min(counts, key=counts.__getitem__)
+        floor = counts.pop(victim)
+        del self._errors[victim], self._reported[victim]
+        counts[item] = floor + weight
+        self._errors[item] = floor
+        self._reported[item] = 0
+
+    def top(self, n: int | None = None) -> list[tuple[str, int, int]]:
+        """``[(элемент, count, error), ...]`` по убыванию ``count``."""
+        items = sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)
+        if n is not None:
+            items = items[:n]
+        return [(item, count, self._errors[item]) for item, count in items]
+
+    def take_deltas(self) -> dict[str, int]:
+        """Прирост ``count - error`` с прошлого вызова, только для изменившихся элементов."""
+        deltas: dict[str, int] = {}
+        for item, count in self._counts.items():
+            guaranteed = count - self._errors[item]
+            delta = guaranteed - self._reported[item]
+            if delta > 0:
+                deltas[item] = delta
+                self._reported[item] = guaranteed
+        return deltas
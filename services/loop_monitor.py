@@ -0,0 +1,172 @@
+"""Наблюдение за event loop'ом: лаг планирования и «тяжёлые» шаги корутин.
+
+Весь сервис (вебхуки, чат, SSE, джобы планировщика, синхронные куски
+пайплайна стикеров) крутится в одном asyncio-loop'е, и любой блокирующий
+вызов останавливает всё сразу.
+
+- **Лаг**: таск раз в ``interval`` секунд засыпает и меряет, насколько позже
+  положенного проснулся. Замер уходит в ``StatsType.EVENT_LOOP_LAG`` (timing,
+  а значит и в Prometheus-гистограмму ``StatisticsService``).
+- **Медленные шаги**: сторожевой поток раз в ``threshold / 2`` проверяет, что
+  таск-сэмплер не опаздывает больше чем на ``threshold``. Если опаздывает — loop
+  сейчас занят одним шагом, и поток снимает стек потока loop'а и текущий таск
+  (``sys._current_frames``/``asyncio.current_task``). Когда loop освобождается,
+  сэмплер дописывает длительность и считает ``StatsType.SLOW_CALLBACKS``
+  (subtype — имя корутины). Последние ``max_offenders`` таких случаев отдаёт
+  ``offenders`` (debug-ручка ``/api/admin/loop-monitor``).
+
+Обычный asyncio debug-режим (``slow_callback_duration``) даёт то же, но
+замедляет каждый шаг loop'а — в проде его не включить.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import traceback
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from time import monotonic
+from typing import Any
+
+from schemas.api import StatsType
+from services.statistics import StatisticsService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SlowCallback:
+    task: str
+    coro: str
+    stack: list[str]
+    started_at: datetime
+    duration_ms: int = 0
+    # ``_expected_wakeup`` сэмплера, опоздание которого поймал сторож: сэмплер
+    # принимает захват только для своего же пробуждения.
+    expected_wakeup: float = 0.0
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        statistics: StatisticsService | None = None,
+        interval: float = 0.5,
+        threshold: float = 0.1,
+        max_offenders: int = 50,
+    ) -> None:
+        self._statistics = statistics
+        self._interval = interval
+        self._threshold = threshold
+        self._offenders: deque[SlowCallback] = deque(maxlen=max_offenders)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        # Когда сэмплер должен проснуться (monotonic) — пишет loop, читает сторож.
+        self._expected_wakeup = 0.0
+        # Захваченный сторожем, но ещё не завершившийся медленный шаг.
+        self._stall: SlowCallback | None = None
+        self._stop = threading.Event()
+        self.last_lag_ms = 0
+        self.max_lag_ms = 0
+
+    @property
+    def offenders(self) -> list[SlowCallback]:
+        """Последние медленные шаги, от самых долгих к коротким."""
+        return sorted(self._offenders, key=lambda o: o.duration_ms, reverse=True)
+
+    # ------------------------------------------------------------------
+    # Сэмплер лага (в loop'е)
+    # ------------------------------------------------------------------
+
+    async def _sampler(self) -> None:
+        while True:
+            expected = self._expected_wakeup = monotonic() + self._interval
+            await asyncio.sleep(self._interval)
+            lag_ms = max(0, round((monotonic() - expected) * 1000))
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if self._statistics is not None:
+                self._statistics.inc_timing(StatsType.EVENT_LOOP_LAG, value_ms=lag_ms)
+            stall, self._stall = self._stall, None
+            if stall is not None and stall.expected_wakeup == expected:
+                # Лаг сэмплера — это и есть время, на которое шаг задержал loop.
+                stall.duration_ms = lag_ms
+                self._offenders.append(stall)
+                logger.warning(
+                    "Event loop blocked for ~%d ms by %s (%s):\n%s",
+                    stall.duration_ms,
+                    stall.coro,
+                    stall.task,
+                    "".join(stall.stack),
+                )
+                if self._statistics is not None:
+                    self._statistics.inc(StatsType.SLOW_CALLBACKS, subtype=stall.coro)
+
+    # ------------------------------------------------------------------
+    # Сторож (отдельный поток)
+    # ------------------------------------------------------------------
+
+    def _watchdog(self) -> None:
+        while not self._stop.wait(self._threshold / 2):
+            expected = self._expected_wakeup
+            if self._stall is not None or not expected:
+                continue
+            if monotonic() - expected < self._threshold:
+                continue
+            try:
+                stall = self._capture(expected)
+            except Exception:
+                logger.error("Loop monitor: cannot capture blocked loop", exc_info=True)
+                continue
+            # Пока снимали стек, loop мог освободиться и перейти к другому шагу —
+            # такой захват уже не про опоздавшее пробуждение.
+            if self._expected_wakeup == expected:
+                self._stall = stall
+
+    def _capture(self, expected_wakeup: float) -> SlowCallback:
+        frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore[arg-type]
+        stack = traceback.format_stack(frame) if frame is not None else []
+        started_at = datetime.now(UTC) - timedelta(seconds=monotonic() - expected_wakeup)
+        task: Any = asyncio.current_task(self._loop) if self._loop is not None else None
+        if task is None:
+            # Блокирует не таск, а callback (call_soon/future done callback и т.п.).
+            return SlowCallback(
+                task="<callback>",
+                coro=_frame_name(frame),
+                stack=stack,
+                started_at=started_at,
+                expected_wakeup=expected_wakeup,
+            )
+        coro = task.get_coro()
+        return SlowCallback(
+            task=task.get_name(),
+            coro=getattr(coro, "__qualname__", repr(coro)),
+            stack=stack,
+            started_at=started_at,
+            expected_wakeup=expected_wakeup,
+        )
+
+    @asynccontextmanager
+    async def lifespan(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        sampler = asyncio.create_task(self._sampler(), name="loop-monitor-sampler")
+        watchdog = threading.Thread(target=self._watchdog, name="loop-monitor-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            yield
+        finally:
+            self._stop.set()
+            sampler.cancel()
+            await asyncio.gather(sampler, return_exceptions=True)
+            watchdog.join(timeout=1)
+
+
+def _frame_name(frame: Any) -> str:
+    """Имя функции, выполнявшейся в ``frame``."""
+    if frame is None:
+        return "<unknown>"
+    return frame.f_code.co_qualname
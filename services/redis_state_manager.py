@@ -1,4 +1,3 @@
-import asyncio
 import json
 import logging
 from contextlib import asynccontextmanager
@@ -17,6 +16,8 @@ from twitch.state_manager import (
     VALUE_TYPE,
     COMMON_USER,
     COMMON_COMMAND,
+    DEFAULT_STATE_TTL,
+    SMKey,
     SMParam,
 )
 
@@ -24,14 +25,77 @@ from twitch.state_manager import (
 logger = logging.getLogger(__name__)
 tracer = trace.get_tracer(__name__)
 
+# Раскладка: один хеш на канал ``smh:{channel}``, поле ``{command}:{user}:{param}``,
+# у каждого поля свой TTL (HPEXPIRE, Redis >= 7.4). Запись — HSET+HPEXPIRE одним
+# MULTI, чтение канала целиком — один HGETALL; индексные сеты и слушатель
+# keyspace-событий для их чистки больше не нужны: просроченные поля Redis удаляет
+# сам, а пустой хеш исчезает вместе с последним полем.
+HASH_PREFIX = "smh:"
+# Старая раскладка: отдельный ключ ``sm:{channel}:{command}:{user}:{param}`` +
+# сеты ``idx:{channel|command|user|param}:*``. Переносится ``migrate_legacy_keys``.
+_LEGACY_KEY_PATTERN = "sm:*:*:*:*"
+_LEGACY_INDEX_PATTERNS = ("idx:channel:*", "idx:command:*", "idx:user:*", "idx:param:*")
+# Отметка, что перенос уже выполнен: без неё lifespan не сканирует keyspace.
+# Не под ``smh:`` — там ключи-хеши каналов.
+_MIGRATED_MARKER_KEY = "smh-migrated"
+
+# Захват окна КД за один round trip и атомарно относительно других инстансов.
+# KEYS[1] — хеш канала; ARGV[1] — поле, ARGV[2] — ttl (мс), ARGV[3] — лимит.
+# Значение — число вызовов в окне в формате _encode_value ("i<n>"). HSET по
+# существующему полю сбрасывает его TTL, поэтому оставшийся TTL переставляем.
+_ACQUIRE_COOLDOWN_LUA = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+local calls = 0
+if current then
+    calls = tonumber(string.sub(current, 2)) or 0
+end
+if calls >= tonumber(ARGV[3]) then
+    return 0
+end
+if calls == 0 then
+    redis.call('HSET', KEYS[1], ARGV[1], 'i1')
+    redis.call('HPEXPIRE', KEYS[1], ARGV[2], 'FIELDS', 1, ARGV[1])
+else
+    local pttl = redis.call('HPTTL', KEYS[1], 'FIELDS', 1, ARGV[1])[1]
+    redis.call('HSET', KEYS[1], ARGV[1], 'i' .. (calls + 1))
+    if pttl > 0 then
+        redis.call('HPEXPIRE', KEYS[1], pttl, 'FIELDS', 1, ARGV[1])
+    end
+end
+return 1
+"""
+
 
 class RedisStateManager(StateManager):
-    def __init__(self, default_ttl: int = 4 * 60 * 60):
+    def __init__(self, default_ttl: int = DEFAULT_STATE_TTL):
         # self._r = init_redis()
         self._default_ttl = default_ttl
 
     async def startup(self, redis: aioredis.Redis):
         self._r = redis
+        self._acquire_cooldown_script = redis.register_script(_ACQUIRE_COOLDOWN_LUA)
+
+    @staticmethod
+    def _hash_key(channel: str) -> str:
+        return f"{HASH_PREFIX}{channel}"
+
+    @staticmethod
+    def _field(command: str, user: int | str, param: PARAM_TYPE) -> str:
+        return f"{command}:{user}:{param}"
+
+    @staticmethod
+    def _parse_field(field: str) -> tuple[USER_TYPE, COMMAND_TYPE, PARAM_TYPE] | None:
+        command, sep, rest = field.partition(":")
+        user, sep2, param = rest.rpartition(":")
+        if not sep or not sep2:
+            return None
+        try:
+            parsed_param = SMParam(param)
+        except ValueError:
+            return None
+        if user.isdigit():  # type: ignore
+            user = int(user)
+        return user, command, parsed_param
 
     @tracer.start_as_current_span("SM: Get State")
     async def get_state(
@@ -42,50 +106,12 @@ class RedisStateManager(StateManager):
         command: str = COMMON_COMMAND,
         param: PARAM_TYPE = PARAM_TYPE.DEFAULT,
     ) -> VALUE_TYPE:
-        result = await self.get_from_redis(channel=channel, user=user, command=command, param=param)
-        if len(result.keys()) == 0:
-            return None
-        if len(result.keys()) > 1:
-            raise KeyError
-        return list(result.values())[0]
-
-    async def get_from_redis(
-        self,
-        *,
-        channel: str | None = None,
-        user: int | None = None,
-        command: str | None = None,
-        param: PARAM_TYPE | None = None,
-    ) -> dict[str, VALUE_TYPE]:
         try:
-            if channel and command and user:
-                exact_key = f"sm:{channel}:{command}:{user}:{param}"
-                value = await self._r.get(exact_key)
-                return {self._ensure_str(exact_key): await self._decode_value(value)} if value else {}
-
-            sets_to_intersect = []
-            if channel:
-                sets_to_intersect.append(f"idx:channel:{channel}")
-            if command:
-                sets_to_intersect.append(f"idx:command:{command}")
-            if user:
-                sets_to_intersect.append(f"idx:user:{user}")
-            if param:
-                sets_to_intersect.append(f"idx:param:{param}")
-
-            if not sets_to_intersect:
-                target_keys = [key async for key in self._r.scan_iter(match="sm:*:*:*:*")]
-            else:
-                target_keys = await self._r.sinter(sets_to_intersect)
-
-            if not target_keys:
-                return {}
-
-            values = await self._r.mget(target_keys)
-            return {self._ensure_str(key): await self._decode_value(val) for key, val in zip(target_keys, values) if val is not None}
+            value = await self._r.hget(self._hash_key(channel), self._field(command, user, param))
         except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
             logger.error(f"Redis недоступен! Ошибка: {e}")
-            return {}
+            return None
+        return await self._decode_value(value) if value else None
 
     @staticmethod
     def _ensure_str(value: str | bytes) -> str:
@@ -141,17 +167,17 @@ class RedisStateManager(StateManager):
         command: str = COMMON_COMMAND,
         param: PARAM_TYPE = PARAM_TYPE.DEFAULT,
     ) -> None:
-        main_key = f"sm:{channel}:{command}:{user}:{param}"
+        if value is None:
+            await self.del_state(channel=channel, user=user, command=command, param=param)
+            return
         redis_value: str | None = await self._encode_value(value)
+        key = self._hash_key(channel)
+        field = self._field(command, user, param)
         try:
-            if redis_value is None:
-                await self.del_state(channel=channel, user=user, command=command, param=param)
-            else:
-                await self._r.set(main_key, redis_value, ex=self._default_ttl)
-                await self._r.sadd(f"idx:channel:{channel}", main_key)
-                await self._r.sadd(f"idx:command:{command}", main_key)
-                await self._r.sadd(f"idx:user:{user}", main_key)
-                await self._r.sadd(f"idx:param:{param}", main_key)
+            async with self._r.pipeline(transaction=True) as pipe:
+                pipe.hset(key, field, redis_value)
+                pipe.hexpire(key, self._default_ttl, field)
+                await pipe.execute()
         except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
             logger.error(f"Redis недоступен! Ошибка: {e}")
             return
@@ -167,114 +193,211 @@ class RedisStateManager(StateManager):
     ) -> int:
         try:
             if channel and command and user:
-                exact_key = f"sm:{channel}:{command}:{user}:{param}"
-                return await self._r.delete(exact_key)
+                return await self._r.hdel(self._hash_key(channel), self._field(command, user, param))
 
-            sets_to_intersect = []
+            # Удаление по маске (None — «любой»): проходим по подходящим хешам.
             if channel:
-                sets_to_intersect.append(f"idx:channel:{channel}")
-            if command:
-                sets_to_intersect.append(f"idx:command:{command}")
-            if user:
-                sets_to_intersect.append(f"idx:user:{user}")
-            if param:
-                sets_to_intersect.append(f"idx:param:{param}")
-
-            if not sets_to_intersect:
-                target_keys = [key async for key in self._r.scan_iter(match="sm:*:*:*:*")]
+                keys = [self._hash_key(channel)]
             else:
-                target_keys = await self._r.sinter(sets_to_intersect)
+                keys = [key async for key in self._r.scan_iter(match=f"{HASH_PREFIX}*")]
+            deleted = 0
+            for key in keys:
+                fields = [
+                    field
+                    for field in await self._r.hkeys(key)
+                    if self._field_matches(field, user=user, command=command, param=param)
+                ]
+                if fields:
+                    deleted += await self._r.hdel(key, *fields)
+            return deleted
 
-            if not target_keys:
-                return 0
-
-            return await self._r.delete(*target_keys)
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            logger.error(f"Redis недоступен! Ошибка: {e}")
+            return
 
+    def _field_matches(
+        self,
+        field: str,
+        *,
+        user: int | None,
+        command: str | None,
+        param: PARAM_TYPE | None,
+    ) -> bool:
+        parsed = self._parse_field(self._ensure_str(field))
+        if parsed is None:
+            return False
+        f_user, f_command, f_param = parsed
+        return (
+            (not user or str(f_user) == str(user))
+            and (not command or f_command == command)
+            and (not param or f_param == param)
+        )
+
+    @tracer.start_as_current_span("SM: Get States")
+    async def get_states(self, keys: list[SMKey]) -> list[VALUE_TYPE]:
+        # Ключи разных каналов лежат в разных хешах: по HMGET на хеш, все — одним пайплайном.
+        groups: dict[str, list[tuple[int, str]]] = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(self._hash_key(key.channel), []).append(
+                (i, self._field(key.command, key.user, key.param))
+            )
+        result: list[VALUE_TYPE] = [None] * len(keys)
+        if not groups:
+            return result
+        try:
+            async with self._r.pipeline(transaction=False) as pipe:
+                for hash_key, items in groups.items():
+                    pipe.hmget(hash_key, [field for _, field in items])
+                responses = await pipe.execute()
         except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
             logger.error(f"Redis недоступен! Ошибка: {e}")
+            return result
+        for items, values in zip(groups.values(), responses, strict=True):
+            for (i, _), value in zip(items, values, strict=True):
+                result[i] = await self._decode_value(value) if value else None
+        return result
+
+    @tracer.start_as_current_span("SM: Set States")
+    async def set_states(self, values: dict[SMKey, VALUE_TYPE]) -> None:
+        to_set: dict[str, dict[str, str]] = {}
+        to_del: dict[str, list[str]] = {}
+        for key, value in values.items():
+            hash_key = self._hash_key(key.channel)
+            field = self._field(key.command, key.user, key.param)
+            if value is None:
+                to_del.setdefault(hash_key, []).append(field)
+            else:
+                to_set.setdefault(hash_key, {})[field] = await self._encode_value(value)
+        if not to_set and not to_del:
             return
+        try:
+            async with self._r.pipeline(transaction=True) as pipe:
+                for hash_key, mapping in to_set.items():
+                    pipe.hset(hash_key, mapping=mapping)
+                    pipe.hexpire(hash_key, self._default_ttl, *mapping)
+                for hash_key, fields in to_del.items():
+                    pipe.hdel(hash_key, *fields)
+                await pipe.execute()
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            logger.error(f"Redis недоступен! Ошибка: {e}")
 
     @tracer.start_as_current_span("SM: Get All State")
     async def get_all_from_channel(
         self, *, channel: str = COMMON_CHANNEL
     ) -> AsyncIterator[tuple[USER_TYPE, COMMAND_TYPE, PARAM_TYPE, VALUE_TYPE]]:
-        data = await self.get_from_redis(channel=channel)
-        for redis_key, value in data.items():
-            if not redis_key.startswith("sm:"):
-                continue
-            parts = redis_key.split(":")
-            if len(parts) != 5:
-                continue
-            user: int
-            sm, channel, command, user, param = parts
-            if sm != "sm":
+        try:
+            data = await self._r.hgetall(self._hash_key(channel))
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            logger.error(f"Redis недоступен! Ошибка: {e}")
+            return
+        for field, value in data.items():
+            parsed = self._parse_field(self._ensure_str(field))
+            if parsed is None:
                 continue
-            if user.isdigit():  # type: ignore
-                user = int(user)
-            yield user, command, SMParam(param), value
+            user, command, param = parsed
+            yield user, command, param, await self._decode_value(value)
+
+    @tracer.start_as_current_span("SM: Acquire Cooldown")
+    async def try_acquire_cooldown(
+        self,
+        ttl: float,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+        limit: int = 1,
+    ) -> bool:
+        try:
+            acquired = await self._acquire_cooldown_script(
+                keys=[self._hash_key(channel)],
+                args=[self._field(command, user, SMParam.COOLDOWN_LOCK), max(int(ttl * 1000), 1), limit],
+            )
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            # Как и get_state при недоступном Redis: считаем, что КД нет.
+            logger.error(f"Redis недоступен! Ошибка: {e}")
+            return True
+        return bool(acquired)
+
+    @tracer.start_as_current_span("SM: Cooldown Remaining")
+    async def cooldown_remaining(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+    ) -> float:
+        try:
+            pttls = await self._r.hpttl(self._hash_key(channel), self._field(command, user, SMParam.COOLDOWN_LOCK))
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            logger.error(f"Redis недоступен! Ошибка: {e}")
+            return 0.0
+        return max(pttls[0], 0) / 1000 if pttls else 0.0
+
+    async def release_cooldown(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+    ) -> None:
+        await self.del_state(channel=channel, user=user, command=command, param=SMParam.COOLDOWN_LOCK)
 
     async def cleanup(self):
         pass
 
+    @tracer.start_as_current_span("SM: Migrate Legacy Keys")
+    async def migrate_legacy_keys(self, batch_size: int = 500) -> int:
+        """Переносит состояние из старой раскладки (ключ на значение + idx-сеты) в хеши.
+
+        Идемпотентна: перенесённый ключ удаляется в той же транзакции, где пишется
+        поле хеша, с сохранением оставшегося TTL. После переноса удаляет idx-сеты
+        и ставит ``_MIGRATED_MARKER_KEY``, чтобы следующие старты его не повторяли.
+        """
+        migrated = 0
+        keys = [key async for key in self._r.scan_iter(match=_LEGACY_KEY_PATTERN, count=batch_size)]
+        for i in range(0, len(keys), batch_size):
+            batch = keys[i : i + batch_size]
+            async with self._r.pipeline(transaction=False) as pipe:
+                for key in batch:
+                    pipe.get(key)
+                    pipe.pttl(key)
+                results = await pipe.execute()
+            async with self._r.pipeline(transaction=True) as pipe:
+                for key, value, pttl in zip(batch, results[::2], results[1::2], strict=True):
+                    parts = self._ensure_str(key).split(":")
+                    if len(parts) != 5 or value is None:
+                        continue
+                    _, channel, command, user, param = parts
+                    hash_key = self._hash_key(channel)
+                    field = f"{command}:{user}:{param}"
+                    pipe.hset(hash_key, field, value)
+                    pipe.hpexpire(hash_key, pttl if pttl > 0 else self._default_ttl * 1000, field)
+                    pipe.delete(key)
+                    migrated += 1
+                await pipe.execute()
+
+        for pattern in _LEGACY_INDEX_PATTERNS:
+            index_keys = [key async for key in self._r.scan_iter(match=pattern, count=batch_size)]
+            for i in range(0, len(index_keys), batch_size):
+                await self._r.unlink(*index_keys[i : i + batch_size])
+
+        await self._r.set(_MIGRATED_MARKER_KEY, "1")
+        if migrated:
+            logger.info("Migrated %d state keys to hash layout", migrated)
+        return migrated
+
     @asynccontextmanager
     async def lifespan(self):
-        listener_task = asyncio.create_task(self.redis_event_listener(self._r))
-        print("Успешно: Подключение к Redis установлено, фоновый очиститель запущен.")
-        yield
-        print("Остановка приложения: завершаем фоновые задачи...")
-        listener_task.cancel()  # Сигнализируем воркеру завершить работу
         try:
-            await listener_task  # Ожидаем завершения таски
-        except asyncio.CancelledError:
-            pass
-
+            if not await self._r.exists(_MIGRATED_MARKER_KEY):
+                await self.migrate_legacy_keys()
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            logger.error(f"Не удалось перенести старые ключи StateManager: {e}")
+        yield
         await self._r.close()  # Закрываем пул соединений с Redis
         print("Успешно: Соединения с Redis закрыты.")
 
 
-    # --- ФОНОВЫЙ ВОРКЕР ДЛЯ СЛУШАНИЯ СОБЫТИЙ ОЧИСТКИ ---
-    @staticmethod
-    async def redis_event_listener(client: aioredis.Redis):
-        async with client.client() as pubsub_client:
-            while True:
-                try:
-                    pubsub = pubsub_client.pubsub()
-                    await pubsub.subscribe("__keyevent@0__:expired", "__keyevent@0__:del")
-                    logger.info("Успешно подписались на каналы событий ключей")
-
-                    while True:
-                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=30.0)
-
-                        if message is None:
-                            continue
-                        expired_key = message["data"]
-                        if expired_key.startswith("sm:"):
-                            parts = expired_key.split(":")
-                            if len(parts) == 5:
-                                sm, channel, command, user, param = parts
-                                if sm != "sm":
-                                    continue
-
-                                async with client.pipeline(transaction=True) as pipe:
-                                    logger.info("Got removed key: %s", expired_key)
-                                    pipe.srem(f"idx:channel:{channel}", expired_key)
-                                    pipe.srem(f"idx:command:{command}", expired_key)
-                                    pipe.srem(f"idx:user:{user}", expired_key)
-                                    pipe.srem(f"idx:param:{param}", expired_key)
-                                    await pipe.execute()
-                except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
-                    logger.warning(f"Ошибка соединения: {e}. Ожидание 5 секунд...")
-                    await asyncio.sleep(5)
-                    if pubsub:
-                        await pubsub.aclose()
-                except asyncio.CancelledError:
-                    if pubsub:
-                        await pubsub.unsubscribe("__keyevent@0__:expired", "__keyevent@0__:del")
-                    if pubsub:
-                        await pubsub.aclose()
-                    break
-
-
 async def init_redis(redis_url: str, binary: bool=False) -> AsyncGenerator[Redis, Any]:
     client = aioredis.from_url(redis_url, decode_responses=not binary)
     # Важно: Включаем режим 'Ev' (gEneric + eXpired), чтобы ловить и DEL, и TTL
@@ -0,0 +1,174 @@
+"""Реестр активных чаттерсов в Redis — общий для всех инстансов/воркеров.
+
+На канал — sorted set ``chatters:{channel}``: member — login, score — время
+последнего сообщения (unix). Запросы окна — ``ZRANGEBYSCORE``, протухшие и
+лишние записи срезаются скриптом ``_UPDATE_CHATTERS_LUA``. Отдаём, как и
+``UserListManager``, имя как в чате: login -> display name лежит в хеше
+``chatters:names:{channel}`` с тем же TTL; срезанные из ZSET логины скрипт
+удаляет и из хеша, так что он не больше ``max_users_per_channel``.
+
+Запись идёт пачками: ``handle`` обновляет локальный ``UserListManager`` (L1) и
+кладёт отметку в буфер, который раз в ``flush_interval`` секунд уходит в Redis
+одним пайплайном. Чтение идёт в Redis; если Redis недоступен — отвечает L1.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from time import time
+
+import redis.asyncio as aioredis
+from opentelemetry import trace
+from redis.commands.core import AsyncScript
+
+from schemas.twitch import ChatMessageWebhookEventSchema
+from twitch.user_list_manager import UserListManager
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+KEY_PREFIX = "chatters:"
+NAMES_PREFIX = "chatters:names:"
+
+# Запись пачки отметок канала и срезка окна за один вызов, атомарно: логины,
+# выпавшие из ZSET (протухшие и сверх лимита), удаляются и из хеша имён.
+# KEYS[1] — ZSET, KEYS[2] — хеш имён; ARGV[1] — минимальный score, ARGV[2] —
+# лимит записей, ARGV[3] — TTL (с), дальше тройки login, время, имя.
+_UPDATE_CHATTERS_LUA = """
+for i = 4, #ARGV, 3 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 2])
+end
+local stale = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if #stale > 0 then
+    redis.call('ZREM', KEYS[1], unpack(stale))
+    redis.call('HDEL', KEYS[2], unpack(stale))
+end
+local extra = redis.call('ZRANGE', KEYS[1], 0, -tonumber(ARGV[2]) - 1)
+if #extra > 0 then
+    redis.call('ZREM', KEYS[1], unpack(extra))
+    redis.call('HDEL', KEYS[2], unpack(extra))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return #stale + #extra
+"""
+
+
+class RedisUserListManager(UserListManager):
+    def __init__(
+        self,
+        max_users_per_channel: int = 300,
+        forget_timeout: float = 3600,
+        flush_interval: float = 1,
+        cleanup_interval: float = 300,
+    ):
+        super().__init__(
+            max_users_per_channel=max_users_per_channel,
+            forget_timeout=forget_timeout,
+            cleanup_interval=cleanup_interval,
+        )
+        self._r: aioredis.Redis | None = None
+        self._update_script: AsyncScript | None = None
+        self._flush_interval = flush_interval
+        # channel -> {login: (имя как в чате, время последнего сообщения)}, ещё не записанные в Redis.
+        self._pending: dict[str, dict[str, tuple[str, float]]] = {}
+
+    async def startup(self, redis: aioredis.Redis) -> None:
+        self._r = redis
+        self._update_script = redis.register_script(_UPDATE_CHATTERS_LUA)
+
+    @staticmethod
+    def _key(channel: str) -> str:
+        return f"{KEY_PREFIX}{channel.lower()}"
+
+    @staticmethod
+    def _names_key(channel: str) -> str:
+        return f"{NAMES_PREFIX}{channel.lower()}"
+
+    @tracer.start_as_current_span("ChatBot: Handle User List")
+    async def handle(self, channel: str, message: ChatMessageWebhookEventSchema):
+        await super().handle(channel, message)
+        self._pending.setdefault(channel.lower(), {})[message.chatter_user_login.lower()] = (
+            message.chatter_user_name,
+            time(),
+        )
+
+    async def flush(self) -> None:
+        if self._r is None or self._update_script is None or not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        min_score = time() - self._forget_timeout
+        try:
+            async with self._r.pipeline(transaction=False) as pipe:
+                for channel, users in pending.items():
+                    args: list[str | float | int] = [min_score, self._max_users_per_channel, int(self._forget_timeout)]
+                    for login, (name, ts) in users.items():
+                        args += [login, ts, name]
+                    await self._update_script(
+                        keys=[self._key(channel), self._names_key(channel)], args=args, client=pipe
+                    )
+                await pipe.execute()
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            logger.warning(f"Не удалось записать активных чаттерсов в Redis: {e}")
+            # Вернём отметки в буфер, не затирая более свежие.
+            for channel, users in pending.items():
+                buf = self._pending.setdefault(channel, {})
+                for login, item in users.items():
+                    if login not in buf or buf[login][1] < item[1]:
+                        buf[login] = item
+
+    async def _flusher(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.error("Active chatters flush failed", exc_info=True)
+
+    async def active_users(self, channel: str, timeout: float | None = None) -> list[tuple[str, float]]:
+        if self._r is None:
+            return await super().active_users(channel, timeout)
+        min_score = time() - (timeout if timeout is not None else self._forget_timeout)
+        try:
+            async with self._r.pipeline(transaction=False) as pipe:
+                pipe.zrevrangebyscore(self._key(channel), "+inf", min_score, withscores=True)
+                pipe.hgetall(self._names_key(channel))
+                items, names = await pipe.execute()
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            logger.warning(f"Redis недоступен, активные чаттерсы из памяти: {e}")
+            return await super().active_users(channel, timeout)
+        # login -> (имя как в чате, время); без имени в хеше — хотя бы login.
+        merged = {login: (names.get(login, login), float(ts)) for login, ts in items}
+        # Свои свежие сообщения, ещё не ушедшие в Redis, тоже учитываем.
+        for login, item in self._pending.get(channel.lower(), {}).items():
+            if login not in merged or merged[login][1] < item[1]:
+                merged[login] = item
+        return sorted(merged.values(), key=lambda item: item[1], reverse=True)
+
+    async def last_active(self, channel: str, user: str, timeout: float | None = None) -> float | None:
+        # Своя отметка ещё не ушла в Redis — она свежее, а L1 тоже ищет по login.
+        pending = self._pending.get(channel.lower(), {}).get(user.lower())
+        if self._r is None or pending is not None:
+            return await super().last_active(channel, user, timeout)
+        try:
+            score = await self._r.zscore(self._key(channel), user.lower())
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+            logger.warning(f"Redis недоступен, активность чаттерса из памяти: {e}")
+            return await super().last_active(channel, user, timeout)
+        if score is None:
+            return False
+        if timeout is not None and time() - score > timeout:
+            return None
+        return float(score)
+
+    @asynccontextmanager
+    async def lifespan(self):
+        async with super().lifespan():
+            flusher = asyncio.create_task(self._flusher())
+            try:
+                yield
+            finally:
+                flusher.cancel()
+                await asyncio.gather(flusher, return_exceptions=True)
+                await self.flush()
@@ -1,14 +1,41 @@
+"""SSE-подключения оверлеев и рассылка им сообщений.
+
+По умолчанию всё живёт в процессе: ``broadcast`` доходит только до клиентов
+своего воркера. В распределённом режиме (``settings.sse_distributed``):
+
+- ``broadcast`` доставляет своим клиентам и публикует сообщение в Redis-канал
+  ``sse:pub:{user_id}:{channel}``; каждый инстанс подписан только на пары
+  ``(user_id, channel)``, для которых у него есть клиенты;
+- присутствие клиентов — ZSET ``sse:presence:{user_id}:{channel}`` (member —
+  id инстанса, score — время последнего heartbeat'а), поэтому ``has_clients``
+  видит оверлей, подключённый к другому инстансу.
+
+Heat не рассылается между инстансами: upstream Heat поднимается на каждом
+инстансе, где есть heat-клиенты, и обслуживает только их.
+
+У каждого события есть id, монотонный в пределах пары ``(user_id, channel)``
+(не меньше текущего времени в мс — переживает рестарт). Последние
+``SSE_REPLAY_SIZES[channel]`` событий пары хранятся в буфере (в памяти, в
+распределённом режиме — в Redis), и клиент, переподключившийся с
+``Last-Event-ID``, сначала получает пропущенное.
+"""
+
 import asyncio
 import logging
-from collections import defaultdict
-from dataclasses import dataclass
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from time import monotonic, time
+from uuid import uuid4
 
 import redis.asyncio as aioredis
+from redis.commands.core import AsyncScript
 
 from config import settings
+from schemas.api import StatsType
 from services.heat_upstream import HeatUpstreamConnection
 from services.statistics import StatisticsService
-from utils.enums import SSEChannel
+from utils.enums import SSEChannel, SSEOverflowPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -18,36 +45,234 @@ logger = logging.getLogger(__name__)
 SSE_GRACE_TTL_S = 15
 
 
+# Распределённый режим: как часто инстанс подтверждает своих клиентов и через
+# сколько без подтверждения запись присутствия считается протухшей (упал инстанс).
+SSE_PRESENCE_HEARTBEAT_S = 10
+SSE_PRESENCE_TTL_S = 3 * SSE_PRESENCE_HEARTBEAT_S
+
+# Каналы, которые не рассылаются между инстансами (источник — на каждом инстансе свой).
+SSE_LOCAL_CHANNELS: set[SSEChannel] = {SSEChannel.HEAT}
+
+_PUB_PREFIX = "sse:pub:"
+# Анонсы присутствия "instance:user_id:channel": по ним каждый инстанс знает о
+# чужих клиентах без запроса в Redis (для ``might_have_clients``).
+_PRESENCE_ANNOUNCE_CHANNEL = "sse:presence-announce"
+
+# Сколько последних событий пары хранить для дозапроса по Last-Event-ID.
+# Пропущенные клики Heat не нужны; Словотрону достаточно последнего состояния.
+SSE_REPLAY_SIZES: dict[SSEChannel, int] = {
+    SSEChannel.HEAT: 0,
+    SSEChannel.SLOVOTRON: 1,
+    SSEChannel.AI_STICKER: 32,
+    SSEChannel.MESSAGE: 64,
+    SSEChannel.TTS: 64,
+}
+# Сколько живут буфер и счётчик id пары в Redis после последнего события
+# (в памяти — столько же, их раз в SSE_SWEEP_INTERVAL_S подчищает lifespan).
+SSE_REPLAY_TTL_S = 5 * 60
+SSE_SWEEP_INTERVAL_S = 60
+
+# Распределённый broadcast за один round trip и атомарно относительно других
+# инстансов: id события, запись в буфер дозапроса и PUBLISH.
+# KEYS[1] — последний id пары, KEYS[2] — буфер (список "id:data").
+# ARGV[1] — now (мс), ARGV[2] — data, ARGV[3] — размер буфера, ARGV[4] — TTL (с),
+# ARGV[5] — pub-канал, ARGV[6] — id инстанса-отправителя.
+_PUBLISH_EVENT_LUA = """
+local id = math.max((tonumber(redis.call('GET', KEYS[1])) or 0) + 1, tonumber(ARGV[1]))
+local sid = string.format('%d', id)
+redis.call('SET', KEYS[1], sid, 'EX', ARGV[4])
+if tonumber(ARGV[3]) > 0 then
+    redis.call('RPUSH', KEYS[2], sid .. ':' .. ARGV[2])
+    redis.call('LTRIM', KEYS[2], -tonumber(ARGV[3]), -1)
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+end
+redis.call('PUBLISH', ARGV[5], ARGV[6] .. ':' .. sid .. ':' .. ARGV[2])
+return id
+"""
+
+
 def _grace_key(user_id: int, channel: SSEChannel) -> str:
     return f"sse:grace:{user_id}:{channel.value}"
 
 
+def _presence_key(user_id: int, channel: SSEChannel) -> str:
+    return f"sse:presence:{user_id}:{channel.value}"
+
+
+def _seq_key(user_id: int, channel: SSEChannel) -> str:
+    return f"sse:seq:{user_id}:{channel.value}"
+
+
+def _replay_key(user_id: int, channel: SSEChannel) -> str:
+    return f"sse:replay:{user_id}:{channel.value}"
+
+
+def _pub_channel(user_id: int, channel: SSEChannel) -> str:
+    return f"{_PUB_PREFIX}{user_id}:{channel.value}"
+
+
+def _parse_pub_channel(name: str) -> tuple[int, SSEChannel] | None:
+    try:
+        user_id, channel = name[len(_PUB_PREFIX) :].split(":", 1)
+        return int(user_id), SSEChannel(channel)
+    except ValueError:
+        return None
+
+
+# Ёмкость очереди подключения и что делать при её переполнении — по каналам.
+# Зависшая вкладка OBS (свёрнута, заморожена, сломан прокси) иначе копит
+# сообщения в памяти сервера бесконечно.
+SSE_CHANNEL_POLICIES: dict[SSEChannel, tuple[SSEOverflowPolicy, int]] = {
+    # Клики Heat: поток, старые клики без свежих не нужны.
+    SSEChannel.HEAT: (SSEOverflowPolicy.DROP_OLDEST, 256),
+    # Состояние игры: оверлею достаточно последнего события.
+    SSEChannel.SLOVOTRON: (SSEOverflowPolicy.COALESCE_LATEST, 16),
+    # Оплаченные баллами стикеры/озвучки и сообщения терять молча нельзя.
+    SSEChannel.AI_STICKER: (SSEOverflowPolicy.DISCONNECT, 32),
+    SSEChannel.MESSAGE: (SSEOverflowPolicy.DISCONNECT, 64),
+    SSEChannel.TTS: (SSEOverflowPolicy.DISCONNECT, 64),
+}
+
+
+def _encode_frame(event_id: int, data: str) -> bytes:
+    return (f"id: {event_id}\n" + "".join(f"data: {line}\n" for line in data.splitlines()) + "\n").encode()
+
+
+@dataclass(frozen=True, slots=True)
+class SSEEvent:
+    id: int
+    data: str
+    # Готовый SSE-кадр: кодируется один раз на broadcast и один и тот же объект
+    # уходит во все очереди, а не форматируется заново каждым подключением.
+    frame: bytes = field(init=False, repr=False, compare=False)
+    # То же для WebSocket-транспорта (``routers/ws/overlay.py``): data в UTF-8.
+    payload: bytes = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "frame", _encode_frame(self.id, self.data))
+        object.__setattr__(self, "payload", self.data.encode())
+
+
+def _parse_event(raw: str) -> SSEEvent:
+    """``"id:data"`` (формат буфера и pub/sub) -> ``SSEEvent``."""
+    event_id, _, data = raw.partition(":")
+    return SSEEvent(id=int(event_id), data=data)
+
+
 @dataclass(eq=False)
 class SSEConnection:
-    queue: asyncio.Queue[str]
+    # ``None`` в очереди — сигнал генератору закрыть подключение.
+    queue: asyncio.Queue[SSEEvent | None]
+    policy: SSEOverflowPolicy = SSEOverflowPolicy.DROP_OLDEST
+    closed: bool = False
+    # Будится при каждом новом элементе очереди: WebSocket-подключение слушает
+    # несколько каналов (по SSEConnection на канал) одним ожиданием.
+    notify: asyncio.Event | None = None
 
     def __hash__(self):
         return id(self)
 
+    def resume(self, events: list[SSEEvent]) -> None:
+        """Ставит пропущенные клиентом события перед уже пришедшими.
+
+        Между регистрацией подключения и чтением буфера в очередь могли попасть
+        новые события (в т.ч. те же самые) — сливаем, убираем дубли по id и
+        упорядочиваем. Если всё не влезает в очередь — остаются самые свежие.
+        """
+        if self.closed or not events:
+            return
+        merged = {event.id: event for event in events}
+        while not self.queue.empty():
+            event = self.queue.get_nowait()
+            if event is not None:
+                merged[event.id] = event
+        for event in sorted(merged.values(), key=lambda e: e.id)[-self.queue.maxsize :]:
+            self.queue.put_nowait(event)
+        self._wake()
+
+    def _wake(self) -> None:
+        if self.notify is not None:
+            self.notify.set()
+
+    def offer(self, message: SSEEvent) -> int:
+        """Кладёт сообщение без ожидания; возвращает число выброшенных сообщений."""
+        if self.closed:
+            return 0
+        self._wake()
+        try:
+            self.queue.put_nowait(message)
+            return 0
+        except asyncio.QueueFull:
+            pass
+        if self.policy is SSEOverflowPolicy.DROP_OLDEST:
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            return 1
+        dropped = 0
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            dropped += 1
+        if self.policy is SSEOverflowPolicy.COALESCE_LATEST:
+            self.queue.put_nowait(message)
+            return dropped
+        self.closed = True
+        self.queue.put_nowait(None)
+        return dropped + 1
+
 
 class SSEManager:
-    def __init__(self, statistics: StatisticsService | None = None):
-        # user_id -> channel -> set[SSEConnection]
-        self._connections: dict[int, dict[SSEChannel, set[SSEConnection]]] = defaultdict(lambda: defaultdict(set))
+    def __init__(
+        self,
+        statistics: StatisticsService | None = None,
+        policies: dict[SSEChannel, tuple[SSEOverflowPolicy, int]] | None = None,
+        distributed: bool = False,
+    ):
+        # user_id -> channel -> frozenset[SSEConnection]. Copy-on-write: набор
+        # подключений не меняется на месте, а заменяется новым, и изменения идут
+        # без await внутри — поэтому broadcast/has_clients/snapshot читают его
+        # без блокировки, а не ждут общий на всех стримеров лок.
+        self._connections: dict[int, dict[SSEChannel, frozenset[SSEConnection]]] = {}
         self._heat_connections: dict[int, HeatUpstreamConnection] = {}
-        self._lock = asyncio.Lock()
         self._heat_lock = asyncio.Lock()
         self._r: aioredis.Redis | None = None
+        self._publish_event_script: AsyncScript | None = None
         self._statistics = statistics
+        self._policies = {**SSE_CHANNEL_POLICIES, **(policies or {})}
+        self._distributed = distributed
+        # Своё же опубликованное сообщение при получении из pub/sub пропускаем.
+        self._instance_id = uuid4().hex
+        self._pubsub: aioredis.client.PubSub | None = None
+        # Локальные id и буферы дозапроса (вне распределённого режима). Id не
+        # меньше времени события в мс, поэтому по нему же видно, когда пара затихла.
+        self._last_ids: dict[tuple[int, SSEChannel], int] = {}
+        self._replay: dict[tuple[int, SSEChannel], deque[SSEEvent]] = {}
+        # Для ``might_have_clients`` (monotonic): до какого момента пара считается
+        # подключённой после ухода своего последнего клиента и по анонсам других инстансов.
+        self._grace_until: dict[tuple[int, SSEChannel], float] = {}
+        self._remote_until: dict[tuple[int, SSEChannel], float] = {}
 
     async def startup(self, redis: aioredis.Redis) -> None:
         self._r = redis
-
-    async def connect(self, user_id: int, channel: SSEChannel) -> SSEConnection:
-        conn = SSEConnection(queue=asyncio.Queue())
-
-        async with self._lock:
-            self._connections[user_id][channel].add(conn)
+        self._publish_event_script = redis.register_script(_PUBLISH_EVENT_LUA)
+
+    async def connect(
+        self,
+        user_id: int,
+        channel: SSEChannel,
+        last_event_id: int | None = None,
+        notify: asyncio.Event | None = None,
+    ) -> SSEConnection:
+        policy, maxsize = self._policies[channel]
+        conn = SSEConnection(queue=asyncio.Queue(maxsize=maxsize), policy=policy, notify=notify)
+
+        channels = self._connections.setdefault(user_id, {})
+        conns = channels.get(channel, frozenset())
+        first = not conns
+        channels[channel] = conns | {conn}
+        self._grace_until.pop((user_id, channel), None)
+
+        if first and self._is_shared(channel):
+            await self._join(user_id, channel)
 
         # Новый коннект — грейс-ключ больше не нужен (есть живой клиент).
         if self._r is not None:
@@ -56,6 +281,10 @@ class SSEManager:
             except Exception:
                 logger.error("Error deleting SSE grace key", exc_info=True)
 
+        # Реконнект EventSource: досылаем то, что разослали, пока клиента не было.
+        if last_event_id is not None:
+            conn.resume(await self._replay_since(user_id, channel, last_event_id))
+
         if channel == SSEChannel.HEAT:
             await self._ensure_heat(user_id)
 
@@ -63,24 +292,24 @@ class SSEManager:
         return conn
 
     async def disconnect(self, user_id: int, channel: SSEChannel, conn: SSEConnection):
-        became_empty = False
-        async with self._lock:
-            channels = self._connections.get(user_id)
-            if not channels:
-                return
-
-            conns = channels.get(channel)
-            if not conns:
-                return
-
-            conns.discard(conn)
-
-            if not conns:
-                channels.pop(channel, None)
-                became_empty = True
+        channels = self._connections.get(user_id)
+        if not channels or conn not in channels.get(channel, ()):
+            return
 
+        conns = channels[channel] - {conn}
+        became_empty = not conns
+        if became_empty:
+            del channels[channel]
             if not channels:
                 self._connections.pop(user_id, None)
+        else:
+            channels[channel] = conns
+
+        if became_empty:
+            self._grace_until[(user_id, channel)] = monotonic() + SSE_GRACE_TTL_S
+
+        if became_empty and self._is_shared(channel):
+            await self._leave(user_id, channel)
 
         # Последний клиент ушёл — кладём грейс-ключ, чтобы в течение SSE_GRACE_TTL_S
         # секунд канал считался «подключённым» (на случай быстрого реконнекта OBS).
@@ -117,24 +346,99 @@ class SSEManager:
             await conn.stop()
 
     async def broadcast(self, user_id: int, channel: SSEChannel, message: str):
-        async with self._lock:
-            conns = list(self._connections.get(user_id, {}).get(channel, []))
-
+        if self._is_shared(channel) and self._publish_event_script is not None:
+            try:
+                event_id = await self._publish_event_script(
+                    keys=[_seq_key(user_id, channel), _replay_key(user_id, channel)],
+                    args=[
+                        int(time() * 1000),
+                        message,
+                        SSE_REPLAY_SIZES[channel],
+                        SSE_REPLAY_TTL_S,
+                        _pub_channel(user_id, channel),
+                        self._instance_id,
+                    ],
+                )
+                event = SSEEvent(id=int(event_id), data=message)
+            except Exception:
+                # Redis недоступен — свои клиенты всё равно должны получить событие.
+                logger.error("SSE publish failed user=%s channel=%s", user_id, channel, exc_info=True)
+                event = self._local_event(user_id, channel, message)
+        else:
+            event = self._local_event(user_id, channel, message)
+        await self._deliver(user_id, channel, event)
+
+    def _local_event(self, user_id: int, channel: SSEChannel, message: str) -> SSEEvent:
+        """Следующий id пары и запись в локальный буфер дозапроса."""
+        pair = (user_id, channel)
+        event_id = max(self._last_ids.get(pair, 0) + 1, int(time() * 1000))
+        self._last_ids[pair] = event_id
+        event = SSEEvent(id=event_id, data=message)
+        if size := SSE_REPLAY_SIZES[channel]:
+            buffer = self._replay.get(pair)
+            if buffer is None:
+                buffer = self._replay[pair] = deque(maxlen=size)
+            buffer.append(event)
+        return event
+
+    async def _replay_since(self, user_id: int, channel: SSEChannel, last_event_id: int) -> list[SSEEvent]:
+        if self._is_shared(channel) and self._r is not None:
+            try:
+                events = [_parse_event(raw) for raw in await self._r.lrange(_replay_key(user_id, channel), 0, -1)]
+            except Exception:
+                logger.error("Error reading SSE replay buffer", exc_info=True)
+                return []
+        else:
+            events = list(self._replay.get((user_id, channel), ()))
+        return [event for event in events if event.id > last_event_id]
+
+    async def _deliver(self, user_id: int, channel: SSEChannel, message: SSEEvent) -> None:
+        """Кладёт сообщение в очереди подключений этого инстанса."""
+        conns = self._connections.get(user_id, {}).get(channel)
         if not conns:
             return
 
         # payload = json.dumps(message, ensure_ascii=False)
 
+        dropped = 0
+        disconnected = 0
         for conn in conns:
             # не await — чтобы один зависший клиент не тормозил всех
-            conn.queue.put_nowait(message)
+            was_closed = conn.closed
+            dropped += conn.offer(message)
+            if conn.closed and not was_closed:
+                disconnected += 1
+                logger.warning("SSE client too slow, disconnecting user=%s channel=%s", user_id, channel)
+        if self._statistics is not None:
+            if dropped:
+                self._statistics.inc(StatsType.SSE_DROPPED, subtype=channel.value, amount=dropped)
+            if disconnected:
+                self._statistics.inc(StatsType.SSE_SLOW_DISCONNECTS, subtype=channel.value, amount=disconnected)
+
+    def might_have_clients(self, user_id: int, channel: SSEChannel) -> bool:
+        """Быстрая проверка без обращений к Redis для префильтра чата.
+
+        Может ответить «да» там, где ``has_clients`` скажет «нет» (анонс другого
+        инстанса ещё не протух), но не наоборот — точная проверка остаётся за ``has_clients``.
+        """
+        pair = (user_id, channel)
+        if self._connections.get(user_id, {}).get(channel):
+            return True
+        now = monotonic()
+        if self._grace_until.get(pair, 0) > now:
+            return True
+        return self._is_shared(channel) and self._remote_until.get(pair, 0) > now
 
     async def has_clients(self, user_id: int, channel: SSEChannel | None) -> bool:
         if channel is None:
-            return any(self._connections.get(user_id, {}).values())
+            if any(self._connections.get(user_id, {}).values()):
+                return True
+            return await self._has_remote_clients(user_id, *(ch for ch in SSEChannel if self._is_shared(ch)))
         # Быстрый путь: есть живой in-memory коннект.
         if bool(self._connections.get(user_id, {}).get(channel)):
             return True
+        if self._is_shared(channel) and await self._has_remote_clients(user_id, channel):
+            return True
         # Грейс-период: последний клиент отключился недавно — считаем «ещё подключён»,
         # чтобы микро-разрывы EventSource (OBS/браузер ~3с реконнект) не роняли награды.
         if self._r is not None:
@@ -144,6 +448,171 @@ class SSEManager:
                 logger.error("Error checking SSE grace key", exc_info=True)
         return False
 
+    # ------------------------------------------------------------------
+    # Распределённый режим
+    # ------------------------------------------------------------------
+
+    def _is_shared(self, channel: SSEChannel) -> bool:
+        return self._distributed and self._r is not None and channel not in SSE_LOCAL_CHANNELS
+
+    async def _join(self, user_id: int, channel: SSEChannel) -> None:
+        """Первый свой клиент пары: подписка на её канал и отметка присутствия."""
+        if self._r is None:
+            return
+        try:
+            if self._pubsub is not None:
+                await self._pubsub.subscribe(_pub_channel(user_id, channel))
+            key = _presence_key(user_id, channel)
+            async with self._r.pipeline(transaction=False) as pipe:
+                pipe.zadd(key, {self._instance_id: time()})
+                pipe.expire(key, SSE_PRESENCE_TTL_S)
+                pipe.publish(_PRESENCE_ANNOUNCE_CHANNEL, self._announcement(user_id, channel))
+                await pipe.execute()
+        except Exception:
+            logger.error("SSE join failed user=%s channel=%s", user_id, channel, exc_info=True)
+
+    async def _leave(self, user_id: int, channel: SSEChannel) -> None:
+        if self._r is None:
+            return
+        try:
+            if self._pubsub is not None:
+                await self._pubsub.unsubscribe(_pub_channel(user_id, channel))
+            await self._r.zrem(_presence_key(user_id, channel), self._instance_id)
+        except Exception:
+            logger.error("SSE leave failed user=%s channel=%s", user_id, channel, exc_info=True)
+
+    async def _has_remote_clients(self, user_id: int, *channels: SSEChannel) -> bool:
+        """Есть ли свежая отметка присутствия хоть по одному из каналов (один round trip)."""
+        if self._r is None or not channels:
+            return False
+        min_score = time() - SSE_PRESENCE_TTL_S
+        try:
+            async with self._r.pipeline(transaction=False) as pipe:
+                for channel in channels:
+                    pipe.zcount(_presence_key(user_id, channel), min_score, "+inf")
+                counts = await pipe.execute()
+        except Exception:
+            logger.error("Error checking SSE presence", exc_info=True)
+            return False
+        return any(count > 0 for count in counts)
+
+    def _local_pairs(self) -> list[tuple[int, SSEChannel]]:
+        return [
+            (user_id, channel)
+            for user_id, channels in self._connections.items()
+            for channel, conns in channels.items()
+            if conns and self._is_shared(channel)
+        ]
+
+    def _announcement(self, user_id: int, channel: SSEChannel) -> str:
+        return f"{self._instance_id}:{user_id}:{channel.value}"
+
+    def _on_announcement(self, data: str) -> None:
+        src, _, rest = data.partition(":")
+        if src == self._instance_id:
+            return
+        pair = _parse_pub_channel(_PUB_PREFIX + rest)
+        if pair is None:
+            logger.warning("Bad SSE presence announcement: %r", data)
+            return
+        # Чужой клиент мог уйти сразу после анонса — держим пару ещё и на время грейса.
+        self._remote_until[pair] = monotonic() + SSE_PRESENCE_TTL_S + SSE_GRACE_TTL_S
+
+    async def _presence_heartbeat(self) -> None:
+        if self._r is None:
+            return
+        while True:
+            await asyncio.sleep(SSE_PRESENCE_HEARTBEAT_S)
+            pairs = self._local_pairs()
+            if not pairs:
+                continue
+            now = time()
+            try:
+                async with self._r.pipeline(transaction=False) as pipe:
+                    for user_id, channel in pairs:
+                        key = _presence_key(user_id, channel)
+                        pipe.zadd(key, {self._instance_id: now})
+                        # Записи упавших инстансов (без ZREM на выходе) срезаем здесь.
+                        pipe.zremrangebyscore(key, "-inf", now - SSE_PRESENCE_TTL_S)
+                        pipe.expire(key, SSE_PRESENCE_TTL_S)
+                        pipe.publish(_PRESENCE_ANNOUNCE_CHANNEL, self._announcement(user_id, channel))
+                    await pipe.execute()
+            except Exception:
+                logger.error("SSE presence heartbeat failed", exc_info=True)
+
+    async def _listener(self) -> None:
+        if self._r is None:
+            return
+        while True:
+            self._pubsub = self._r.pubsub()
+            try:
+                # Переподписываемся на пары, у которых уже есть свои клиенты.
+                channels = [_pub_channel(user_id, channel) for user_id, channel in self._local_pairs()]
+                await self._pubsub.subscribe(_PRESENCE_ANNOUNCE_CHANNEL, *channels)
+                logger.info("Subscribed to SSE fan-out (%d pairs)", len(channels))
+                while True:
+                    message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    if message["channel"] == _PRESENCE_ANNOUNCE_CHANNEL:
+                        self._on_announcement(message["data"])
+                        continue
+                    src, _, raw = message["data"].partition(":")
+                    if src == self._instance_id:
+                        continue
+                    pair = _parse_pub_channel(message["channel"])
+                    if pair is None:
+                        logger.warning("Bad SSE fan-out channel: %r", message["channel"])
+                        continue
+                    await self._deliver(*pair, _parse_event(raw))
+            except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+                logger.warning(f"Ошибка соединения: {e}. Ожидание 5 секунд...")
+                await asyncio.sleep(5)
+            finally:
+                pubsub, self._pubsub = self._pubsub, None
+                await pubsub.aclose()
+
+    def _evict_stale(self) -> None:
+        """Забывает локальные id и буферы пар без событий дольше ``SSE_REPLAY_TTL_S``
+        (как TTL ключей в Redis) и истёкшие отметки для ``might_have_clients``."""
+        cutoff = int((time() - SSE_REPLAY_TTL_S) * 1000)
+        for pair in [pair for pair, last_id in self._last_ids.items() if last_id < cutoff]:
+            del self._last_ids[pair]
+            self._replay.pop(pair, None)
+        now = monotonic()
+        self._grace_until = {pair: until for pair, until in self._grace_until.items() if until > now}
+        self._remote_until = {pair: until for pair, until in self._remote_until.items() if until > now}
+
+    async def _sweeper(self) -> None:
+        while True:
+            await asyncio.sleep(SSE_SWEEP_INTERVAL_S)
+            self._evict_stale()
+
+    @asynccontextmanager
+    async def lifespan(self):
+        distributed = self._distributed and self._r is not None
+        background = [asyncio.create_task(self._sweeper())]
+        if distributed:
+            background += [
+                asyncio.create_task(self._listener()),
+                asyncio.create_task(self._presence_heartbeat()),
+            ]
+        try:
+            yield
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            pairs = self._local_pairs()
+            if pairs and self._r is not None:
+                try:
+                    async with self._r.pipeline(transaction=False) as pipe:
+                        for user_id, channel in pairs:
+                            pipe.zrem(_presence_key(user_id, channel), self._instance_id)
+                        await pipe.execute()
+                except Exception:
+                    logger.error("SSE presence cleanup failed", exc_info=True)
+
     async def snapshot(self) -> dict[str, int]:
         """Возвращает мгновенный снапшот активных SSE-подключений.
 
@@ -161,20 +630,19 @@ class SSEManager:
         Используется APScheduler-джобом ``snapshot_sse`` (раз в минуту) для
         метрики ``StatsType.SSE_CONNECTIONS`` (gauge).
         """
-        async with self._lock:
-            total = 0
-            unique_users: set[int] = set()
-            unique_pairs = 0
-            per_channel: dict[str, int] = defaultdict(int)
-            for user_id, channels in self._connections.items():
-                for channel, conns in channels.items():
-                    n = len(conns)
-                    if n == 0:
-                        continue
-                    total += n
-                    unique_users.add(user_id)
-                    unique_pairs += 1
-                    per_channel[channel.value] += n
+        total = 0
+        unique_users: set[int] = set()
+        unique_pairs = 0
+        per_channel: dict[str, int] = defaultdict(int)
+        for user_id, channels in self._connections.items():
+            for channel, conns in channels.items():
+                n = len(conns)
+                if n == 0:
+                    continue
+                total += n
+                unique_users.add(user_id)
+                unique_pairs += 1
+                per_channel[channel.value] += n
         result: dict[str, int] = {
             "total": total,
             "unique_users": len(unique_users),
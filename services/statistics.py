@@ -2,32 +2,48 @@
 
 Счётчики инкрементятся в Redis-хэшах (один хэш на 10-минутный бакет),
 а раз в 10 минут фоновый APScheduler-джоб ``flush_to_db`` заливает накопленные
-значения батчем в таблицу ``statistics`` (``ON CONFLICT DO UPDATE``).
+значения батчем в таблицу ``statistics`` (``ON CONFLICT DO UPDATE``). Хэши,
+ожидающие дампа, перечислены в ZSET-индексе ``statistics:bucket_index`` —
+``SCAN`` по всему keyspace не нужен.
 
 Уникальный индекс ``statistics_pk`` построен с ``NULLS NOT DISTINCT``, поэтому
 строки с ``channel_id=NULL`` корректно схлопываются при повторном INSERT.
 
-Все методы инкремента — fire-and-forget: вызываются через ``asyncio.create_task``
-в точках инкремента (см. ``twitch/chat/bot.py``, ``services/eventsub_service.py``),
-чтобы не блокировать основную обработку сообщений/наград.
+Методы инкремента не ходят в Redis: дельты копятся в in-process буфере, и один
+фоновый таск (см. ``lifespan``) раз в ``FLUSH_INTERVAL_SECONDS`` отправляет их
+одним пайплайном ``HINCRBY``/``PFADD``. На остановке буфер сбрасывается ещё раз.
+
+Топ «горячих» каналов/чаттеров/команд считается Space-Saving скетчами в памяти
+(``track_top``); прирост раз в секунду уходит в ZSET текущего бакета
+``statistics:top:<kind>:<ISO>``, откуда его читает ``get_top``.
+
+Параллельно те же события сразу отражаются в in-process Prometheus-метриках
+(``services/statistics_prometheus.py``) — для алертов с разрешением scrape'а.
 """
 
 import asyncio
 import logging
-from collections.abc import Callable
+import re
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
 from datetime import UTC, datetime, timedelta
+from time import monotonic, perf_counter
 from typing import Any
 
 import redis.asyncio as aioredis
 import sqlalchemy as sa
 from opentelemetry import trace
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.elements import Label
 
-from database.models import Statistics
-from schemas.api import StatsPeriod, StatsType
+from database.models import Statistics, StatisticsDaily, StatisticsHistogram, StatisticsHourly
+from schemas.api import StatsPeriod, StatsTopKind, StatsType
+from services.heavy_hitters import SpaceSaving
+from services.statistics_prometheus import StatsPrometheus, stats_prometheus
 from utils.enums import SSEChannel
 
 logger = logging.getLogger(__name__)
@@ -40,6 +56,15 @@ BUCKET_SECONDS = 10 * 60
 # Срок хранения исторических данных в БД.
 RETENTION_DAYS = 3 * 30  # ~3 месяца
 
+# ``statistics`` партиционирована по месяцам: ``statistics_pYYYY_MM``. Партиции
+# создаются на ``PARTITION_MONTHS_AHEAD`` месяцев вперёд.
+PARTITION_MONTHS_AHEAD = 2
+_PARTITION_NAME_RE = re.compile(r"^statistics_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+# Максимум строк в одном multi-row INSERT ``flush_to_db``: у Postgres лимит в
+# 32767 bind-параметров на запрос, у строки ``statistics`` их 6.
+DUMP_BATCH_ROWS = 1000
+
 # Параметры агрегации графиков: (шаг в секундах, максимальный запрашиваемый диапазон).
 # Границы периода выбраны так, чтобы объём ответа API оставался разумным.
 PERIOD_CONFIG: dict[StatsPeriod, tuple[int, timedelta]] = {
@@ -56,6 +81,8 @@ TIMING_TYPES: set[str] = {
     str(StatsType.MESSAGE_PROCESSING_TIME),
     str(StatsType.AI_STICKER_PROCESSING_TIME),
     str(StatsType.TTS_PROCESSING_TIME),
+    str(StatsType.STATS_FLUSH_TIME),
+    str(StatsType.EVENT_LOOP_LAG),
 }
 
 # Sum-метрики: ``value = sum(sum_ms)`` (суммарный объём, не среднее). ``count``
@@ -66,8 +93,33 @@ SUM_TYPES: set[str] = {str(StatsType.HEAT_PROXY_BYTES)}
 # Gauge-метрики: ``value = avg(count)`` внутри бакета агрегации. Хранят
 # мгновенное значение (snapshot), в Redis пишутся через ``hset`` (overwrite, не
 # инкремент), в БД — через ``ON CONFLICT DO UPDATE set count = EXCLUDED.count``
-# (перезапись, не сумма). SSE-подключения и активные каналы.
-GAUGE_TYPES: set[str] = {str(StatsType.SSE_CONNECTIONS), str(StatsType.ACTIVE_CHANNELS)}
+# (перезапись, не сумма). SSE-подключения и уникальные счётчики (HLL_TYPES —
+# для них avg — только запасной вариант, если HLL-ключей в Redis уже нет).
+GAUGE_TYPES: set[str] = {
+    str(StatsType.SSE_CONNECTIONS),
+    str(StatsType.ACTIVE_CHANNELS),
+    str(StatsType.UNIQUE_CHATTERS),
+    str(StatsType.UNIQUE_COMMAND_USERS),
+}
+
+# Уникальные счётчики на HyperLogLog (``mark_unique``): ``PFADD`` в ключи трёх
+# разрешений сразу, поэтому число уникальных за 1h/3h/6h/1d считается честным
+# объединением (``PFCOUNT`` по нескольким ключам = PFMERGE на лету), а не
+# усреднением 10-минутных значений.
+HLL_TYPES: set[str] = {
+    str(StatsType.ACTIVE_CHANNELS),
+    str(StatsType.UNIQUE_CHATTERS),
+    str(StatsType.UNIQUE_COMMAND_USERS),
+}
+
+# Разрешения HLL-ключей: (имя, длина бакета в секундах, TTL ключа в секундах).
+# TTL покрывает максимальный диапазон периодов, которые читают это разрешение
+# (см. ``PERIOD_CONFIG``): 10m — 1 день, 1h — до 30 дней (1h/3h/6h), 1d — 90 дней.
+HLL_RESOLUTIONS: tuple[tuple[str, int, int], ...] = (
+    ("10m", 10 * 60, (1 + 1) * 24 * 60 * 60),
+    ("1h", 60 * 60, (30 + 1) * 24 * 60 * 60),
+    ("1d", 24 * 60 * 60, (90 + 1) * 24 * 60 * 60),
+)
 
 # Подтипы ``sse_connections`` (snapshot от ``SSEManager.snapshot``) делятся на
 # служебные агрегаты (``total``, ``unique_users``, ``unique_pairs``) и
@@ -103,30 +155,73 @@ def _floor_to_bucket(dt: datetime, step_seconds: int) -> datetime:
     return epoch + timedelta(seconds=floored)
 
 
+def _add_months(dt: datetime, months: int) -> datetime:
+    """Начало месяца, отстоящего от месяца ``dt`` на ``months``."""
+    month = dt.month - 1 + months
+    return datetime(dt.year + month // 12, month % 12 + 1, 1, tzinfo=UTC)
+
+
+def _chunks(rows: list[dict[str, Any]], size: int) -> list[list[dict[str, Any]]]:
+    """Режет строки INSERT'а на пачки не длиннее ``size``."""
+    return [rows[i : i + size] for i in range(0, len(rows), size)]
+
+
 def _field_for(type_: str, subtype: str, channel_id: int | None) -> str:
     """Кодирует (type, subtype, channel_id) в имя поля Redis-хэша."""
     return f"{type_}:{subtype}:{'' if channel_id is None else channel_id}"
 
 
-def _value_expr_for(type_str: str) -> Label[Any]:
+# Таблица с агрегатами одной из трёх гранулярностей (исходная 10-минутная или rollup).
+_StatsTable = type[Statistics] | type[StatisticsHourly] | type[StatisticsDaily]
+
+# Источники графиков: (длина бакета таблицы в секундах, модель) — от крупной к
+# мелкой. Для шага периода берётся первая таблица, чей бакет делит шаг нацело.
+ROLLUP_TABLES: tuple[tuple[int, _StatsTable], ...] = (
+    (24 * 60 * 60, StatisticsDaily),
+    (60 * 60, StatisticsHourly),
+    (BUCKET_SECONDS, Statistics),
+)
+
+# Сколько последних часов ``rollup`` пересчитывает каждый запуск: бакеты
+# доливаются в ``statistics`` с опозданием до ``HASH_TTL_SECONDS`` (ретраи дампа).
+ROLLUP_LOOKBACK = timedelta(hours=3)
+
+
+def _table_for_step(step_seconds: int) -> _StatsTable:
+    """Самая крупная таблица агрегатов, подходящая для шага ``step_seconds``."""
+    return next(table for table_step, table in ROLLUP_TABLES if step_seconds % table_step == 0)
+
+
+def _samples_col(table: _StatsTable) -> Any:
+    """Число исходных 10-минутных строк в строке ``table`` (у самой ``statistics`` — 1)."""
+    if table is Statistics:
+        return sa.literal(1)
+    return table.samples
+
+
+def _value_expr_for(type_str: str, table: _StatsTable = Statistics) -> Label[Any]:
     """SQL-выражение для агрегированного ``value`` в зависимости от категории.
 
     - **Counter** (по умолчанию): ``sum(count)``.
-    - **Gauge** (``GAUGE_TYPES``): ``avg(count)`` — мгновенное значение за бакет
-      усредняется при схлопывании нескольких бакетов в один (period > 10m).
+    - **Gauge** (``GAUGE_TYPES``): среднее ``count`` по 10-минутным бакетам —
+      мгновенное значение усредняется при схлопывании нескольких бакетов в один
+      (period > 10m). Для rollup-таблиц — ``sum(count) / sum(samples)``.
     - **Timing** (``TIMING_TYPES``): ``sum(sum_ms) / sum(count)`` (avg).
     - **Sum** (``SUM_TYPES``): ``sum(sum_ms)`` (суммарный объём, не среднее).
     """
     if type_str in GAUGE_TYPES:
-        return sa.func.coalesce(sa.func.avg(Statistics.count), 0).label("value")
+        return sa.func.coalesce(
+            sa.cast(sa.func.sum(table.count), sa.Numeric) / sa.func.nullif(sa.func.sum(_samples_col(table)), 0),
+            0,
+        ).label("value")
     if type_str in TIMING_TYPES:
         return sa.func.coalesce(
-            sa.func.sum(Statistics.sum_ms) / sa.func.nullif(sa.func.sum(Statistics.count), 0),
+            sa.func.sum(table.sum_ms) / sa.func.nullif(sa.func.sum(table.count), 0),
             0,
         ).label("value")
     if type_str in SUM_TYPES:
-        return sa.func.coalesce(sa.func.sum(Statistics.sum_ms), 0).label("value")
-    return sa.func.coalesce(sa.func.sum(Statistics.count), 0).label("value")
+        return sa.func.coalesce(sa.func.sum(table.sum_ms), 0).label("value")
+    return sa.func.coalesce(sa.func.sum(table.count), 0).label("value")
 
 
 def _needs_empty_subtype_filter(type_str: str) -> bool:
@@ -145,6 +240,20 @@ def _needs_empty_subtype_filter(type_str: str) -> bool:
     return type_str in TIMING_TYPES or type_str in SUM_TYPES
 
 
+def _channel_clause(table: _StatsTable, type_str: str, channel_id: int | None) -> Any | None:
+    """Условие на ``channel_id`` для чтения ``table`` (``None`` — без условия).
+
+    Уникальные счётчики (``HLL_TYPES``) пишутся и общей строкой (``channel_id IS
+    NULL``), и по каналам с тем же type/subtype. Без канала читаем только общую:
+    иначе avg по бакету смешал бы общее число с поканальными.
+    """
+    if channel_id is not None:
+        return table.channel_id == channel_id
+    if type_str in HLL_TYPES:
+        return table.channel_id.is_(None)
+    return None
+
+
 # Суффикс, добавляемый к ``type_`` в имени Redis-поля для ``sum_ms`` timing-метрик.
 # Не содержит двоеточия, чтобы ``_parse_field`` не разбивал его на отдельный
 # subtype (баг, из-за которого sum_ms попадал в БД как строка с subtype="sum_ms"
@@ -152,6 +261,98 @@ def _needs_empty_subtype_filter(type_str: str) -> bool:
 # ``endswith(SUM_MS_SUFFIX)``.
 SUM_MS_SUFFIX = "__sum_ms"
 
+# Гистограммы латентности timing-метрик. Бакет ``i`` покрывает замеры
+# (2^(i-1), 2^i] мс (бакет 0 — всё до 1 мс включительно), последний бакет —
+# всё, что больше 2^(HIST_BUCKETS-2) мс (~2 мин). Номер бакета кодируется в
+# ``type_`` поля Redis-хэша: ``<type>__h<i>`` — без двоеточия, по той же
+# причине, что и ``SUM_MS_SUFFIX``.
+HIST_SUFFIX = "__h"
+HIST_BUCKETS = 19
+_HIST_FIELD_RE = re.compile(rf"^(?P<type>.+){HIST_SUFFIX}(?P<idx>\d+)$")
+
+
+def _hist_bucket(value_ms: int) -> int:
+    """Номер log-бакета гистограммы для замера ``value_ms``."""
+    if value_ms <= 1:
+        return 0
+    return min((int(value_ms) - 1).bit_length(), HIST_BUCKETS - 1)
+
+
+def _hist_bounds(idx: int) -> tuple[float, float]:
+    """Границы бакета ``idx`` в мс: ``(lo, hi]``. У последнего ``hi`` — удвоенный ``lo``."""
+    lo = 0.0 if idx == 0 else float(2 ** (idx - 1))
+    return lo, float(2**idx)
+
+
+def _percentile_from_hist(counts: dict[int, int], q: float) -> int:
+    """Оценка ``q``-перцентиля (0..100) по гистограмме ``{le_idx: count}``.
+
+    Внутри найденного бакета значение интерполируется линейно между его
+    границами — погрешность не больше ширины бакета (×2 от нижней границы).
+    """
+    total = sum(counts.values())
+    if total <= 0:
+        return 0
+    rank = q / 100 * total
+    seen = 0
+    for idx in sorted(counts):
+        count = counts[idx]
+        if count <= 0:
+            continue
+        if seen + count >= rank:
+            lo, hi = _hist_bounds(idx)
+            return round(lo + (hi - lo) * (rank - seen) / count)
+        seen += count
+    return round(_hist_bounds(max(counts))[1])
+
+
+def _lttb_indices(values: list[int], threshold: int) -> list[int]:
+    """Индексы точек, которые оставляет Largest-Triangle-Three-Buckets.
+
+    Точки графиков идут с равным шагом (пустые бакеты заполнены нулями),
+    поэтому x — просто индекс. Первая и последняя точки сохраняются всегда;
+    из каждой из ``threshold - 2`` корзин берётся точка, образующая
+    наибольший треугольник с предыдущей выбранной и средним следующей корзины.
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    sampled = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = (avg_start + avg_end - 1) / 2
+        avg_y = sum(values[avg_start:avg_end]) / (avg_end - avg_start)
+        ay = values[a]
+        best, best_area = int(i * every) + 1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((a - avg_x) * (values[j] - ay) - (a - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(best)
+        a = best
+    sampled.append(n - 1)
+    return sampled
+
+
+def _downsample_series(
+    series: list[tuple[str, list[tuple[datetime, int]]]], max_points: int | None
+) -> list[tuple[str, list[tuple[datetime, int]]]]:
+    """LTTB для нескольких рядов сразу: индексы выбираются по их сумме.
+
+    Фронт строит ось X по первому ряду, поэтому у всех рядов остаются одни и
+    те же бакеты.
+    """
+    if not max_points or not series:
+        return series
+    totals = [sum(values) for values in zip(*([value for _, value in points] for _, points in series), strict=True)]
+    indices = _lttb_indices(totals, max_points)
+    if len(indices) == len(totals):
+        return series
+    return [(name, [points[i] for i in indices]) for name, points in series]
+
 
 def _parse_field(field: str) -> tuple[str, str, int | None]:
     """Обратное преобразование имени поля хэша в кортеж."""
@@ -168,29 +369,66 @@ def _parse_field(field: str) -> tuple[str, str, int | None]:
 class StatisticsService:
     """Сервис агрегации метрик мониторинга: Redis-накопитель + Postgres-дампер.
 
-    Не хранит никаких долгоживущих счётчиков в памяти процесса — все инкременты
-    идут напрямую в Redis через ``hincrby`` (атомарно, O(1)). Это позволяет
-    запускать несколько инстансов бота без координации: каждый инкрементит общий
-    Redis, а ``flush_to_db`` джоб (один на всю установку, т.к. планировщик с
+    Не хранит долгоживущих счётчиков в памяти процесса — только дельты за
+    последнюю секунду, которые ``flush`` отправляет в Redis через ``hincrby``
+    (атомарно). Это позволяет запускать несколько инстансов бота без
+    координации: каждый инкрементит общий Redis, а ``flush_to_db`` джоб (один на всю установку, т.к. планировщик с
     SQLAlchemyJobStore) заливает накопленное в БД.
     """
 
     HASH_KEY_PREFIX = "statistics:bucket:"
-    # Префикс для Redis-множеств (SET) активных каналов: один SET на бакет и
-    # направление (incoming/outgoing), член множества — twitch_id канала.
-    # SCARD даёт число уникальных каналов, которое пишется в БД как count.
-    CHANNELS_KEY_PREFIX = "statistics:channels:"
+    # ZSET хэшей бакетов, ещё не записанных в БД: member — ключ хэша, score —
+    # unix-время начала бакета. Пополняется при каждом сбросе буфера в Redis.
+    BUCKET_INDEX_KEY = "statistics:bucket_index"
+    # HLL-ключи уникальных счётчиков: ``statistics:hll:<res>:<ISO бакета>:<поле>``,
+    # где поле — как в хэше бакета (``type:subtype:channel_id``).
+    HLL_KEY_PREFIX = "statistics:hll:"
+    # SET 10-минутных HLL-ключей, которые ещё не записаны в БД (``flush_to_db``).
+    HLL_PENDING_KEY = "statistics:hll_pending"
     # TTL на flush-ключи в Redis — чтобы при сбоях дампа мусор не копился.
     HASH_TTL_SECONDS = 2 * 60 * 60  # 2 часа
-
-    def __init__(self, db_session_factory: Callable[[], AsyncSession]) -> None:
+    # Как часто in-process буфер инкрементов сбрасывается в Redis.
+    FLUSH_INTERVAL_SECONDS = 1
+    # Топ «горячих» элементов: ``statistics:top:<kind>:<ISO бакета>`` (ZSET
+    # item -> count). Скетч на инстанс держит TOP_CAPACITY счётчиков, ZSET
+    # бакета обрезается до TOP_KEEP, живёт как 10-минутные HLL-ключи.
+    TOP_KEY_PREFIX = "statistics:top:"
+    TOP_CAPACITY = 100
+    TOP_KEEP = 200
+    TOP_TTL_SECONDS = 2 * 24 * 60 * 60
+    # Номер «поколения» данных в БД: INCR после каждого ``flush_to_db``/``rollup``.
+    # Кеш ответов ``get_chart*`` в памяти процесса валиден, пока номер не сменился
+    # (проверка — один GET в Redis вместо запроса в Postgres).
+    GENERATION_KEY = "statistics:generation"
+    CHART_CACHE_SIZE = 256
+    CHART_CACHE_TTL_SECONDS = BUCKET_SECONDS
+
+    def __init__(
+        self,
+        db_session_factory: Callable[[], AsyncSession],
+        prometheus: StatsPrometheus | None = stats_prometheus,
+    ) -> None:
         self._db = db_session_factory
+        self._prom = prometheus
         self._r: Redis | None = None
         # Храним ссылки на fire-and-forget таски, чтобы их не убил GC.
         self._tasks: set[asyncio.Task[Any]] = set()
+        # Буфер инкрементов до сброса в Redis: (бакет, поле хэша) -> дельта и
+        # (бакет, поле) -> элементы для PFADD. Без блокировок: всё в одном
+        # event loop'е, а ``flush`` подменяет словари целиком.
+        self._pending: dict[tuple[datetime, str], int] = {}
+        self._pending_unique: dict[tuple[datetime, str], set[str]] = {}
+        # Скетчи топа текущего бакета и ещё не отправленный в Redis прирост
+        # (в том числе от предыдущего бакета после его смены).
+        self._top: dict[str, SpaceSaving] = {}
+        self._top_bucket: datetime | None = None
+        self._pending_top: dict[tuple[datetime, str], dict[str, int]] = {}
+        # Кеш графиков: ключ запроса -> (поколение, истекает в monotonic, ответ).
+        self._chart_cache: OrderedDict[tuple[Any, ...], tuple[str, float, Any]] = OrderedDict()
 
     async def startup(self, redis: aioredis.Redis) -> None:
         self._r = redis
+        await self._index_legacy_buckets()
         logger.info("StatisticsService started")
 
     # ------------------------------------------------------------------
@@ -204,20 +442,20 @@ class StatisticsService:
         channel_id: int | None = None,
         amount: int = 1,
     ) -> None:
-        """Fire-and-forget инкремент счётчика на ``amount``.
+        """Инкремент счётчика на ``amount`` (в буфер, без похода в Redis).
 
-        Безопасно вызывать из горячих путей обработки сообщений: не блокирует
-        вызывающий код. Исключения логируются (не всплывают), чтобы падение
-        Redis не роняло обработку чата. ``amount`` по умолчанию = 1; для
-        byte-счётчиков можно передать размер сообщения.
+        Безопасно вызывать из горячих путей обработки сообщений: только пишет
+        дельту в in-process буфер, в Redis её отправит ``flush``. ``amount`` по
+        умолчанию = 1; для byte-счётчиков можно передать размер сообщения.
         """
+        type_ = str(type_)
+        if self._prom is not None:
+            self._prom.inc(type_, subtype, amount)
         if self._r is None:
             # Сервис ещё не стартовал (или Redis умер при init) — теряем метрику.
             return
-        coro = self._inc(str(type_), subtype, channel_id, amount)
-        task = asyncio.create_task(coro)
-        self._tasks.add(task)
-        task.add_done_callback(self._tasks.discard)
+        bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
+        self._add_pending(bucket, _field_for(type_, subtype, channel_id), amount)
 
     def inc_timing(
         self,
@@ -226,7 +464,7 @@ class StatisticsService:
         value_ms: int = 0,
         channel_id: int | None = None,
     ) -> None:
-        """Fire-and-forget замер времени: инкремент count и sum_ms.
+        """Замер времени: инкремент count и sum_ms (в буфер, как и ``inc``).
 
         Аналогично ``inc``, но в Redis-хэше инкрементит сразу два поля — ``count``
         (число замеров) и ``sum_ms`` (суммарное время в мс). При ``flush_to_db``
@@ -235,98 +473,154 @@ class StatisticsService:
 
         Та же механика используется для sum-метрик (``SUM_TYPES``), где ``count``
         — число событий, а ``sum_ms`` — суммарный объём (например, байты Heat).
+
+        Для timing-метрик (``TIMING_TYPES``) ещё инкрементится log-бакет
+        гистограммы (``<type>__h<i>``) — из них ``get_percentiles`` считает p50/p95/p99.
         """
+        type_ = str(type_)
+        if self._prom is not None:
+            if type_ in SUM_TYPES:
+                self._prom.add_amount(type_, subtype, value_ms)
+            else:
+                self._prom.observe_ms(type_, subtype, value_ms)
         if self._r is None:
             return
-        coro = self._inc_timing(str(type_), subtype, channel_id, value_ms)
-        task = asyncio.create_task(coro)
-        self._tasks.add(task)
-        task.add_done_callback(self._tasks.discard)
+        bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
+        self._add_pending(bucket, _field_for(type_, subtype, channel_id), 1)
+        # sum_ms-поле: type_ + SUM_MS_SUFFIX (без двоеточия внутри), чтобы
+        # _parse_field не разбил суффикс в отдельный subtype (старый баг:
+        # sum_ms попадал в БД как строка с subtype="sum_ms" и писался в count).
+        self._add_pending(bucket, _field_for(f"{type_}{SUM_MS_SUFFIX}", subtype, channel_id), value_ms)
+        if type_ in TIMING_TYPES:
+            # Гистограмма — только для времени: у sum-метрик (байты) хвосты не нужны.
+            hist_type = f"{type_}{HIST_SUFFIX}{_hist_bucket(value_ms)}"
+            self._add_pending(bucket, _field_for(hist_type, subtype, channel_id), 1)
+
+    def _add_pending(self, bucket: datetime, field: str, amount: int) -> None:
+        key = (bucket, field)
+        self._pending[key] = self._pending.get(key, 0) + amount
+
+    # ------------------------------------------------------------------
+    # Сброс буфера в Redis
+    # ------------------------------------------------------------------
+
+    async def flush(self) -> None:
+        """Отправляет накопленные дельты и отметки каналов в Redis одним пайплайном.
 
-    async def _inc(self, type_: str, subtype: str, channel_id: int | None, amount: int = 1) -> None:
+        Буферы подменяются на пустые до первого ``await``, так что инкременты,
+        пришедшие во время записи, попадут в следующий сброс. При ошибке Redis
+        дельты возвращаются в буфер (суммируются с новыми) — ничего не теряется.
+        """
         if self._r is None:
             return
+        self._collect_top_deltas()
+        if not self._pending and not self._pending_unique and not self._pending_top:
+            return
+        pending, self._pending = self._pending, {}
+        pending_unique, self._pending_unique = self._pending_unique, {}
+        pending_top, self._pending_top = self._pending_top, {}
         try:
-            bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
-            key = self._bucket_key(bucket)
-            field = _field_for(type_, subtype, channel_id)
             pipe = self._r.pipeline(transaction=False)
-            pipe.hincrby(key, field, amount)
-            pipe.expire(key, self.HASH_TTL_SECONDS)
+            self._queue_counters(pipe, pending)
+            self._queue_unique(pipe, pending_unique)
+            self._queue_top(pipe, pending_top)
             await pipe.execute()
         except Exception:
-            logger.error("Statistics inc failed for type=%s subtype=%s", type_, subtype, exc_info=True)
-
-    async def _inc_timing(self, type_: str, subtype: str, channel_id: int | None, value_ms: int) -> None:
-        if self._r is None:
-            return
-        try:
-            bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
+            logger.error("Statistics flush to Redis failed, will retry", exc_info=True)
+            for (bucket, field), amount in pending.items():
+                self._add_pending(bucket, field, amount)
+            for key, members in pending_unique.items():
+                self._pending_unique.setdefault(key, set()).update(members)
+            for key, deltas in pending_top.items():
+                self._merge_top_deltas(key, deltas)
+
+    def _queue_counters(self, pipe: Pipeline, pending: dict[tuple[datetime, str], int]) -> None:
+        """HINCRBY дельт в хэши бакетов и регистрация бакетов в индексе."""
+        bucket_keys: dict[str, datetime] = {}
+        for (bucket, field), amount in pending.items():
             key = self._bucket_key(bucket)
-            count_field = _field_for(type_, subtype, channel_id)
-            # sum_ms-поле: type_ + SUM_MS_SUFFIX (без двоеточия внутри), чтобы
-            # _parse_field не разбил суффикс в отдельный subtype (старый баг:
-            # sum_ms попадал в БД как строка с subtype="sum_ms" и писался в count).
-            sum_ms_field = _field_for(f"{type_}{SUM_MS_SUFFIX}", subtype, channel_id)
-            pipe = self._r.pipeline(transaction=False)
-            pipe.hincrby(key, count_field, 1)
-            pipe.hincrby(key, sum_ms_field, value_ms)
+            pipe.hincrby(key, field, amount)
+            bucket_keys[key] = bucket
+        for key in bucket_keys:
             pipe.expire(key, self.HASH_TTL_SECONDS)
-            await pipe.execute()
-        except Exception:
-            logger.error(
-                "Statistics inc_timing failed for type=%s subtype=%s",
-                type_,
-                subtype,
-                exc_info=True,
-            )
+        if bucket_keys:
+            pipe.zadd(self.BUCKET_INDEX_KEY, {key: bucket.timestamp() for key, bucket in bucket_keys.items()})
+
+    def _queue_unique(self, pipe: Pipeline, pending_unique: dict[tuple[datetime, str], set[str]]) -> None:
+        """PFADD во все разрешения HLL; 10-минутный ключ ждёт ``flush_to_db``."""
+        for (bucket, field), members in pending_unique.items():
+            for res, res_seconds, ttl in HLL_RESOLUTIONS:
+                key = self._hll_key(res, _floor_to_bucket(bucket, res_seconds), field)
+                pipe.pfadd(key, *members)
+                pipe.expire(key, ttl)
+            pipe.sadd(self.HLL_PENDING_KEY, self._hll_key("10m", bucket, field))
+
+    def _queue_top(self, pipe: Pipeline, pending_top: dict[tuple[datetime, str], dict[str, int]]) -> None:
+        """ZINCRBY в топы бакетов с обрезкой до ``TOP_KEEP``."""
+        for (bucket, kind), deltas in pending_top.items():
+            key = self._top_key(kind, bucket)
+            for item, delta in deltas.items():
+                pipe.zincrby(key, delta, item)
+            pipe.zremrangebyrank(key, 0, -self.TOP_KEEP - 1)
+            pipe.expire(key, self.TOP_TTL_SECONDS)
+
+    async def _flusher(self) -> None:
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL_SECONDS)
+            await self.flush()
+
+    @asynccontextmanager
+    async def lifespan(self):
+        flusher = asyncio.create_task(self._flusher())
+        try:
+            yield
+        finally:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+            # Последний сброс: инкременты, накопленные с прошлого тика, не теряем.
+            await self.flush()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _top_key(self, kind: str, bucket: datetime) -> str:
+        return f"{self.TOP_KEY_PREFIX}{kind}:{bucket.strftime('%Y-%m-%dT%H:%M:%S')}"
 
     def _bucket_key(self, bucket: datetime) -> str:
         return self.HASH_KEY_PREFIX + bucket.strftime("%Y-%m-%dT%H:%M:%S")
 
-    def _channels_key(self, subtype: str, bucket: datetime) -> str:
-        """Ключ SET-а уникальных каналов для направления ``subtype`` и бакета."""
-        return self.CHANNELS_KEY_PREFIX + subtype + ":" + bucket.strftime("%Y-%m-%dT%H:%M:%S")
+    def _hll_key(self, res: str, bucket: datetime, field: str) -> str:
+        return f"{self.HLL_KEY_PREFIX}{res}:{bucket.strftime('%Y-%m-%dT%H:%M:%S')}:{field}"
 
     # ------------------------------------------------------------------
-    # Уникальные каналы (SET-based метрика)
+    # Уникальные счётчики (HyperLogLog)
     # ------------------------------------------------------------------
 
-    def mark_channel(
+    def mark_unique(
         self,
-        subtype: str,
-        channel_id: int,
+        type_: str | StatsType,
+        member: str | int,
+        subtype: str = "",
+        channel_id: int | None = None,
     ) -> None:
-        """Fire-and-forget: добавляет ``channel_id`` в SET уникальных каналов.
+        """Отмечает ``member`` в уникальном счётчике ``type_`` (через буфер).
 
-        Используется для метрики ``ACTIVE_CHANNELS``: в конце бакета ``SCARD``
-        даёт число уникальных каналов, на которых были сообщения (входящие или
-        исходящие — определяется ``subtype``).
+        Метрики из ``HLL_TYPES``: ``flush`` делает ``PFADD`` сразу в 10m/1h/1d
+        ключи, ``flush_to_db`` пишет ``PFCOUNT`` закрывшегося 10-минутного бакета
+        в ``statistics``, а ``get_chart`` для длинных периодов объединяет HLL.
         """
         if self._r is None:
             return
-        coro = self._mark_channel(subtype, channel_id)
-        task = asyncio.create_task(coro)
-        self._tasks.add(task)
-        task.add_done_callback(self._tasks.discard)
+        bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
+        field = _field_for(str(type_), subtype, channel_id)
+        self._pending_unique.setdefault((bucket, field), set()).add(str(member))
 
-    async def _mark_channel(self, subtype: str, channel_id: int) -> None:
-        if self._r is None:
-            return
-        try:
-            bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
-            key = self._channels_key(subtype, bucket)
-            pipe = self._r.pipeline(transaction=False)
-            pipe.sadd(key, str(channel_id))
-            pipe.expire(key, self.HASH_TTL_SECONDS)
-            await pipe.execute()
-        except Exception:
-            logger.error(
-                "Statistics mark_channel failed for subtype=%s channel=%s",
-                subtype,
-                channel_id,
-                exc_info=True,
-            )
+    def mark_channel(
+        self,
+        subtype: str,
+        channel_id: int,
+    ) -> None:
+        """Метрика ``ACTIVE_CHANNELS``: канал, на котором были входящие/исходящие сообщения."""
+        self.mark_unique(StatsType.ACTIVE_CHANNELS, channel_id, subtype=subtype)
 
     def set_gauge(
         self,
@@ -344,10 +638,12 @@ class StatisticsService:
         Используется для SSE-подключений: раз в минуту APScheduler-джоб делает
         snapshot ``SSEManager`` и вызывает этот метод.
         """
-        if self._r is None:
-            return
         if not values:
             return
+        if self._prom is not None:
+            self._prom.set_gauge(str(type_), values)
+        if self._r is None:
+            return
         coro = self._set_gauge(str(type_), values)
         task = asyncio.create_task(coro)
         self._tasks.add(task)
@@ -371,10 +667,70 @@ class StatisticsService:
             if zero_fields:
                 pipe.hdel(key, *zero_fields)
             pipe.expire(key, self.HASH_TTL_SECONDS)
+            pipe.zadd(self.BUCKET_INDEX_KEY, {key: bucket.timestamp()})
             await pipe.execute()
         except Exception:
             logger.error("Statistics set_gauge failed for type=%s", type_, exc_info=True)
 
+    # ------------------------------------------------------------------
+    # Топ «горячих» элементов (Space-Saving)
+    # ------------------------------------------------------------------
+
+    def track_top(self, kind: str | StatsTopKind, item: str, weight: int = 1) -> None:
+        """Учитывает ``item`` в топе ``kind`` текущего бакета (только память процесса).
+
+        При смене бакета скетчи начинаются заново, а невыгруженный прирост
+        старого бакета остаётся в буфере и уходит в его ZSET.
+        """
+        if self._r is None:
+            return
+        bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
+        if bucket != self._top_bucket:
+            self._collect_top_deltas()
+            self._top = {}
+            self._top_bucket = bucket
+        kind = str(kind)
+        sketch = self._top.get(kind)
+        if sketch is None:
+            sketch = self._top[kind] = SpaceSaving(self.TOP_CAPACITY)
+        sketch.add(item, weight)
+
+    def _collect_top_deltas(self) -> None:
+        if self._top_bucket is None:
+            return
+        for kind, sketch in self._top.items():
+            deltas = sketch.take_deltas()
+            if deltas:
+                self._merge_top_deltas((self._top_bucket, kind), deltas)
+
+    def _merge_top_deltas(self, key: tuple[datetime, str], deltas: dict[str, int]) -> None:
+        buf = self._pending_top.setdefault(key, {})
+        for item, delta in deltas.items():
+            buf[item] = buf.get(item, 0) + delta
+
+    async def get_top(self, kind: str | StatsTopKind, minutes: int = 10, limit: int = 20) -> list[tuple[str, int]]:
+        """Топ-``limit`` элементов ``kind`` за последние ``minutes`` минут (по 10-минутным бакетам).
+
+        Объединяет ZSET'ы бакетов, попадающих в окно (включая текущий), через
+        ``ZUNION``. Без Redis или при ошибке — пустой список.
+        """
+        if self._r is None:
+            return []
+        now = datetime.now(UTC)
+        bucket = _floor_to_bucket(now - timedelta(minutes=minutes), BUCKET_SECONDS)
+        current = _floor_to_bucket(now, BUCKET_SECONDS)
+        keys = []
+        while bucket <= current:
+            keys.append(self._top_key(str(kind), bucket))
+            bucket += timedelta(seconds=BUCKET_SECONDS)
+        try:
+            items = await self._r.zunion(keys, withscores=True)
+        except Exception:
+            logger.error("Statistics: ZUNION of top keys failed for kind=%s", kind, exc_info=True)
+            return []
+        # ZUNION отдаёт по возрастанию score.
+        return [(item, int(score)) for item, score in reversed(items[-limit:])]
+
     # ------------------------------------------------------------------
     # Дамп в БД
     # ------------------------------------------------------------------
@@ -383,109 +739,254 @@ class StatisticsService:
     async def flush_to_db(self) -> None:
         """Сливает все завершённые бакеты из Redis в таблицу ``statistics``.
 
-        Бакеты «старше текущего» (т.е. уже не накапливающие данные) выбираются
-        через SCAN, для каждого ``HGETALL`` + батч ``INSERT ... ON CONFLICT DO
-        UPDATE``. Текущий (ещё живой) бакет пропускается — его польют в следующий
-        запуск. Идемпотентен: повторный запуск по тем же ключам безопасен благодаря
-        ``ON CONFLICT`` (данные в Redis не удаляются до успешного INSERT).
+        Закрывшиеся бакеты (т.е. уже не накапливающие данные) берутся из
+        ``BUCKET_INDEX_KEY`` одним ``ZRANGEBYSCORE``, их хэши читаются одним
+        пайплайном ``HGETALL``, а строки всех бакетов уходят в БД одним
+        ``INSERT ... ON CONFLICT DO UPDATE`` на вид строк (counter/gauge/гистограмма).
+        Если общая транзакция упала — бакеты пишутся по одному. Текущий бакет не
+        трогается — его польют в следующий запуск. Данные в Redis удаляются только
+        после commit (``DEL`` + ``ZREM`` в ``MULTI``).
 
-        Аналогично обрабатываются SET-ключи ``statistics:channels:*``: для каждого
-        ``SCARD`` (число уникальных каналов) записывается в ``count`` с
-        ``type=active_channels`` и ``subtype=incoming``/``outgoing``.
+        Для уникальных счётчиков (``HLL_TYPES``) в ``count`` пишется ``PFCOUNT``
+        закрывшихся 10-минутных HLL-ключей (см. ``_flush_unique``).
+
+        Длительность прогона пишется timing-метрикой ``STATS_FLUSH_TIME``.
         """
         if self._r is None:
             logger.warning("StatisticsService.flush_to_db called before startup")
             return
+        started = perf_counter()
         current_bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
+        dumped = await self._dump_buckets(current_bucket)
+        # Уникальные счётчики (HLL) закрывшихся бакетов.
+        await self._flush_unique(current_bucket)
+        await self._bump_generation()
+        elapsed_ms = round((perf_counter() - started) * 1000)
+        self.inc_timing(StatsType.STATS_FLUSH_TIME, value_ms=elapsed_ms)
+        logger.info("Statistics flush: %d buckets dumped in %d ms", dumped, elapsed_ms)
+
+    async def _dump_buckets(self, current_bucket: datetime) -> int:
+        """Дамп закрывшихся бакетов из ``BUCKET_INDEX_KEY``; возвращает число ключей."""
+        if self._r is None:
+            return 0
         try:
-            keys = [k async for k in self._r.scan_iter(match=f"{self.HASH_KEY_PREFIX}*")]
+            # "(" — строго меньше: текущий бакет ещё накапливается.
+            keys = await self._r.zrangebyscore(self.BUCKET_INDEX_KEY, "-inf", f"({current_bucket.timestamp()}")
         except Exception:
-            logger.error("Statistics flush: scan_iter failed", exc_info=True)
-            return
-
-        for key in keys:
-            if isinstance(key, bytes):
-                key_str = key.decode("utf-8")
-            else:
-                key_str = key
-            bucket = self._parse_bucket_key(key_str)
-            if bucket is None:
-                continue
-            if bucket >= current_bucket:
-                # Текущий бакет ещё накапливается — пропускаем.
+            logger.error("Statistics flush: ZRANGEBYSCORE of bucket index failed", exc_info=True)
+            return 0
+        if not keys:
+            return 0
+        try:
+            async with self._r.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hgetall(key)
+                raws = await pipe.execute()
+        except Exception:
+            logger.error("Statistics flush: HGETALL failed", exc_info=True)
+            return 0
+
+        # key -> (строки statistics, строки гистограмм). Непарсящийся ключ или хэш,
+        # истёкший по TTL, в БД не пишем — просто убираем из индекса.
+        buckets: dict[str, tuple[list[dict[str, Any]], list[dict[str, Any]]]] = {}
+        for key, raw in zip(keys, raws, strict=True):
+            bucket = self._parse_bucket_key(key)
+            if bucket is None or not raw:
+                buckets[key] = ([], [])
                 continue
-            await self._dump_one(key_str, bucket)
+            buckets[key] = (self._build_rows_from_hash(raw, bucket), self._build_hist_rows_from_hash(raw, bucket))
+
+        dumped = await self._write_buckets(buckets)
+        if not dumped:
+            return 0
+        try:
+            # Хэши и их записи в индексе убираются вместе: либо бакет ещё ждёт
+            # дампа и есть в индексе, либо его нет нигде.
+            async with self._r.pipeline(transaction=True) as pipe:
+                pipe.delete(*dumped)
+                pipe.zrem(self.BUCKET_INDEX_KEY, *dumped)
+                await pipe.execute()
+        except Exception:
+            logger.error("Statistics flush: cannot remove dumped buckets from Redis", exc_info=True)
+        return len(dumped)
 
-        # SET-метрика активных каналов.
-        await self._flush_channels(current_bucket)
+    async def _write_buckets(self, buckets: dict[str, tuple[list[dict[str, Any]], list[dict[str, Any]]]]) -> list[str]:
+        """Пишет бакеты в БД; возвращает ключи тех, что записаны.
 
-    async def _flush_channels(self, current_bucket: datetime) -> None:
-        """Обрабатывает ``statistics:channels:*`` SET-ключи и заливает SCARD в БД."""
-        if self._r is None:
-            return
+        Сначала всё одной транзакцией. Если она упала, одна «ядовитая» строка не
+        должна держать все бакеты: пишем их по одному, несохранившиеся остаются в
+        индексе до следующего запуска.
+        """
         try:
-            ch_keys = [k async for k in self._r.scan_iter(match=f"{self.CHANNELS_KEY_PREFIX}*")]
+            await self._write_rows(
+                [row for rows, _ in buckets.values() for row in rows],
+                [row for _, hist_rows in buckets.values() for row in hist_rows],
+            )
+            return list(buckets)
         except Exception:
-            logger.error("Statistics flush: channels scan_iter failed", exc_info=True)
-            return
-        for key in ch_keys:
-            if isinstance(key, bytes):
-                key_str = key.decode("utf-8")
-            else:
-                key_str = key
-            subtype, bucket = self._parse_channels_key(key_str)
-            if subtype is None or bucket is None:
-                continue
-            if bucket >= current_bucket:
+            logger.error(
+                "Statistics flush: DB insert failed for %d buckets, retrying one by one", len(buckets), exc_info=True
+            )
+        dumped: list[str] = []
+        for key, (rows, hist_rows) in buckets.items():
+            try:
+                await self._write_rows(rows, hist_rows)
+            except Exception:
+                logger.error("Statistics flush: DB insert failed for bucket %s", key, exc_info=True)
                 continue
-            await self._dump_channels_set(key_str, subtype, bucket)
+            dumped.append(key)
+        return dumped
+
+    async def _write_rows(self, rows: list[dict[str, Any]], hist_rows: list[dict[str, Any]]) -> None:
+        """Пишет строки бакетов в ``statistics``/``statistics_histogram`` одной транзакцией."""
+        if not rows and not hist_rows:
+            return
+        # Разделяем gauge (перезапись) и counter (сумма) строки.
+        gauge_rows = [r for r in rows if r["type"] in GAUGE_TYPES]
+        counter_rows = [r for r in rows if r["type"] not in GAUGE_TYPES]
+        async with self._db() as session:
+            for chunk in _chunks(counter_rows, DUMP_BATCH_ROWS):
+                stmt_counter = (
+                    pg_insert(Statistics)
+                    .values(chunk)
+                    .on_conflict_do_update(
+                        index_elements=["bucket_ts", "type", "subtype", "channel_id"],
+                        set_={
+                            "count": Statistics.__table__.c.count + pg_insert(Statistics).excluded.count,
+                            "sum_ms": Statistics.__table__.c.sum_ms + pg_insert(Statistics).excluded.sum_ms,
+                        },
+                    )
+                )
+                await session.execute(stmt_counter)
+            for chunk in _chunks(gauge_rows, DUMP_BATCH_ROWS):
+                # Gauge: перезаписываем count, не суммируем (мгновенное значение).
+                stmt_gauge = (
+                    pg_insert(Statistics)
+                    .values(chunk)
+                    .on_conflict_do_update(
+                        index_elements=["bucket_ts", "type", "subtype", "channel_id"],
+                        set_={"count": pg_insert(Statistics).excluded.count},
+                    )
+                )
+                await session.execute(stmt_gauge)
+            for chunk in _chunks(hist_rows, DUMP_BATCH_ROWS):
+                stmt_hist = (
+                    pg_insert(StatisticsHistogram)
+                    .values(chunk)
+                    .on_conflict_do_update(
+                        index_elements=["bucket_ts", "type", "subtype", "channel_id", "le_idx"],
+                        set_={
+                            "count": StatisticsHistogram.__table__.c.count
+                            + pg_insert(StatisticsHistogram).excluded.count,
+                        },
+                    )
+                )
+                await session.execute(stmt_hist)
+            await session.commit()
 
-    async def _dump_one(self, key: str, bucket: datetime) -> None:
+    async def _index_legacy_buckets(self) -> None:
+        """Добавляет в ``BUCKET_INDEX_KEY`` хэши бакетов, записанные до появления индекса.
+
+        Одноразовый ``SCAN`` на старте: такие ключи живут не дольше
+        ``HASH_TTL_SECONDS``, так что после первого деплоя индекс полон сам.
+        """
         if self._r is None:
             return
         try:
-            raw = await self._r.hgetall(key)
+            mapping: dict[str, float] = {}
+            async for key in self._r.scan_iter(match=f"{self.HASH_KEY_PREFIX}*"):
+                bucket = self._parse_bucket_key(key)
+                if bucket is not None:
+                    mapping[key] = bucket.timestamp()
+            if mapping:
+                await self._r.zadd(self.BUCKET_INDEX_KEY, mapping)
         except Exception:
-            logger.error("Statistics flush: HGETALL failed for %s", key, exc_info=True)
+            logger.error("Statistics: indexing legacy bucket keys failed", exc_info=True)
+
+    async def _flush_unique(self, current_bucket: datetime) -> None:
+        """Пишет ``PFCOUNT`` закрывшихся 10-минутных HLL-ключей в ``statistics``.
+
+        Ключи не удаляются (нужны ``get_chart`` до истечения TTL) — из
+        ``HLL_PENDING_KEY`` убираются только успешно записанные.
+        """
+        if self._r is None:
             return
-        if not raw:
+        ready = await self._closed_hll_keys(current_bucket)
+        if not ready:
             return
-        rows = self._build_rows_from_hash(raw, bucket)
-        if not rows:
+        rows = await self._hll_count_rows(ready)
+        if rows is None:
             return
-        # Разделяем gauge (перезапись) и counter (сумма) строки.
-        gauge_rows = [r for r in rows if r["type"] in GAUGE_TYPES]
-        counter_rows = [r for r in rows if r["type"] not in GAUGE_TYPES]
         try:
-            async with self._db() as session:
-                if counter_rows:
-                    stmt_counter = (
+            if rows:
+                async with self._db() as session:
+                    stmt = (
                         pg_insert(Statistics)
-                        .values(counter_rows)
-                        .on_conflict_do_update(
-                            index_elements=["bucket_ts", "type", "subtype", "channel_id"],
-                            set_={
-                                "count": Statistics.__table__.c.count + pg_insert(Statistics).excluded.count,
-                                "sum_ms": Statistics.__table__.c.sum_ms + pg_insert(Statistics).excluded.sum_ms,
-                            },
-                        )
-                    )
-                    await session.execute(stmt_counter)
-                if gauge_rows:
-                    # Gauge: перезаписываем count, не суммируем (мгновенное значение).
-                    stmt_gauge = (
-                        pg_insert(Statistics)
-                        .values(gauge_rows)
+                        .values(rows)
                         .on_conflict_do_update(
                             index_elements=["bucket_ts", "type", "subtype", "channel_id"],
                             set_={"count": pg_insert(Statistics).excluded.count},
                         )
                     )
-                    await session.execute(stmt_gauge)
-                await session.commit()
-            await self._r.delete(key)
+                    await session.execute(stmt)
+                    await session.commit()
+            await self._r.srem(self.HLL_PENDING_KEY, *[key for key, _, _ in ready])
         except Exception:
-            logger.error("Statistics flush: DB insert failed for bucket=%s", bucket.isoformat(), exc_info=True)
+            logger.error("Statistics flush: HLL DB insert failed", exc_info=True)
+
+    async def _closed_hll_keys(self, current_bucket: datetime) -> list[tuple[str, datetime, str]]:
+        """10-минутные HLL-ключи из ``HLL_PENDING_KEY`` старше ``current_bucket``: (ключ, бакет, поле)."""
+        if self._r is None:
+            return []
+        try:
+            keys = await self._r.smembers(self.HLL_PENDING_KEY)
+        except Exception:
+            logger.error("Statistics flush: SMEMBERS of HLL pending set failed", exc_info=True)
+            return []
+        prefix = f"{self.HLL_KEY_PREFIX}10m:"
+        ready: list[tuple[str, datetime, str]] = []
+        for key in keys:
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            # <prefix><ISO>:<field>; ISO содержит ":", поэтому режем по длине.
+            ts_str, field = key[len(prefix) : len(prefix) + 19], key[len(prefix) + 20 :]
+            try:
+                bucket = datetime.strptime(ts_str, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=UTC)
+            except ValueError:
+                logger.warning("Statistics flush: cannot parse HLL key %s", key)
+                await self._r.srem(self.HLL_PENDING_KEY, key)
+                continue
+            if bucket < current_bucket:
+                ready.append((key, bucket, field))
+        return ready
+
+    async def _hll_count_rows(self, ready: list[tuple[str, datetime, str]]) -> list[dict[str, Any]] | None:
+        """``PFCOUNT`` ключей одним пайплайном -> строки для INSERT; ``None`` при ошибке Redis."""
+        if self._r is None:
+            return None
+        try:
+            async with self._r.pipeline(transaction=False) as pipe:
+                for key, _, _ in ready:
+                    pipe.pfcount(key)
+                counts = await pipe.execute()
+        except Exception:
+            logger.error("Statistics flush: PFCOUNT failed", exc_info=True)
+            return None
+        rows = []
+        for (_, bucket, field), count in zip(ready, counts, strict=True):
+            type_, subtype, channel_id = _parse_field(field)
+            if count:
+                rows.append(
+                    {
+                        "bucket_ts": bucket,
+                        "type": type_,
+                        "subtype": subtype,
+                        "channel_id": channel_id,
+                        "count": count,
+                        "sum_ms": 0,
+                    }
+                )
+        return rows
 
     @staticmethod
     def _build_rows_from_hash(raw: dict[Any, Any], bucket: datetime) -> list[dict[str, Any]]:
@@ -509,6 +1010,9 @@ class StatisticsService:
             except ValueError:
                 continue
             type_, subtype, channel_id = _parse_field(field)
+            if _HIST_FIELD_RE.match(type_):
+                # Бакеты гистограмм пишутся отдельно (``_build_hist_rows_from_hash``).
+                continue
             if type_.endswith(SUM_MS_SUFFIX):
                 base_type = type_[: -len(SUM_MS_SUFFIX)]
                 sum_ms[(base_type, subtype, channel_id)] = ivalue
@@ -547,6 +1051,35 @@ class StatisticsService:
             )
         return rows
 
+    @staticmethod
+    def _build_hist_rows_from_hash(raw: dict[Any, Any], bucket: datetime) -> list[dict[str, Any]]:
+        """Строки ``statistics_histogram`` из полей ``<type>__h<i>`` HGETALL-ответа."""
+        rows: list[dict[str, Any]] = []
+        for field, value in raw.items():
+            if isinstance(field, bytes):
+                field = field.decode("utf-8")
+            if isinstance(value, bytes):
+                value = value.decode("utf-8")
+            type_, subtype, channel_id = _parse_field(field)
+            m = _HIST_FIELD_RE.match(type_)
+            if m is None:
+                continue
+            try:
+                count = int(value)
+            except ValueError:
+                continue
+            rows.append(
+                {
+                    "bucket_ts": bucket,
+                    "type": m["type"],
+                    "subtype": subtype,
+                    "channel_id": channel_id,
+                    "le_idx": int(m["idx"]),
+                    "count": count,
+                }
+            )
+        return rows
+
     def _parse_bucket_key(self, key: str) -> datetime | None:
         if not key.startswith(self.HASH_KEY_PREFIX):
             return None
@@ -557,77 +1090,127 @@ class StatisticsService:
             logger.warning("Statistics flush: cannot parse bucket key %s", key)
             return None
 
-    def _parse_channels_key(self, key: str) -> tuple[str | None, datetime | None]:
-        """Парсит ``statistics:channels:<subtype>:<ISO>`` → (subtype, bucket)."""
-        if not key.startswith(self.CHANNELS_KEY_PREFIX):
-            return None, None
-        rest = key[len(self.CHANNELS_KEY_PREFIX) :]
-        # subtype не содержит ":", поэтому split(":", 1) корректен.
-        if ":" not in rest:
-            return None, None
-        subtype, ts_str = rest.split(":", 1)
-        try:
-            bucket = datetime.strptime(ts_str, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=UTC)
-        except ValueError:
-            logger.warning("Statistics flush: cannot parse channels key %s", key)
-            return None, None
-        return subtype, bucket
+    # ------------------------------------------------------------------
+    # Rollup: часовые и суточные агрегаты
+    # ------------------------------------------------------------------
 
-    async def _dump_channels_set(self, key: str, subtype: str, bucket: datetime) -> None:
-        """Считает SCARD и пишет строку с type=active_channels, count=scard."""
-        if self._r is None:
-            return
-        try:
-            count = await self._r.scard(key)
-        except Exception:
-            logger.error("Statistics flush: SCARD failed for %s", key, exc_info=True)
-            return
-        if count == 0:
-            # Пустой SET (не было сообщений) — не пишем строку, чтобы не плодить
-            # нули; zero-fill в get_chart отрисует пропуск как 0.
-            await self._r.delete(key)
-            return
+    @tracer.start_as_current_span("Statistics: rollup")
+    async def rollup(self) -> None:
+        """Пересчитывает ``statistics_hourly`` и ``statistics_daily`` за последние бакеты.
+
+        Запускается после ``flush_to_db``. Каждый раз пересобирает часы за
+        ``ROLLUP_LOOKBACK`` (туда могли долиться опоздавшие бакеты) и сутки, в
+        которые они попадают, из часовых агрегатов. Пустая rollup-таблица
+        заполняется по всей истории. Идемпотентен: строки перезаписываются.
+        """
+        since_hour = _floor_to_bucket(datetime.now(UTC) - ROLLUP_LOOKBACK, 60 * 60)
+        since_day = _floor_to_bucket(since_hour, 24 * 60 * 60)
         try:
             async with self._db() as session:
-                stmt = (
-                    pg_insert(Statistics)
-                    .values(
-                        {
-                            "bucket_ts": bucket,
-                            "type": str(StatsType.ACTIVE_CHANNELS),
-                            "subtype": subtype,
-                            "channel_id": None,
-                            "count": count,
-                            "sum_ms": 0,
-                        }
-                    )
-                    .on_conflict_do_update(
-                        index_elements=["bucket_ts", "type", "subtype", "channel_id"],
-                        set_={"count": pg_insert(Statistics).excluded.count},
-                    )
-                )
-                await session.execute(stmt)
+                await self._rollup_into(session, StatisticsHourly, Statistics, 60 * 60, since_hour)
+                await self._rollup_into(session, StatisticsDaily, StatisticsHourly, 24 * 60 * 60, since_day)
                 await session.commit()
-            await self._r.delete(key)
         except Exception:
-            logger.error(
-                "Statistics flush: channels DB insert failed for bucket=%s subtype=%s",
-                bucket.isoformat(),
-                subtype,
-                exc_info=True,
-            )
+            logger.error("Statistics rollup failed", exc_info=True)
+            return
+        await self._bump_generation()
+
+    @staticmethod
+    async def _rollup_into(
+        session: AsyncSession,
+        target: type[StatisticsHourly] | type[StatisticsDaily],
+        source: _StatsTable,
+        step_seconds: int,
+        since: datetime,
+    ) -> None:
+        """``INSERT ... SELECT`` агрегатов ``source`` по бакетам ``step_seconds`` в ``target``."""
+        is_empty = (await session.execute(sa.select(target.id).limit(1))).first() is None
+        bucket_expr = sa.func.date_bin(
+            sa.text(f"'{step_seconds} seconds'"),
+            source.bucket_ts,
+            sa.text("timestamp '2000-01-01 00:00:00+00'"),
+        )
+        select = sa.select(
+            bucket_expr,
+            source.type,
+            source.subtype,
+            source.channel_id,
+            sa.func.sum(source.count),
+            sa.func.sum(sa.func.coalesce(source.sum_ms, 0)),
+            sa.func.sum(_samples_col(source)),
+        ).group_by(bucket_expr, source.type, source.subtype, source.channel_id)
+        if not is_empty:
+            select = select.where(source.bucket_ts >= since)
+        stmt = pg_insert(target).from_select(
+            ["bucket_ts", "type", "subtype", "channel_id", "count", "sum_ms", "samples"],
+            select,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["bucket_ts", "type", "subtype", "channel_id"],
+            set_={"count": stmt.excluded.count, "sum_ms": stmt.excluded.sum_ms, "samples": stmt.excluded.samples},
+        )
+        await session.execute(stmt)
 
     # ------------------------------------------------------------------
-    # Очистка старых данных
+    # Партиции и очистка старых данных
     # ------------------------------------------------------------------
 
+    async def ensure_partitions(self) -> None:
+        """Создаёт месячные партиции ``statistics`` на ``PARTITION_MONTHS_AHEAD`` вперёд.
+
+        Запускается при старте и раз в сутки; существующие партиции не трогает.
+        Каждый месяц — в своей транзакции: ошибка на одном (например, строки
+        default-партиции попадают в его диапазон) не откатывает остальные.
+        """
+        month = _add_months(datetime.now(UTC), 0)
+        for _ in range(PARTITION_MONTHS_AHEAD + 1):
+            next_month = _add_months(month, 1)
+            name = f"statistics_p{month:%Y_%m}"
+            try:
+                async with self._db() as session:
+                    await session.execute(
+                        sa.text(
+                            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF statistics "
+                            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+                        )
+                    )
+                    await session.commit()
+                logger.info("Statistics: partition %s ensured", name)
+            except Exception:
+                logger.error("Statistics: creating partition %s failed", name, exc_info=True)
+            month = next_month
+
     @tracer.start_as_current_span("Statistics: retention cleanup")
     async def cleanup_old_data(self) -> None:
-        """Удаляет строки старше ``RETENTION_DAYS`` (запускается раз в сутки)."""
+        """Удаляет данные старше ``RETENTION_DAYS`` (запускается раз в сутки).
+
+        Из ``statistics`` — ``DROP TABLE`` месячных партиций, целиком вышедших за
+        срок хранения (без DELETE и bloat'а); из default-партиции и остальных
+        таблиц — обычным DELETE.
+        """
+        cutoff = datetime.now(UTC) - timedelta(days=RETENTION_DAYS)
         try:
             async with self._db() as session:
-                cutoff = datetime.now(UTC) - timedelta(days=RETENTION_DAYS)
-                await session.execute(sa.delete(Statistics).where(Statistics.bucket_ts < cutoff))
+                partitions = await session.execute(
+                    sa.text(
+                        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                        "WHERE i.inhparent = 'statistics'::regclass"
+                    )
+                )
+                for (name,) in partitions.all():
+                    m = _PARTITION_NAME_RE.match(name)
+                    if m is None:
+                        continue
+                    month = datetime(int(m["year"]), int(m["month"]), 1, tzinfo=UTC)
+                    if _add_months(month, 1) <= cutoff:
+                        logger.info("Statistics: dropping partition %s", name)
+                        await session.execute(sa.text(f"DROP TABLE {name}"))
+                await session.execute(
+                    sa.text("DELETE FROM statistics_default WHERE bucket_ts < :cutoff"), {"cutoff": cutoff}
+                )
+                await session.execute(sa.delete(StatisticsHistogram).where(StatisticsHistogram.bucket_ts < cutoff))
+                await session.execute(sa.delete(StatisticsHourly).where(StatisticsHourly.bucket_ts < cutoff))
+                await session.execute(sa.delete(StatisticsDaily).where(StatisticsDaily.bucket_ts < cutoff))
                 await session.commit()
         except Exception:
             logger.error("Statistics cleanup failed", exc_info=True)
@@ -636,6 +1219,50 @@ class StatisticsService:
     # Чтение для графика
     # ------------------------------------------------------------------
 
+    # ------------------------------------------------------------------
+    # Кеш ответов графиков
+    # ------------------------------------------------------------------
+
+    async def _generation(self) -> str | None:
+        """Текущее поколение данных; ``None`` — Redis недоступен (кеш не используем)."""
+        if self._r is None:
+            return None
+        try:
+            return await self._r.get(self.GENERATION_KEY) or "0"
+        except Exception:
+            logger.warning("Statistics: cannot read chart cache generation", exc_info=True)
+            return None
+
+    async def _bump_generation(self) -> None:
+        if self._r is None:
+            return
+        try:
+            await self._r.incr(self.GENERATION_KEY)
+        except Exception:
+            logger.error("Statistics: cannot bump chart cache generation", exc_info=True)
+
+    async def _cached(self, key: tuple[Any, ...], compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Ответ графика из кеша или ``compute()``.
+
+        Ключ содержит уже выровненный по бакетам диапазон, поэтому опросы
+        дашборда внутри одного бакета попадают в одну запись. Запись живёт, пока
+        не сменилось поколение (новый дамп в БД), но не дольше
+        ``CHART_CACHE_TTL_SECONDS``.
+        """
+        generation = await self._generation()
+        if generation is not None:
+            entry = self._chart_cache.get(key)
+            if entry is not None and entry[0] == generation and entry[1] > monotonic():
+                self._chart_cache.move_to_end(key)
+                return entry[2]
+        value = await compute()
+        if generation is not None:
+            self._chart_cache[key] = (generation, monotonic() + self.CHART_CACHE_TTL_SECONDS, value)
+            self._chart_cache.move_to_end(key)
+            while len(self._chart_cache) > self.CHART_CACHE_SIZE:
+                self._chart_cache.popitem(last=False)
+        return value
+
     @staticmethod
     def _normalize_range(
         dt_from: datetime | None,
@@ -713,6 +1340,7 @@ class StatisticsService:
         period: StatsPeriod = StatsPeriod.TEN_MIN,
         dt_from: datetime | None = None,
         dt_to: datetime | None = None,
+        max_points: int | None = None,
     ) -> list[tuple[datetime, int]]:
         """Возвращает ряд точек (bucket_ts, value) для графика.
 
@@ -724,6 +1352,9 @@ class StatisticsService:
         Гарантированно заполняет нулями пустые бакеты внутри запрошенного
         диапазона (даже те, для которых в БД нет строк) — чтобы на фронте
         график был непрерывным.
+
+        ``max_points`` — прорядить ряд LTTB до стольких точек (после кеша:
+        в кеше лежит полный ряд).
         """
         step_seconds, max_window = PERIOD_CONFIG[period]
         type_str = str(type_)
@@ -733,6 +1364,28 @@ class StatisticsService:
             return []
         start, end = rng
 
+        points = await self._cached(
+            ("chart", type_str, subtype, channel_id, step_seconds, start, end),
+            lambda: self._chart_points(type_str, subtype, channel_id, start, end, step_seconds),
+        )
+        if max_points:
+            points = [points[i] for i in _lttb_indices([value for _, value in points], max_points)]
+        return points
+
+    async def _chart_points(
+        self,
+        type_str: str,
+        subtype: str | None,
+        channel_id: int | None,
+        start: datetime,
+        end: datetime,
+        step_seconds: int,
+    ) -> list[tuple[datetime, int]]:
+        if type_str in HLL_TYPES:
+            hll_points = await self._hll_chart(type_str, subtype or "", channel_id, start, end, step_seconds)
+            if hll_points is not None:
+                return hll_points
+
         rows = await self._query_rows(
             type_str=type_str,
             subtype_filter=subtype,
@@ -760,6 +1413,45 @@ class StatisticsService:
             cur = cur + timedelta(seconds=step_seconds)
         return result
 
+    async def _hll_chart(
+        self,
+        type_str: str,
+        subtype: str,
+        channel_id: int | None,
+        start: datetime,
+        end: datetime,
+        step_seconds: int,
+    ) -> list[tuple[datetime, int]] | None:
+        """Точки уникального счётчика из HLL-ключей: ``PFCOUNT`` по всем ключам бакета.
+
+        Берётся самое крупное разрешение, на которое делится ``step_seconds``
+        (3h = 3 часовых ключа и т.п.). ``None`` — Redis недоступен или диапазон
+        старше TTL ключей: тогда ``get_chart`` читает ``statistics`` (avg).
+        """
+        if self._r is None:
+            return None
+        res, res_seconds, ttl = next(r for r in reversed(HLL_RESOLUTIONS) if step_seconds % r[1] == 0)
+        if start < datetime.now(UTC) - timedelta(seconds=ttl - res_seconds):
+            return None
+        field = _field_for(type_str, subtype, channel_id)
+        buckets: list[datetime] = []
+        try:
+            async with self._r.pipeline(transaction=False) as pipe:
+                cur = start
+                while cur < end:
+                    keys = [
+                        self._hll_key(res, cur + timedelta(seconds=offset), field)
+                        for offset in range(0, step_seconds, res_seconds)
+                    ]
+                    pipe.pfcount(*keys)
+                    buckets.append(cur)
+                    cur = cur + timedelta(seconds=step_seconds)
+                counts = await pipe.execute()
+        except Exception:
+            logger.error("Statistics: HLL chart query failed for type=%s", type_str, exc_info=True)
+            return None
+        return [(bucket, int(count)) for bucket, count in zip(buckets, counts, strict=True)]
+
     async def _query_rows(
         self,
         *,
@@ -777,35 +1469,123 @@ class StatisticsService:
 
         Категория метрики (counter/gauge/timing/sum) определяется автоматически
         через ``_value_expr_for(type_str)`` — вызывающий код не передаёт флаги.
+        Для шагов, кратных часу/суткам, читает rollup-таблицы (``_table_for_step``).
         """
+        table = _table_for_step(step_seconds)
         try:
             async with self._db() as session:
                 bucket_expr = sa.func.date_bin(
                     sa.text(f"'{step_seconds} seconds'"),
-                    Statistics.bucket_ts,
+                    table.bucket_ts,
                     sa.text("timestamp '2000-01-01 00:00:00+00'"),
                 ).label("bucket")
-                value_expr = _value_expr_for(type_str)
+                value_expr = _value_expr_for(type_str, table)
                 stmt = (
                     sa.select(bucket_expr, value_expr)
-                    .where(Statistics.type == type_str)
-                    .where(Statistics.bucket_ts >= start)
-                    .where(Statistics.bucket_ts < end)
+                    .where(table.type == type_str)
+                    .where(table.bucket_ts >= start)
+                    .where(table.bucket_ts < end)
                     .group_by(bucket_expr)
                     .order_by(bucket_expr)
                 )
                 if subtype_filter is not None:
-                    stmt = stmt.where(Statistics.subtype == subtype_filter)
+                    stmt = stmt.where(table.subtype == subtype_filter)
                 elif _needs_empty_subtype_filter(type_str):
-                    stmt = stmt.where(Statistics.subtype == "")
-                if channel_id is not None:
-                    stmt = stmt.where(Statistics.channel_id == channel_id)
+                    stmt = stmt.where(table.subtype == "")
+                if (channel_clause := _channel_clause(table, type_str, channel_id)) is not None:
+                    stmt = stmt.where(channel_clause)
                 result = await session.execute(stmt)
                 return [(row[0], int(row[1] or 0)) for row in result.all()]
         except Exception:
             logger.error("Statistics get_chart query failed", exc_info=True)
             return []
 
+    # ------------------------------------------------------------------
+    # Перцентили timing-метрик (по гистограммам)
+    # ------------------------------------------------------------------
+
+    @tracer.start_as_current_span("Statistics: get percentiles")
+    async def get_percentiles(
+        self,
+        type_: str | StatsType,
+        *,
+        percentiles: list[int],
+        subtype: str | None = None,
+        channel_id: int | None = None,
+        period: StatsPeriod = StatsPeriod.TEN_MIN,
+        dt_from: datetime | None = None,
+        dt_to: datetime | None = None,
+        max_points: int | None = None,
+    ) -> list[tuple[str, list[tuple[datetime, int]]]]:
+        """Ряды перцентилей (мс) timing-метрики: ``[("p50", points), ("p95", points), ...]``.
+
+        Гистограммы 10-минутных бакетов внутри каждого бакета агрегации
+        суммируются, перцентиль считается по суммарной гистограмме (усреднять
+        перцентили соседних бакетов нельзя). Пустые бакеты — 0, как в ``get_chart``.
+        """
+        step_seconds, max_window = PERIOD_CONFIG[period]
+        type_str = str(type_)
+
+        rng = self._compute_bucket_range(dt_from, dt_to, max_window, step_seconds)
+        if rng is None:
+            return []
+        start, end = rng
+
+        series = await self._cached(
+            ("percentiles", type_str, tuple(percentiles), subtype, channel_id, step_seconds, start, end),
+            lambda: self._percentile_series(type_str, percentiles, subtype, channel_id, start, end, step_seconds),
+        )
+        return _downsample_series(series, max_points)
+
+    async def _percentile_series(
+        self,
+        type_str: str,
+        percentiles: list[int],
+        subtype: str | None,
+        channel_id: int | None,
+        start: datetime,
+        end: datetime,
+        step_seconds: int,
+    ) -> list[tuple[str, list[tuple[datetime, int]]]]:
+        hists: dict[datetime, dict[int, int]] = {}
+        try:
+            async with self._db() as session:
+                bucket_expr = sa.func.date_bin(
+                    sa.text(f"'{step_seconds} seconds'"),
+                    StatisticsHistogram.bucket_ts,
+                    sa.text("timestamp '2000-01-01 00:00:00+00'"),
+                ).label("bucket")
+                stmt = (
+                    sa.select(bucket_expr, StatisticsHistogram.le_idx, sa.func.sum(StatisticsHistogram.count))
+                    .where(StatisticsHistogram.type == type_str)
+                    .where(StatisticsHistogram.bucket_ts >= start)
+                    .where(StatisticsHistogram.bucket_ts < end)
+                    .group_by(bucket_expr, StatisticsHistogram.le_idx)
+                )
+                if subtype is not None:
+                    stmt = stmt.where(StatisticsHistogram.subtype == subtype)
+                if channel_id is not None:
+                    stmt = stmt.where(StatisticsHistogram.channel_id == channel_id)
+                result = await session.execute(stmt)
+                for bucket_ts, le_idx, count in result.all():
+                    floored = _floor_to_bucket(bucket_ts, step_seconds)
+                    hist = hists.setdefault(floored, {})
+                    hist[le_idx] = hist.get(le_idx, 0) + int(count or 0)
+        except Exception:
+            logger.error("Statistics get_percentiles query failed", exc_info=True)
+            return []
+
+        series: list[tuple[str, list[tuple[datetime, int]]]] = []
+        for q in percentiles:
+            points: list[tuple[datetime, int]] = []
+            cur = start
+            while cur < end:
+                hist = hists.get(cur)
+                points.append((cur, _percentile_from_hist(hist, q) if hist else 0))
+                cur = cur + timedelta(seconds=step_seconds)
+            series.append((f"p{q}", points))
+        return series
+
     # ------------------------------------------------------------------
     # Multi-line series (топ-N подтипов на одном графике)
     # ------------------------------------------------------------------
@@ -820,6 +1600,7 @@ class StatisticsService:
         dt_from: datetime | None = None,
         dt_to: datetime | None = None,
         top_n: int = 10,
+        max_points: int | None = None,
     ) -> list[tuple[str, list[tuple[datetime, int]]]]:
         """Возвращает топ-N подтипов с рядами точек для multi-line графика.
 
@@ -830,7 +1611,8 @@ class StatisticsService:
         длину и были выровнены по оси X.
 
         Возвращает список ``(subtype, [(bucket_ts, value), ...])``, упорядоченный
-        по убыванию суммарного значения подтипа (топ-N).
+        по убыванию суммарного значения подтипа (топ-N). ``max_points`` —
+        прорядить ряды LTTB (одни и те же бакеты для всех рядов).
         """
         step_seconds, max_window = PERIOD_CONFIG[period]
         type_str = str(type_)
@@ -843,6 +1625,21 @@ class StatisticsService:
         if top_n < 1:
             top_n = 10
 
+        series = await self._cached(
+            ("series", type_str, channel_id, top_n, step_seconds, start, end),
+            lambda: self._series(type_str, channel_id, start, end, step_seconds, top_n),
+        )
+        return _downsample_series(series, max_points)
+
+    async def _series(
+        self,
+        type_str: str,
+        channel_id: int | None,
+        start: datetime,
+        end: datetime,
+        step_seconds: int,
+        top_n: int,
+    ) -> list[tuple[str, list[tuple[datetime, int]]]]:
         # Шаг 1: топ-N подтипов по суммарному count/sum_ms за диапазон.
         top_subtypes = await self._query_top_subtypes(
             type_str=type_str,
@@ -850,6 +1647,7 @@ class StatisticsService:
             start=start,
             end=end,
             top_n=top_n,
+            step_seconds=step_seconds,
         )
         if not top_subtypes:
             return []
@@ -894,6 +1692,7 @@ class StatisticsService:
         start: datetime,
         end: datetime,
         top_n: int,
+        step_seconds: int = BUCKET_SECONDS,
     ) -> list[str]:
         """Возвращает топ-N подтипов по суммарному значению за диапазон.
 
@@ -901,30 +1700,31 @@ class StatisticsService:
         ``sum(sum_ms)``, для sum — ``sum(sum_ms)``, для counter — ``sum(count)``.
         Топ-N определяется по «объёму» за весь диапазон.
         """
+        table = _table_for_step(step_seconds)
         try:
             async with self._db() as session:
                 if type_str in GAUGE_TYPES:
-                    value_col = sa.func.avg(Statistics.count)
+                    value_col = sa.func.sum(table.count) / sa.func.nullif(sa.func.sum(_samples_col(table)), 0)
                 elif type_str in TIMING_TYPES or type_str in SUM_TYPES:
-                    value_col = sa.func.sum(Statistics.sum_ms)
+                    value_col = sa.func.sum(table.sum_ms)
                 else:
-                    value_col = sa.func.sum(Statistics.count)
+                    value_col = sa.func.sum(table.count)
                 stmt = (
-                    sa.select(Statistics.subtype, value_col)
-                    .where(Statistics.type == type_str)
-                    .where(Statistics.bucket_ts >= start)
-                    .where(Statistics.bucket_ts < end)
-                    .group_by(Statistics.subtype)
+                    sa.select(table.subtype, value_col)
+                    .where(table.type == type_str)
+                    .where(table.bucket_ts >= start)
+                    .where(table.bucket_ts < end)
+                    .group_by(table.subtype)
                     .order_by(value_col.desc())
                     .limit(top_n)
                 )
-                if channel_id is not None:
-                    stmt = stmt.where(Statistics.channel_id == channel_id)
+                if (channel_clause := _channel_clause(table, type_str, channel_id)) is not None:
+                    stmt = stmt.where(channel_clause)
                 if _needs_empty_subtype_filter(type_str):
-                    stmt = stmt.where(Statistics.subtype == "")
+                    stmt = stmt.where(table.subtype == "")
                 allowed = _split_allowed_subtypes(type_str)
                 if allowed is not None:
-                    stmt = stmt.where(Statistics.subtype.in_(allowed))
+                    stmt = stmt.where(table.subtype.in_(allowed))
                 result = await session.execute(stmt)
                 return [row[0] for row in result.all()]
         except Exception:
@@ -946,23 +1746,24 @@ class StatisticsService:
             return []
         try:
             async with self._db() as session:
+                table = _table_for_step(step_seconds)
                 bucket_expr = sa.func.date_bin(
                     sa.text(f"'{step_seconds} seconds'"),
-                    Statistics.bucket_ts,
+                    table.bucket_ts,
                     sa.text("timestamp '2000-01-01 00:00:00+00'"),
                 ).label("bucket")
-                value_expr = _value_expr_for(type_str)
+                value_expr = _value_expr_for(type_str, table)
                 stmt = (
-                    sa.select(bucket_expr, Statistics.subtype, value_expr)
-                    .where(Statistics.type == type_str)
-                    .where(Statistics.bucket_ts >= start)
-                    .where(Statistics.bucket_ts < end)
-                    .where(Statistics.subtype.in_(subtypes))
-                    .group_by(bucket_expr, Statistics.subtype)
-                    .order_by(bucket_expr, Statistics.subtype)
+                    sa.select(bucket_expr, table.subtype, value_expr)
+                    .where(table.type == type_str)
+                    .where(table.bucket_ts >= start)
+                    .where(table.bucket_ts < end)
+                    .where(table.subtype.in_(subtypes))
+                    .group_by(bucket_expr, table.subtype)
+                    .order_by(bucket_expr, table.subtype)
                 )
-                if channel_id is not None:
-                    stmt = stmt.where(Statistics.channel_id == channel_id)
+                if (channel_clause := _channel_clause(table, type_str, channel_id)) is not None:
+                    stmt = stmt.where(channel_clause)
                 result = await session.execute(stmt)
                 return [(row[0], row[1], int(row[2] or 0)) for row in result.all()]
         except Exception:
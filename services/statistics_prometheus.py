@@ -0,0 +1,101 @@
+"""Живые Prometheus-метрики бота — параллельно с буфером ``StatisticsService``.
+
+``StatisticsService`` видит каждое событие в момент ``inc``/``inc_timing``/
+``set_gauge``, но в БД оно попадает только через 10 минут. Здесь те же события
+сразу отражаются в in-process метриках, которые отдаёт ``/metrics``
+(``prometheus_fastapi_instrumentator`` в ``main.py`` использует общий реестр):
+
+- ``bot_stats_events_total{type, subtype}`` — counter-метрики и число замеров
+  timing/sum-метрик;
+- ``bot_stats_amount_total{type, subtype}`` — объём sum-метрик (байты Heat);
+- ``bot_stats_duration_seconds{type, subtype}`` — гистограмма timing-метрик;
+- ``bot_stats_gauge{type, subtype}`` — snapshot gauge-метрик (SSE-подключения).
+
+Кардинальность ограничена: ``channel_id`` в лейблы не попадает вовсе, а
+подтипов на один тип — не больше ``max_subtypes``, остальные сливаются в
+``OTHER_SUBTYPE``. Уникальные счётчики (HyperLogLog) сюда не отражаются:
+число уникальных за окно знает только Redis.
+"""
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+
+# Подтип, в который сливаются все подтипы сверх лимита.
+OTHER_SUBTYPE = "__other__"
+
+# Границы бакетов гистограммы в секундах: 1 мс … ~131 с с шагом ×2 — как
+# log-бакеты ``HIST_BUCKETS`` в ``services/statistics.py``.
+DURATION_BUCKETS: tuple[float, ...] = tuple(2**i / 1000 for i in range(18))
+
+
+class StatsPrometheus:
+    def __init__(self, registry: CollectorRegistry = REGISTRY, max_subtypes: int = 50) -> None:
+        self._max_subtypes = max_subtypes
+        self._events = Counter(
+            "bot_stats_events",
+            "События бота по типам StatsType",
+            ["type", "subtype"],
+            registry=registry,
+        )
+        self._amount = Counter(
+            "bot_stats_amount",
+            "Объём sum-метрик StatsType (байты и т.п.)",
+            ["type", "subtype"],
+            registry=registry,
+        )
+        self._duration = Histogram(
+            "bot_stats_duration_seconds",
+            "Длительность timing-метрик StatsType",
+            ["type", "subtype"],
+            buckets=DURATION_BUCKETS,
+            registry=registry,
+        )
+        self._gauge = Gauge(
+            "bot_stats_gauge",
+            "Мгновенные значения gauge-метрик StatsType",
+            ["type", "subtype"],
+            registry=registry,
+        )
+        # type -> уже выданные лейблам подтипы (не больше max_subtypes).
+        self._subtypes: dict[str, set[str]] = {}
+        # Дочерние метрики по (метрика, type, subtype): ``labels()`` берёт
+        # блокировку на каждый вызов, а inc идёт из горячего пути сообщений.
+        self._children: dict[tuple[str, str, str], object] = {}
+
+    def _subtype(self, type_: str, subtype: str) -> str:
+        seen = self._subtypes.setdefault(type_, set())
+        if subtype in seen:
+            return subtype
+        if len(seen) >= self._max_subtypes:
+            return OTHER_SUBTYPE
+        seen.add(subtype)
+        return subtype
+
+    def _child(self, name: str, metric, type_: str, subtype: str):
+        subtype = self._subtype(type_, subtype)
+        key = (name, type_, subtype)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = metric.labels(type=type_, subtype=subtype)
+        return child
+
+    def inc(self, type_: str, subtype: str, amount: int = 1) -> None:
+        # Prometheus-счётчик только растёт; отрицательные дельты — только в Redis.
+        if amount > 0:
+            self._child("events", self._events, type_, subtype).inc(amount)
+
+    def observe_ms(self, type_: str, subtype: str, value_ms: int) -> None:
+        self._child("events", self._events, type_, subtype).inc()
+        self._child("duration", self._duration, type_, subtype).observe(value_ms / 1000)
+
+    def add_amount(self, type_: str, subtype: str, amount: int) -> None:
+        self._child("events", self._events, type_, subtype).inc()
+        if amount > 0:
+            self._child("amount", self._amount, type_, subtype).inc(amount)
+
+    def set_gauge(self, type_: str, values: dict[str, int]) -> None:
+        for subtype, value in values.items():
+            self._child("gauge", self._gauge, type_, subtype).set(value)
+
+
+# Один набор метрик на процесс: повторная регистрация в общем реестре падает.
+stats_prometheus = StatsPrometheus()
@@ -0,0 +1,228 @@
+"""In-process кеш снапшотов стримеров для горячего пути обработки чата.
+
+``ChatBot.on_message`` раньше на каждое сообщение открывал сессию, делал
+``SELECT`` с четырьмя ``joinedload`` (settings/links/memealerts/tts) и коммитил.
+Теперь стример вместе с настройками грузится один раз и живёт в памяти процесса
+``ttl`` секунд (или до явной инвалидации).
+
+Снапшот — detached ORM-объект ``User`` с уже загруженными связями. Его нельзя
+мутировать с расчётом на сохранение в БД: все изменения настроек идут через
+API/команды, которые после коммита вызывают ``invalidate``. Инвалидация
+рассылается остальным инстансам через Redis pub/sub (канал
+``INVALIDATION_CHANNEL``), чтобы все процессы перечитали настройки.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+from time import monotonic
+from typing import Any
+
+import redis.asyncio as aioredis
+import sqlalchemy as sa
+from opentelemetry import trace
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from database.models import User
+from exceptions import UserNotFoundInDatabase
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+
+class StreamerCache:
+    """LRU+TTL кеш ``broadcaster_user_id -> User`` (detached, со связями)."""
+
+    INVALIDATION_CHANNEL = "streamer_cache:invalidate"
+
+    def __init__(
+        self,
+        db_session_factory: Callable[[], AsyncSession],
+        ttl: float = 60,
+        max_size: int = 1024,
+    ) -> None:
+        self._db = db_session_factory
+        self._ttl = ttl
+        self._max_size = max_size
+        self._r: aioredis.Redis | None = None
+        # twitch_id -> (момент протухания по monotonic, снапшот)
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+        # Загрузки «в полёте»: несколько одновременных сообщений одного канала
+        # при промахе ждут один и тот же запрос в БД, а не делают N запросов.
+        self._loading: dict[str, asyncio.Future[User]] = {}
+        # Счётчик инвалидаций: загрузка, начатая до инвалидации, не кладёт
+        # в кеш устаревший результат.
+        self._version = 0
+        # Храним ссылки на fire-and-forget таски, чтобы их не убил GC.
+        self._tasks: set[asyncio.Task[Any]] = set()
+
+    async def startup(self, redis: aioredis.Redis) -> None:
+        self._r = redis
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    @tracer.start_as_current_span("StreamerCache: Get")
+    async def get(self, twitch_id: str | int) -> User:
+        """Возвращает снапшот стримера, при промахе/протухании — грузит из БД.
+
+        :raises UserNotFoundInDatabase: стримера с таким ``twitch_id`` нет.
+        """
+        key = str(twitch_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > monotonic():
+                self._entries.move_to_end(key)
+                return user
+            self._entries.pop(key, None)
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future: asyncio.Future[User] = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        version = self._version
+        try:
+            user = await self._load(key)
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Исключение уже проброшено ожидающим; помечаем как прочитанное,
+            # чтобы asyncio не ругался "exception was never retrieved".
+            future.exception()
+            raise
+        else:
+            future.set_result(user)
+            if version == self._version:
+                self._put(key, user)
+            return user
+        finally:
+            self._loading.pop(key, None)
+
+    async def _load(self, twitch_id: str) -> User:
+        async with self._db() as session:
+            result = await session.execute(
+                sa.select(User)
+                .options(
+                    joinedload(User.settings),
+                    joinedload(User.links),
+                    joinedload(User.memealerts),
+                    joinedload(User.tts),
+                )
+                .filter_by(twitch_id=twitch_id)
+            )
+            user = result.scalar_one_or_none()
+            if not user:
+                logger.error(f"User id={twitch_id} not found")
+                raise UserNotFoundInDatabase
+            # Отвязываем от сессии: связи уже загружены, дальше объект живёт
+            # как read-only снапшот.
+            session.expunge_all()
+        return user
+
+    def _put(self, twitch_id: str, user: User) -> None:
+        self._entries[twitch_id] = (monotonic() + self._ttl, user)
+        self._entries.move_to_end(twitch_id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Инвалидация
+    # ------------------------------------------------------------------
+
+    def invalidate(self, twitch_id: str | int) -> None:
+        """Сбрасывает снапшот стримера локально и на остальных инстансах.
+
+        Вызывается после коммита изменений настроек (API панели, команды чата,
+        сохраняющие ссылки/пасту). Публикация в Redis — fire-and-forget.
+        """
+        key = str(twitch_id)
+        self._drop(key)
+        if self._r is None:
+            return
+        task = asyncio.create_task(self._publish(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _drop(self, twitch_id: str) -> None:
+        self._version += 1
+        self._entries.pop(twitch_id, None)
+
+    async def _publish(self, twitch_id: str) -> None:
+        if self._r is None:
+            return
+        try:
+            await self._r.publish(self.INVALIDATION_CHANNEL, twitch_id)
+        except Exception:
+            logger.error("Streamer cache invalidation publish failed for %s", twitch_id, exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Write-behind переименования
+    # ------------------------------------------------------------------
+
+    def rename(self, user: User, login_name: str) -> None:
+        """Стример сменил логин: обновляем снапшот сразу, БД — в фоне.
+
+        Случается редко (раз в жизни канала), поэтому отдельная сессия в фоне
+        дешевле, чем коммит на каждое сообщение, как было раньше.
+        """
+        user.login_name = login_name
+        task = asyncio.create_task(self._rename(user.twitch_id, login_name))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _rename(self, twitch_id: str, login_name: str) -> None:
+        try:
+            async with self._db() as session:
+                await session.execute(sa.update(User).where(User.twitch_id == twitch_id).values(login_name=login_name))
+                await session.commit()
+        except Exception:
+            logger.error("Failed to rename user %s to %s", twitch_id, login_name, exc_info=True)
+            return
+        self.invalidate(twitch_id)
+
+    # ------------------------------------------------------------------
+    # Подписка на инвалидации других инстансов
+    # ------------------------------------------------------------------
+
+    @asynccontextmanager
+    async def lifespan(self):
+        listener_task = asyncio.create_task(self._invalidation_listener()) if self._r is not None else None
+        yield
+        if listener_task is not None:
+            listener_task.cancel()
+            try:
+                await listener_task
+            except asyncio.CancelledError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _invalidation_listener(self) -> None:
+        if self._r is None:
+            return
+        while True:
+            pubsub = self._r.pubsub()
+            try:
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                logger.info("Subscribed to streamer cache invalidations")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=30.0)
+                    if message is None:
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode("utf-8")
+                    self._drop(str(data))
+            except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+                logger.warning(f"Ошибка соединения: {e}. Ожидание 5 секунд...")
+                # Пока не слушаем — не доверяем кешу: могли пропустить инвалидации.
+                self._entries.clear()
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
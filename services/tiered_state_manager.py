@@ -0,0 +1,331 @@
+"""Двухуровневый StateManager: in-process L1 (LRU+TTL) перед ``RedisStateManager`` (L2).
+
+Состояние команд (КД, предыдущие значения, цели) читается гораздо чаще, чем
+пишется, а каждый ``get_state`` — это поход в Redis и отдельный OTEL-спан.
+L1 кеширует значения (в том числе отсутствие значения) на ``ttl`` секунд.
+
+Когерентность между инстансами — через Redis pub/sub (``INVALIDATION_CHANNEL``):
+каждая запись публикует затронутые ключи, остальные инстансы выкидывают их из
+L1. Свои записи пишутся в L1 сквозь (write-through). Атомарные операции КД
+(``try_acquire_cooldown`` и т.п.) не кешируются и всегда идут в Redis.
+
+Счётчики попаданий/промахов копятся в памяти и раз в ``stats_interval`` секунд
+уходят в ``StatisticsService`` (``StatsType.STATE_CACHE``, subtype hit/miss).
+"""
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from copy import copy
+from time import monotonic
+from typing import Any
+from uuid import uuid4
+
+import redis.asyncio as aioredis
+
+from schemas.api import StatsType
+from services.redis_state_manager import RedisStateManager
+from services.statistics import StatisticsService
+from twitch.state_manager import (
+    COMMAND_TYPE,
+    COMMON_CHANNEL,
+    COMMON_COMMAND,
+    COMMON_USER,
+    PARAM_TYPE,
+    USER_TYPE,
+    VALUE_TYPE,
+    SMKey,
+    StateManager,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ключ L1: (channel, user, command, param) строками — как и в поле Redis-хеша,
+# где user=123 и user="123" это одно и то же.
+_L1Key = tuple[str, str, str, str]
+
+
+def _l1_key(channel: Any, user: Any, command: Any, param: Any) -> _L1Key:
+    return str(channel), str(user), str(command), str(param)
+
+
+class TieredStateManager(StateManager):
+    INVALIDATION_CHANNEL = "sm:invalidate"
+
+    def __init__(
+        self,
+        backend: RedisStateManager,
+        statistics: StatisticsService | None = None,
+        ttl: float = 5,
+        max_size: int = 10_000,
+        stats_interval: float = 60,
+    ) -> None:
+        self._backend = backend
+        self._statistics = statistics
+        self._ttl = ttl
+        self._max_size = max_size
+        self._stats_interval = stats_interval
+        self._r: aioredis.Redis | None = None
+        self._l1: OrderedDict[_L1Key, tuple[float, VALUE_TYPE]] = OrderedDict()
+        # Счётчик инвалидаций: промах, загруженный до инвалидации, не кладётся в L1.
+        self._version = 0
+        # Своё же сообщение об инвалидации при получении пропускаем.
+        self._instance_id = uuid4().hex
+        self._hits = 0
+        self._misses = 0
+        # Храним ссылки на fire-and-forget таски, чтобы их не убил GC.
+        self._tasks: set[asyncio.Task[Any]] = set()
+
+    async def startup(self, redis: aioredis.Redis) -> None:
+        self._r = redis
+        await self._backend.startup(redis)
+
+    # ------------------------------------------------------------------
+    # L1
+    # ------------------------------------------------------------------
+
+    def _l1_get(self, key: _L1Key) -> tuple[bool, VALUE_TYPE]:
+        entry = self._l1.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > monotonic():
+                self._l1.move_to_end(key)
+                self._hits += 1
+                # set/list из L1 отдаём копией — вызывающий код их мутирует.
+                return True, copy(value) if isinstance(value, (set, list)) else value
+            del self._l1[key]
+        self._misses += 1
+        return False, None
+
+    def _l1_put(self, key: _L1Key, value: VALUE_TYPE) -> None:
+        self._l1[key] = (monotonic() + self._ttl, copy(value) if isinstance(value, (set, list)) else value)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self._max_size:
+            self._l1.popitem(last=False)
+
+    def _l1_drop(self, pattern: list[str | None]) -> None:
+        """Выкинуть из L1 ключи по маске ``[channel, user, command, param]`` (None — любой)."""
+        self._version += 1
+        if None not in pattern:
+            self._l1.pop(tuple(pattern), None)  # type: ignore[arg-type]
+            return
+        for key in [k for k in self._l1 if all(p is None or p == part for p, part in zip(pattern, k, strict=True))]:
+            del self._l1[key]
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    async def get_state(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+        param: PARAM_TYPE = PARAM_TYPE.DEFAULT,
+    ) -> VALUE_TYPE:
+        key = _l1_key(channel, user, command, param)
+        hit, value = self._l1_get(key)
+        if hit:
+            return value
+        version = self._version
+        value = await self._backend.get_state(channel=channel, user=user, command=command, param=param)
+        if version == self._version:
+            self._l1_put(key, value)
+        return value
+
+    async def get_states(self, keys: list[SMKey]) -> list[VALUE_TYPE]:
+        result: list[VALUE_TYPE] = [None] * len(keys)
+        missed: list[int] = []
+        for i, key in enumerate(keys):
+            hit, value = self._l1_get(_l1_key(*key))
+            if hit:
+                result[i] = value
+            else:
+                missed.append(i)
+        if missed:
+            version = self._version
+            values = await self._backend.get_states([keys[i] for i in missed])
+            for i, value in zip(missed, values, strict=True):
+                result[i] = value
+                if version == self._version:
+                    self._l1_put(_l1_key(*keys[i]), value)
+        return result
+
+    async def get_all_from_channel(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+    ) -> AsyncIterator[tuple[USER_TYPE, COMMAND_TYPE, PARAM_TYPE, VALUE_TYPE]]:
+        async for item in self._backend.get_all_from_channel(channel=channel):
+            yield item
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    async def set_state(
+        self,
+        value: VALUE_TYPE,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+        param: PARAM_TYPE = PARAM_TYPE.DEFAULT,
+    ):
+        await self._backend.set_state(value, channel=channel, user=user, command=command, param=param)
+        key = _l1_key(channel, user, command, param)
+        self._l1_drop(list(key))
+        self._l1_put(key, value)
+        self._publish([list(key)])
+
+    async def set_states(self, values: dict[SMKey, VALUE_TYPE]) -> None:
+        await self._backend.set_states(values)
+        keys = [_l1_key(*key) for key in values]
+        for key, value in zip(keys, values.values(), strict=True):
+            self._l1_drop(list(key))
+            self._l1_put(key, value)
+        self._publish([list(key) for key in keys])
+
+    async def del_state(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+        param: PARAM_TYPE = PARAM_TYPE.DEFAULT,
+    ):
+        result = await self._backend.del_state(channel=channel, user=user, command=command, param=param)
+        # Пустые компоненты (удаление по маске в RedisStateManager) — «любой».
+        pattern = [str(part) if part else None for part in (channel, user, command, param)]
+        self._l1_drop(pattern)
+        self._publish([pattern])
+        return result
+
+    # ------------------------------------------------------------------
+    # КД — без кеша, атомарность обеспечивает Redis
+    # ------------------------------------------------------------------
+
+    async def try_acquire_cooldown(
+        self,
+        ttl: float,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+        limit: int = 1,
+    ) -> bool:
+        return await self._backend.try_acquire_cooldown(ttl, channel=channel, user=user, command=command, limit=limit)
+
+    async def cooldown_remaining(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+    ) -> float:
+        return await self._backend.cooldown_remaining(channel=channel, user=user, command=command)
+
+    async def release_cooldown(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+    ) -> None:
+        await self._backend.release_cooldown(channel=channel, user=user, command=command)
+
+    async def cleanup(self):
+        await self._backend.cleanup()
+
+    # ------------------------------------------------------------------
+    # Инвалидация между инстансами
+    # ------------------------------------------------------------------
+
+    def _publish(self, patterns: list[list[str | None]]) -> None:
+        if self._r is None:
+            return
+        payload = json.dumps({"src": self._instance_id, "keys": patterns}, separators=(",", ":"))
+        task = asyncio.create_task(self._do_publish(payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _do_publish(self, payload: str) -> None:
+        if self._r is None:
+            return
+        try:
+            await self._r.publish(self.INVALIDATION_CHANNEL, payload)
+        except Exception:
+            logger.error("State cache invalidation publish failed", exc_info=True)
+
+    async def _invalidation_listener(self) -> None:
+        if self._r is None:
+            return
+        while True:
+            pubsub = self._r.pubsub()
+            try:
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                logger.info("Subscribed to state cache invalidations")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=30.0)
+                    if message is None:
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        logger.warning("Bad state cache invalidation message: %r", message["data"])
+                        continue
+                    if data.get("src") == self._instance_id:
+                        continue
+                    for pattern in data.get("keys", []):
+                        self._l1_drop(pattern)
+            except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+                logger.warning(f"Ошибка соединения: {e}. Ожидание 5 секунд...")
+                # Пока не слушаем — не доверяем L1: могли пропустить инвалидации.
+                self._version += 1
+                self._l1.clear()
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+    # ------------------------------------------------------------------
+    # Статистика попаданий
+    # ------------------------------------------------------------------
+
+    def _report_stats(self) -> None:
+        if self._statistics is None:
+            return
+        hits, misses = self._hits, self._misses
+        self._hits = self._misses = 0
+        if hits:
+            self._statistics.inc(StatsType.STATE_CACHE, subtype="hit", amount=hits)
+        if misses:
+            self._statistics.inc(StatsType.STATE_CACHE, subtype="miss", amount=misses)
+
+    async def _stats_reporter(self) -> None:
+        while True:
+            await asyncio.sleep(self._stats_interval)
+            self._report_stats()
+
+    @asynccontextmanager
+    async def lifespan(self):
+        async with self._backend.lifespan():
+            background = [asyncio.create_task(self._stats_reporter())]
+            if self._r is not None:
+                background.append(asyncio.create_task(self._invalidation_listener()))
+            try:
+                yield
+            finally:
+                for task in background:
+                    task.cancel()
+                await asyncio.gather(*background, return_exceptions=True)
+                self._report_stats()
+                # Lifespan статистики к этому моменту уже завершился, а Redis
+                # закроется вместе с backend'ом — сбрасываем свои счётчики сами.
+                if self._statistics is not None:
+                    await self._statistics.flush()
+                if self._tasks:
+                    await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -9,6 +9,7 @@
     const SUBTYPES_BY_TYPE = {
         message_incoming: [""],
         message_outgoing: [""],
+        message_prefiltered: [""],
         // reward_*: «(все)» убрано — succeed/success ⊆ received, суммирование
         // double-count'ит. Показываем только конкретные подтипы.
         reward_memecoins: ["received", "succeed", "failed"],
@@ -16,10 +17,13 @@
         // Для command_handled subtype — имя команды; предлагаем «все» или
         // «раздельно» (фронт идёт к /api/user/stats/series за топ-N подтипов).
         command_handled: ["", "__split__"],
-        message_processing_time: [""],
+        // «перцентили» — p50/p95/p99 по гистограммам (/api/user/stats/percentiles).
+        message_processing_time: ["", "__percentiles__"],
         // active_channels: нет смысла в «(все)» — averaging gauge across subtypes
         // бессмысленно. По умолчанию показываем incoming.
         active_channels: ["incoming", "outgoing"],
+        unique_chatters: [""],
+        unique_command_users: [""],
         // SSE: 3 конкретных подтипа + «раздельно» по каналам (heat/ai-sticker/...).
         // «(все)» убран — averaging gauge (total + по пользователям + ...) бессмысленно.
         sse_connections: ["total", "unique_users", "unique_pairs", "__split__"],
@@ -43,11 +47,18 @@
         ],
         // users_count: кумулятивный график, без подтипов.
         users_count: [""],
+        state_cache: ["hit", "miss"],
+        stats_flush_time: [""],
+        event_loop_lag: [""],
+        slow_callbacks: ["", "__split__"],
+        sse_dropped: ["", "__split__"],
+        sse_slow_disconnects: ["", "__split__"],
     };
 
     const SUBTYPE_LABELS = {
         "": "(все)",
         __split__: "(раздельно)",
+        __percentiles__: "перцентили (p50/p95/p99)",
         received: "получено",
         succeed: "успешно",
         success: "успешно",
@@ -69,10 +80,15 @@
         server_error: "ошибка сервера",
         network_error: "сетевая ошибка",
         expired: "истёк",
+        // State cache subtypes
+        hit: "попадания",
+        miss: "промахи",
     };
 
     // Псевдо-subtype, при котором фронт идёт к series endpoint для multi-line.
     const SPLIT_SUBTYPE = "__split__";
+    // Псевдо-subtype: ряды p50/p95/p99 для timing-метрик (тот же multi-line график).
+    const PERCENTILES_SUBTYPE = "__percentiles__";
 
     // Пояснения для «(раздельно)» режима: что именно разбивается на линии.
     const SPLIT_DESCRIPTIONS = {
@@ -80,33 +96,58 @@
         sse_connections: "по каналам",
         ai_sticker_processing_time: "по этапам",
         ma_token_refresh: "по исходам",
+        slow_callbacks: "по корутинам",
+        sse_dropped: "по каналам",
+        sse_slow_disconnects: "по каналам",
     };
 
     // Типы метрик, для которых доступна «раздельно» (multi-line) режим.
-    const SPLITTABLE_TYPES = new Set(["command_handled", "sse_connections", "ai_sticker_processing_time", "ma_token_refresh"]);
+    const SPLITTABLE_TYPES = new Set([
+        "command_handled",
+        "sse_connections",
+        "ai_sticker_processing_time",
+        "ma_token_refresh",
+        "slow_callbacks",
+        "sse_dropped",
+        "sse_slow_disconnects",
+    ]);
 
     const TYPE_LABELS = {
         message_incoming: "Входящие сообщения",
         message_outgoing: "Исходящие сообщения",
+        message_prefiltered: "Отсеяно префильтром",
         reward_memecoins: "Награды: мемкоины",
         reward_ai_stickers: "Награды: ИИ-стикеры",
         command_handled: "Команды",
         message_processing_time: "Время обработки сообщения",
         active_channels: "Активные каналы",
+        unique_chatters: "Уникальные чаттеры",
+        unique_command_users: "Уникальные пользователи команд",
         sse_connections: "SSE-подключения",
         heat_proxy_messages: "Heat: сообщения",
         heat_proxy_bytes: "Heat: данные",
         ai_sticker_processing_time: "ИИ-стикеры: время",
         ma_token_refresh: "MA: обновление токена",
         users_count: "Пользователи бота",
+        state_cache: "Кеш состояний",
+        stats_flush_time: "Дамп статистики в БД: время",
+        event_loop_lag: "Лаг event loop",
+        slow_callbacks: "Блокировки event loop",
+        sse_dropped: "SSE: выброшено сообщений",
+        sse_slow_disconnects: "SSE: отключено медленных клиентов",
     };
 
     // Типы метрик, для которых значение — это «среднее» (мс), а не «количество».
     // Для них тултип показывает «Avg: X ms», а не RPS.
-    const TIMING_TYPES = new Set(["message_processing_time", "ai_sticker_processing_time"]);
+    const TIMING_TYPES = new Set([
+        "message_processing_time",
+        "ai_sticker_processing_time",
+        "stats_flush_time",
+        "event_loop_lag",
+    ]);
 
     // Gauge-метрики: мгновенное значение, не кумулятивное. RPS не имеет смысла.
-    const GAUGE_TYPES = new Set(["sse_connections", "active_channels"]);
+    const GAUGE_TYPES = new Set(["sse_connections", "active_channels", "unique_chatters", "unique_command_users"]);
 
     // Sum-метрики: value — суммарный объём (байты). Форматируем в KiB/MiB.
     const SUM_TYPES = new Set(["heat_proxy_bytes"]);
@@ -368,6 +409,32 @@
         );
     }
 
+    function isPercentilesMode() {
+        return subtypeSelect.value === PERCENTILES_SUBTYPE && TIMING_TYPES.has(typeSelect.value);
+    }
+
+    function isMultiMode() {
+        return isSplitMode() || isPercentilesMode();
+    }
+
+    // Больше точек, чем примерно по одной на 2 пикселя, график всё равно не
+    // покажет — сервер прореживает ряд LTTB (пики сохраняются).
+    function maxPoints() {
+        return Math.max(50, Math.round(chartWrap.clientWidth / 2));
+    }
+
+    function buildPercentilesUrl() {
+        const params = new URLSearchParams();
+        params.set("type", typeSelect.value);
+        params.set("period", periodSelect.value);
+        const from = isoFromInput(fromInput.value);
+        const to = isoFromInput(toInput.value);
+        if (from) params.set("from", from);
+        if (to) params.set("to", to);
+        params.set("max_points", String(maxPoints()));
+        return `/api/user/stats/percentiles?${params.toString()}`;
+    }
+
     function buildUrl() {
         const params = new URLSearchParams();
         // users_count идёт к отдельному endpoint /users-count (не из таблицы statistics).
@@ -382,12 +449,13 @@
         params.set("type", typeSelect.value);
         const sub = subtypeSelect.value;
         // В split-режиме subtype не передаётся (идём к /series, не к /stats).
-        if (sub && sub !== SPLIT_SUBTYPE) params.set("subtype", sub);
+        if (sub && sub !== SPLIT_SUBTYPE && sub !== PERCENTILES_SUBTYPE) params.set("subtype", sub);
         params.set("period", periodSelect.value);
         const from = isoFromInput(fromInput.value);
         const to = isoFromInput(toInput.value);
         if (from) params.set("from", from);
         if (to) params.set("to", to);
+        params.set("max_points", String(maxPoints()));
         return `/api/user/stats?${params.toString()}`;
     }
 
@@ -399,6 +467,7 @@
         const to = isoFromInput(toInput.value);
         if (from) params.set("from", from);
         if (to) params.set("to", to);
+        params.set("max_points", String(maxPoints()));
         return `/api/user/stats/series?${params.toString()}`;
     }
 
@@ -623,7 +692,7 @@
         refreshBtn.disabled = true;
         refreshBtn.textContent = "Загрузка…";
         try {
-            const url = isSplitMode() ? buildSeriesUrl() : buildUrl();
+            const url = isPercentilesMode() ? buildPercentilesUrl() : isSplitMode() ? buildSeriesUrl() : buildUrl();
             const resp = await fetch(url, {credentials: "same-origin"});
             if (resp.status === 401) {
                 renderEmpty("Нужна авторизация. Войдите на сайт и вернитесь на эту страницу.");
@@ -636,7 +705,7 @@
             }
             const payload = await resp.json();
             const typeLabel = TYPE_LABELS[payload.type] || payload.type;
-            if (isSplitMode()) {
+            if (isMultiMode()) {
                 renderChartMulti(payload.series, typeLabel, payload.period, payload.type);
             } else {
                 const subtypeLabel = payload.subtype ? SUBTYPE_LABELS[payload.subtype] || payload.subtype : "";
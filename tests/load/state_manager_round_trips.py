@@ -0,0 +1,95 @@
+"""Сколько round trip'ов в Redis делает StateManager на один вызов команды.
+
+Запуск (нужен живой Redis из настроек):
+
+    python -m tests.load.state_manager_round_trips
+
+Round trip — это один ``execute_command`` клиента либо один ``execute`` пайплайна.
+Для сравнения: старая раскладка (ключ на значение + 4 idx-сета) давала
+12 round trip'ов на SimpleCDCommand/SimpleTargetCommand, 18 на
+SavingResultCommand и 2 (SINTER + MGET) на get_all_from_channel.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+
+import redis.asyncio as aioredis
+from redis.asyncio.client import Pipeline
+
+from config import settings
+from services.redis_state_manager import RedisStateManager
+from twitch.state_manager import COMMON_CHANNEL, SMParam
+
+CHANNEL = "__bench_channel__"
+ITERATIONS = 200
+# Уникальное имя: SavingResultCommand пишет в общий хеш COMMON, чистим только своё.
+BENCH_COMMAND = "__bench_saving__"
+
+_round_trips = 0
+
+
+def _count(func):
+    async def wrapper(*args, **kwargs):
+        global _round_trips
+        _round_trips += 1
+        return await func(*args, **kwargs)
+
+    return wrapper
+
+
+async def _simple_cd(sm: RedisStateManager, i: int) -> None:
+    await sm.try_acquire_cooldown(30, channel=CHANNEL, user=i, command="dice")
+    await sm.try_acquire_cooldown(5, channel=CHANNEL, command="dice")
+
+
+async def _simple_target(sm: RedisStateManager, i: int) -> None:
+    await sm.try_acquire_cooldown(30, channel=CHANNEL, user=i, command="bite")
+    await sm.set_state(1.0, channel=CHANNEL, user=f"target{i}", command="bite", param=SMParam.LAST_APPLY)
+
+
+async def _saving_result(sm: RedisStateManager, i: int) -> None:
+    await sm.get_state(user=i, command=BENCH_COMMAND, param=SMParam.PREVIOUS_VALUE)
+    await sm.get_state(user=i, command=BENCH_COMMAND, param=SMParam.PREVIOUS_VALUE_TIME)
+    await sm.try_acquire_cooldown(30, channel=CHANNEL, user=i, command=BENCH_COMMAND)
+    await sm.set_state("42", user=i, command=BENCH_COMMAND, param=SMParam.PREVIOUS_VALUE)
+    await sm.set_state(1.0, user=i, command=BENCH_COMMAND, param=SMParam.PREVIOUS_VALUE_TIME)
+
+
+async def _get_all(sm: RedisStateManager, i: int) -> None:
+    async for _ in sm.get_all_from_channel(channel=CHANNEL):
+        pass
+
+
+async def _measure(sm: RedisStateManager, name: str, scenario: Callable[[RedisStateManager, int], Awaitable[None]]):
+    global _round_trips
+    _round_trips = 0
+    started = perf_counter()
+    for i in range(ITERATIONS):
+        await scenario(sm, i)
+    elapsed = perf_counter() - started
+    print(f"{name:<22} {_round_trips / ITERATIONS:>6.1f} RTT/вызов {elapsed / ITERATIONS * 1000:>8.3f} мс/вызов")
+
+
+async def main() -> None:
+    aioredis.Redis.execute_command = _count(aioredis.Redis.execute_command)
+    Pipeline.execute = _count(Pipeline.execute)
+
+    client = aioredis.from_url(settings.redis_url, decode_responses=True)
+    sm = RedisStateManager()
+    await sm.startup(client)
+    # Прогрев: загрузка Lua-скрипта (EVALSHA -> NOSCRIPT -> SCRIPT LOAD) в замер не идёт.
+    await sm.try_acquire_cooldown(1, channel=CHANNEL, command="warmup")
+    try:
+        await _measure(sm, "SimpleCDCommand", _simple_cd)
+        await _measure(sm, "SimpleTargetCommand", _simple_target)
+        await _measure(sm, "SavingResultCommand", _saving_result)
+        await _measure(sm, "get_all_from_channel", _get_all)
+    finally:
+        await client.delete(sm._hash_key(CHANNEL))
+        await sm.del_state(channel=COMMON_CHANNEL, user=None, command=BENCH_COMMAND, param=None)  # type: ignore[arg-type]
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
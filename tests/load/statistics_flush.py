@@ -0,0 +1,94 @@
+"""Сколько стоит поиск и чтение закрывшихся бакетов статистики в ``flush_to_db``.
+
+Запуск (нужен живой Redis из настроек):
+
+    python -m tests.load.statistics_flush
+
+Сравниваются две раскладки на одном и том же наборе ключей: старая (``SCAN``
+по всему keyspace + ``HGETALL`` на каждый бакет отдельным round trip'ом) и
+новая (``ZRANGEBYSCORE`` по индексу + один пайплайн ``HGETALL``). Keyspace
+разбавлен посторонними ключами — в проде это состояние команд, кеши и т.п.
+Часть БД в замер не входит: её длительность на живой установке видна в
+метрике ``stats_flush_time``.
+"""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+from time import perf_counter
+
+import redis.asyncio as aioredis
+
+from config import settings
+from services.statistics import BUCKET_SECONDS, StatisticsService, _field_for, _floor_to_bucket
+
+PREFIX = "__bench__:"
+BUCKETS = 12
+FIELDS_PER_BUCKET = 200
+FILLER_KEYS = 100_000
+ITERATIONS = 20
+
+
+class _BenchStatistics(StatisticsService):
+    # Свои префиксы: не трогаем настоящие бакеты и индекс.
+    HASH_KEY_PREFIX = f"{PREFIX}statistics:bucket:"
+    BUCKET_INDEX_KEY = f"{PREFIX}statistics:bucket_index"
+
+
+async def _fill(r: aioredis.Redis, stats: _BenchStatistics, current: datetime) -> list[str]:
+    keys = []
+    async with r.pipeline(transaction=False) as pipe:
+        for i in range(FILLER_KEYS):
+            pipe.set(f"{PREFIX}filler:{i}", "x")
+        for b in range(1, BUCKETS + 1):
+            bucket = current - timedelta(seconds=BUCKET_SECONDS * b)
+            key = stats._bucket_key(bucket)
+            pipe.hset(key, mapping={_field_for("bench", str(f), None): f for f in range(FIELDS_PER_BUCKET)})
+            pipe.zadd(stats.BUCKET_INDEX_KEY, {key: bucket.timestamp()})
+            keys.append(key)
+        await pipe.execute()
+    return keys
+
+
+async def _scan(r: aioredis.Redis, stats: _BenchStatistics, current: datetime) -> int:
+    raws = []
+    async for key in r.scan_iter(match=f"{stats.HASH_KEY_PREFIX}*"):
+        bucket = stats._parse_bucket_key(key)
+        if bucket is not None and bucket < current:
+            raws.append(await r.hgetall(key))
+    return len(raws)
+
+
+async def _index(r: aioredis.Redis, stats: _BenchStatistics, current: datetime) -> int:
+    keys = await r.zrangebyscore(stats.BUCKET_INDEX_KEY, "-inf", f"({current.timestamp()}")
+    async with r.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hgetall(key)
+        raws = await pipe.execute()
+    return len(raws)
+
+
+async def _measure(name: str, scenario, r: aioredis.Redis, stats: _BenchStatistics, current: datetime) -> None:
+    started = perf_counter()
+    for _ in range(ITERATIONS):
+        found = await scenario(r, stats, current)
+    elapsed = perf_counter() - started
+    print(f"{name:<22} {found:>4} бакетов {elapsed / ITERATIONS * 1000:>9.3f} мс/прогон")
+
+
+async def main() -> None:
+    client = aioredis.from_url(settings.redis_url, decode_responses=True)
+    stats = _BenchStatistics(db_session_factory=None)  # type: ignore[arg-type]
+    current = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
+    try:
+        await _fill(client, stats, current)
+        await _measure("SCAN + HGETALL", _scan, client, stats, current)
+        await _measure("ZRANGEBYSCORE + pipe", _index, client, stats, current)
+    finally:
+        keys = [key async for key in client.scan_iter(match=f"{PREFIX}*", count=10_000)]
+        for i in range(0, len(keys), 10_000):
+            await client.delete(*keys[i : i + 10_000])
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
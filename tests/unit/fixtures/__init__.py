@@ -0,0 +1 @@
+from tests.unit.fixtures.auto_use_fixtures import event_loop  # noqa
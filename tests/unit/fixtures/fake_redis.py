@@ -0,0 +1,323 @@
+"""Минимальный in-memory заменитель ``redis.asyncio.Redis`` для unit-тестов.
+
+Поддерживает только то, чем пользуются сервисы: строки, ZSET, списки,
+pub/sub и пайплайны (команды копятся и выполняются на ``execute``). TTL
+не моделируется — ``expire`` только запоминает значение. Lua-скрипты
+заменяются Python-аналогами из ``SCRIPTS``.
+"""
+
+import asyncio
+import fnmatch
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from services.redis_user_list_manager import _UPDATE_CHATTERS_LUA
+from services.sse_manager import _PUBLISH_EVENT_LUA
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self._redis = redis
+        self.channels: set[str] = set()
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    async def subscribe(self, *channels: str) -> None:
+        self.channels.update(channels)
+        if self not in self._redis.subscribers:
+            self._redis.subscribers.append(self)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        self.channels.difference_update(channels)
+
+    def deliver(self, channel: str, data: str) -> None:
+        self._queue.put_nowait({"type": "message", "channel": channel, "data": data})
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):  # noqa: ARG002
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+    async def aclose(self) -> None:
+        if self in self._redis.subscribers:
+            self._redis.subscribers.remove(self)
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self._redis = redis
+        self._calls: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        def call(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+
+        return call
+
+    async def execute(self) -> list[Any]:
+        calls, self._calls = self._calls, []
+        return [await getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+    def run_script(self, impl: Callable[..., Awaitable[Any]], keys: list[str], args: list[Any]) -> "FakePipeline":
+        self._calls.append(("run_script", (impl, keys, args), {}))
+        return self
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+
+class FakeScript:
+    def __init__(self, redis: "FakeRedis", script: str) -> None:
+        self._redis = redis
+        self._script = script
+
+    async def __call__(self, keys: list[str], args: list[Any], client: FakePipeline | None = None) -> Any:
+        # Аналог ищем при вызове: регистрировать скрипт без аналога можно, вызывать — нет.
+        impl = SCRIPTS[self._script]
+        if client is not None:
+            # Как у redis-py: в пайплайне вызов копится до ``execute``.
+            return client.run_script(impl, keys, args)
+        return await impl(self._redis, keys, args)
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, Any] = {}
+        self.ttl: dict[str, int] = {}
+        self.subscribers: list[FakePubSub] = []
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:  # noqa: ARG002
+        return FakePipeline(self)
+
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self)
+
+    def register_script(self, script: str) -> FakeScript:
+        return FakeScript(self, script)
+
+    async def run_script(self, impl: Callable[..., Awaitable[Any]], keys: list[str], args: list[Any]) -> Any:
+        return await impl(self, keys, args)
+
+    async def close(self) -> None:
+        return None
+
+    # --- ключи ---
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def unlink(self, *keys: str) -> int:
+        return await self.delete(*keys)
+
+    async def exists(self, *keys: str) -> int:
+        return sum(key in self.data for key in keys)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        if key not in self.data:
+            return False
+        self.ttl[key] = int(seconds)
+        return True
+
+    async def pttl(self, key: str) -> int:
+        if key not in self.data:
+            return -2
+        return self.ttl[key] * 1000 if key in self.ttl else -1
+
+    async def scan_iter(self, match: str = "*", count: int | None = None):  # noqa: ARG002
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    # --- строки ---
+
+    async def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: Any, ex: int | None = None) -> bool:
+        self.data[key] = str(value)
+        if ex is not None:
+            self.ttl[key] = ex
+        return True
+
+    async def setex(self, key: str, seconds: int, value: Any) -> bool:
+        return await self.set(key, value, ex=seconds)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        value = int(self.data.get(key, 0)) + amount
+        self.data[key] = str(value)
+        return value
+
+    # --- хеши ---
+
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        h = self.data.setdefault(key, {})
+        h[field] = str(int(h.get(field, 0)) + amount)
+        return int(h[field])
+
+    async def hset(self, key: str, field: str | None = None, value: Any = None, mapping: dict | None = None) -> int:
+        h = self.data.setdefault(key, {})
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        for k, v in items.items():
+            h[k] = str(v)
+        return len(items)
+
+    async def hpexpire(self, key: str, milliseconds: int, *fields: str) -> list[int]:  # noqa: ARG002
+        # TTL полей не моделируется, как и TTL ключей.
+        return [1 if field in self.data.get(key, {}) else -2 for field in fields]
+
+    async def hgetall(self, key: str) -> dict[str, str]:
+        return dict(self.data.get(key, {}))
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        h = self.data.get(key, {})
+        removed = sum(h.pop(field, None) is not None for field in fields)
+        if key in self.data and not h:
+            del self.data[key]
+        return removed
+
+    # --- множества (HyperLogLog — точное множество) ---
+
+    async def sadd(self, key: str, *members: Any) -> int:
+        st = self.data.setdefault(key, set())
+        added = len({str(m) for m in members} - st)
+        st.update(str(m) for m in members)
+        return added
+
+    async def smembers(self, key: str) -> Any:
+        return set(self.data.get(key, set()))
+
+    async def srem(self, key: str, *members: Any) -> int:
+        st = self.data.get(key, set())
+        removed = len(st & {str(m) for m in members})
+        st.difference_update(str(m) for m in members)
+        if key in self.data and not st:
+            del self.data[key]
+        return removed
+
+    async def pfadd(self, key: str, *members: Any) -> int:
+        return int(await self.sadd(key, *members) > 0)
+
+    async def pfcount(self, *keys: str) -> int:
+        return len(set().union(*(self.data.get(key, set()) for key in keys)))
+
+    # --- ZSET ---
+
+    async def zadd(self, key: str, mapping: dict[str, float]) -> int:
+        z = self.data.setdefault(key, {})
+        added = sum(member not in z for member in mapping)
+        z.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    async def zrem(self, key: str, *members: str) -> int:
+        z = self.data.get(key, {})
+        removed = sum(z.pop(member, None) is not None for member in members)
+        if key in self.data and not z:
+            del self.data[key]
+        return removed
+
+    @staticmethod
+    def _in_range(score: float, lo: Any, hi: Any) -> bool:
+        def bound(value: Any) -> tuple[float, bool]:
+            value = str(value)
+            if value.startswith("("):
+                return float(value[1:]), True
+            return float(value), False
+
+        lo_v, lo_open = bound(lo)
+        hi_v, hi_open = bound(hi)
+        above = score > lo_v if lo_open else score >= lo_v
+        below = score < hi_v if hi_open else score <= hi_v
+        return above and below
+
+    async def zcount(self, key: str, lo: Any, hi: Any) -> int:
+        return sum(self._in_range(score, lo, hi) for score in self.data.get(key, {}).values())
+
+    async def zrangebyscore(self, key: str, lo: Any, hi: Any) -> list[str]:
+        z = self.data.get(key, {})
+        return [m for m, s in sorted(z.items(), key=lambda kv: kv[1]) if self._in_range(s, lo, hi)]
+
+    async def zrevrangebyscore(self, key: str, hi: Any, lo: Any, withscores: bool = False) -> list:
+        z = self.data.get(key, {})
+        members = list(reversed(await self.zrangebyscore(key, lo, hi)))
+        return [(m, z[m]) for m in members] if withscores else members
+
+    async def zrange(self, key: str, start: int, end: int) -> list[str]:
+        members = await self.zrangebyscore(key, "-inf", "+inf")
+        return members[start : None if end == -1 else end + 1]
+
+    async def zscore(self, key: str, member: str) -> float | None:
+        return self.data.get(key, {}).get(member)
+
+    async def zremrangebyscore(self, key: str, lo: Any, hi: Any) -> int:
+        return await self.zrem(key, *await self.zrangebyscore(key, lo, hi)) if key in self.data else 0
+
+    async def zremrangebyrank(self, key: str, start: int, end: int) -> int:
+        members = await self.zrangebyscore(key, "-inf", "+inf")
+        return await self.zrem(key, *members[start : None if end == -1 else end + 1]) if members else 0
+
+    # --- списки ---
+
+    async def rpush(self, key: str, *values: Any) -> int:
+        lst = self.data.setdefault(key, [])
+        lst.extend(str(v) for v in values)
+        return len(lst)
+
+    async def lrange(self, key: str, start: int, end: int) -> list[str]:
+        lst = self.data.get(key, [])
+        return lst[start : None if end == -1 else end + 1]
+
+    async def ltrim(self, key: str, start: int, end: int) -> bool:
+        if key in self.data:
+            self.data[key] = await self.lrange(key, start, end)
+        return True
+
+    # --- pub/sub ---
+
+    async def publish(self, channel: str, data: Any) -> int:
+        receivers = [ps for ps in self.subscribers if channel in ps.channels]
+        for ps in receivers:
+            ps.deliver(channel, str(data))
+        return len(receivers)
+
+
+# --- Lua-скрипты ---
+
+
+async def _publish_event(redis: FakeRedis, keys: list[str], args: list[Any]) -> int:
+    now, data, size, ttl, channel, instance_id = args
+    event_id = max(int(await redis.get(keys[0]) or 0) + 1, int(now))
+    await redis.set(keys[0], event_id, ex=int(ttl))
+    if int(size) > 0:
+        await redis.rpush(keys[1], f"{event_id}:{data}")
+        await redis.ltrim(keys[1], -int(size), -1)
+        await redis.expire(keys[1], int(ttl))
+    await redis.publish(channel, f"{instance_id}:{event_id}:{data}")
+    return event_id
+
+
+async def _update_chatters(redis: FakeRedis, keys: list[str], args: list[Any]) -> int:
+    min_score, max_users, ttl, *items = args
+    for login, ts, name in zip(items[::3], items[1::3], items[2::3], strict=True):
+        await redis.zadd(keys[0], {login: ts})
+        await redis.hset(keys[1], login, name)
+    stale = await redis.zrangebyscore(keys[0], "-inf", min_score)
+    extra = [m for m in await redis.zrange(keys[0], 0, -1) if m not in stale][: -int(max_users) or None]
+    removed = stale + extra
+    if removed:
+        await redis.zrem(keys[0], *removed)
+        await redis.hdel(keys[1], *removed)
+    await redis.expire(keys[0], int(ttl))
+    await redis.expire(keys[1], int(ttl))
+    return len(removed)
+
+
+SCRIPTS: dict[str, Callable[[FakeRedis, list[str], list[Any]], Awaitable[Any]]] = {
+    _PUBLISH_EVENT_LUA: _publish_event,
+    _UPDATE_CHATTERS_LUA: _update_chatters,
+}
@@ -1,11 +1,17 @@
 import datetime
 import random
+import re
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from twitchAPI.chat import ChatMessage
 
-from schemas.twitch import ChatMessageSchema
-from twitch.chat.handlers.handlers import HelloHandler
+from container_runtime import set_container
+from schemas.api import StatsType
+from schemas.twitch import ChatMessageSchema, ChatMessageWebhookEventSchema
+from twitch.chat.bot import ChatBot
+from twitch.chat.commands import DiceCommand, LurkCommand
+from twitch.chat.handlers.handlers import HandlerResult, HelloHandler, IAmBotHandler, UnlurkHandler
 
 
 @pytest.mark.parametrize(
@@ -114,3 +120,155 @@ async def test_new_message(
     handler = HelloHandler(sm=state_manager, send_message=send_message_mock)
     await handler.handle("TestStreamer", msg)
     send_message_mock.assert_not_sent()
+
+
+@pytest.mark.parametrize(
+    ("handler", "user_message", "interested"),
+    [
+        (HelloHandler, "@Quantum075Bot, привет!", True),
+        (HelloHandler, "Дарова @Quantum075Bot", True),
+        (HelloHandler, "@Quantum075Bot йоу", False),
+        (IAmBotHandler, "@Quantum075Bot ты бот?", True),
+        (IAmBotHandler, "Боты плюс в чат", True),
+        (IAmBotHandler, "просто сообщение", False),
+    ],
+)
+def test_interest_pattern(handler, user_message, interested):
+    assert bool(re.search(handler.interest_pattern, user_message.lower())) is interested
+
+
+@pytest.fixture(autouse=True)
+def container(monkeypatch):
+    # Команды при создании берут chat_bot из контейнера — в этих тестах он не нужен.
+    set_container(MagicMock())
+    # Индекс лурков — на классе; каждому тесту свой, пустой.
+    monkeypatch.setattr(LurkCommand, "_lurkers", {})
+    monkeypatch.setattr(LurkCommand, "_loaded_at", {})
+    yield
+    set_container(None)
+
+
+def make_bot(state_manager) -> tuple[ChatBot, MagicMock, AsyncMock]:
+    """Бот без Twitch и БД: стример из кеша-заглушки, handle менеджеров — моки."""
+    statistics = MagicMock()
+    streamer_cache = MagicMock()
+    streamer_cache.get = AsyncMock(return_value=MagicMock(login_name="twitch"))
+    bot = ChatBot(
+        db_session_factory=None,  # type: ignore[arg-type]
+        state_manager=state_manager,
+        mqtt=None,  # type: ignore[arg-type]
+        statistics=statistics,
+        streamer_cache=streamer_cache,
+    )
+    bot._command_manager.register(DiceCommand)
+    bot._handler_manager.register(HelloHandler)
+    bot._handler_manager.register(UnlurkHandler)
+    bot._command_manager.handle = AsyncMock()  # type: ignore[method-assign]
+    bot._handler_manager.handle = AsyncMock()  # type: ignore[method-assign]
+    return bot, statistics, streamer_cache.get
+
+
+def with_text(raw: dict, text: str) -> dict:
+    return {**raw["event"], "message": {"text": text, "fragments": []}}
+
+
+def prefiltered(statistics: MagicMock) -> bool:
+    return any(call.args[:1] == (StatsType.MESSAGE_PREFILTERED,) for call in statistics.inc.call_args_list)
+
+
+async def test_prefilter_skips_plain_message(state_manager, twitch_message_event_raw):
+    bot, statistics, get_streamer = make_bot(state_manager)
+    event = with_text(twitch_message_event_raw, "просто сообщение")
+    await LurkCommand.load_lurkers(state_manager, event["broadcaster_user_login"])
+    await bot.on_message(event)
+    get_streamer.assert_not_awaited()
+    bot._command_manager.handle.assert_not_awaited()
+    assert prefiltered(statistics)
+
+
+@pytest.mark.parametrize("text", ["!dice", "!d20 ещё раз", "@Quantum075Bot, привет!"])
+async def test_prefilter_passes_commands_and_triggers(state_manager, twitch_message_event_raw, text):
+    bot, statistics, get_streamer = make_bot(state_manager)
+    await bot.on_message(with_text(twitch_message_event_raw, text))
+    get_streamer.assert_awaited_once()
+    bot._command_manager.handle.assert_awaited_once()
+    bot._handler_manager.handle.assert_awaited_once()
+    assert not prefiltered(statistics)
+
+
+async def test_prefilter_passes_lurker(state_manager, twitch_message_event_raw):
+    bot, statistics, get_streamer = make_bot(state_manager)
+    event = with_text(twitch_message_event_raw, "я вернулся")
+    await LurkCommand.load_lurkers(state_manager, event["broadcaster_user_login"])
+    LurkCommand.mark_lurk(event["broadcaster_user_login"], event["chatter_user_login"])
+    await bot.on_message(event)
+    get_streamer.assert_awaited_once()
+    assert not prefiltered(statistics)
+    LurkCommand.mark_unlurk(event["broadcaster_user_login"], event["chatter_user_login"])
+
+    # Вернувшийся из лурка больше не интересен UnlurkHandler.
+    await bot.on_message(event)
+    get_streamer.assert_awaited_once()
+    assert prefiltered(statistics)
+
+
+async def test_lurk_index_rebuilt_from_state_manager(state_manager, twitch_message_event_raw, monkeypatch):
+    bot, statistics, get_streamer = make_bot(state_manager)
+    event = with_text(twitch_message_event_raw, "я вернулся")
+    channel, user = event["broadcaster_user_login"], event["chatter_user_login"]
+    # Лурк объявлен до рестарта (или через другой инстанс) — в индексе его нет.
+    since = datetime.datetime.now().timestamp()
+    await state_manager.set_state(channel=channel, user=user.lower(), command="lurk", value=since)
+
+    # Пока индекс канала не загружен, префильтр пропускает сообщение.
+    await bot.on_message(event)
+    get_streamer.assert_awaited_once()
+    assert not prefiltered(statistics)
+
+    await LurkCommand.load_lurkers(state_manager, channel)
+    assert LurkCommand.is_lurking(channel, user)
+    assert not LurkCommand.is_lurking(channel, "someone_else")
+
+    # Индекс устаревает и перечитывается: снятый в хранилище лурк пропадает.
+    await state_manager.set_state(channel=channel, user=user.lower(), command="lurk", value=None)
+    monkeypatch.setattr(LurkCommand, "LURK_INDEX_REFRESH", -1)
+    assert not LurkCommand.is_index_fresh(channel)
+    await LurkCommand.load_lurkers(state_manager, channel)
+    assert not LurkCommand.is_lurking(channel, user)
+
+
+def test_lurk_index_case_insensitive_and_expires(monkeypatch):
+    LurkCommand.mark_lurk("Streamer", "Viewer")
+    assert LurkCommand.is_lurking("streamer", "viewer")
+    LurkCommand.mark_unlurk("STREAMER", "VIEWER")
+    assert not LurkCommand.is_lurking("streamer", "viewer")
+
+    LurkCommand.mark_lurk("streamer", "viewer")
+    monkeypatch.setattr(LurkCommand, "LURK_TTL", -1)
+    assert not LurkCommand.is_lurking("streamer", "viewer")
+    LurkCommand.mark_unlurk("streamer", "viewer")
+
+
+@pytest.mark.parametrize(
+    ("text", "matches"),
+    [("!dice", True), ("!D20", True), ("!поднять", True), ("dice", False), ("!unknown", False)],
+)
+def test_commands_manager_could_match(state_manager, twitch_message_event_raw, text, matches):
+    bot, _, _ = make_bot(state_manager)
+    message = ChatMessageWebhookEventSchema.model_validate(with_text(twitch_message_event_raw, text))
+    assert bot._command_manager.could_match(message) is matches
+
+
+async def test_unlurk_after_restart(state_manager, send_message_mock, twitch_message_event_raw):
+    event = ChatMessageWebhookEventSchema.model_validate(with_text(twitch_message_event_raw, "я вернулся"))
+    channel, user = event.broadcaster_user_login, event.chatter_user_login
+    since = datetime.datetime.now().timestamp() - UnlurkHandler.UNLURK_AFTER - 1
+    await state_manager.set_state(channel=channel, user=user.lower(), command="lurk", value=since)
+
+    handler = UnlurkHandler(sm=state_manager, send_message=send_message_mock)
+    handler.chat_bot.get_user_last_active = AsyncMock(return_value=since)
+    # Индекс пуст (как после рестарта): handle сам перечитывает его из StateManager.
+    result = await handler.handle(MagicMock(login_name=channel), event)
+    assert result is HandlerResult.HANDLED_AND_CONTINUE
+    assert await state_manager.get_state(channel=channel, user=user, command="lurk") is None
+    send_message_mock.assert_sent(f"@{user}, с возвращением из лурка!")
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from datetime import UTC, datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from schemas.api import StatsType
+from services.loop_monitor import LoopMonitor, SlowCallback
+
+
+def slow_callback(duration_ms: int, expected_wakeup: float = 0.0) -> SlowCallback:
+    return SlowCallback(
+        task="task",
+        coro=f"coro{duration_ms}",
+        stack=[],
+        started_at=datetime.now(UTC),
+        duration_ms=duration_ms,
+        expected_wakeup=expected_wakeup,
+    )
+
+
+@pytest.mark.asyncio
+async def test_blocking_step_is_captured():
+    statistics = MagicMock()
+    monitor = LoopMonitor(statistics=statistics, interval=0.02, threshold=0.05)
+    async with monitor.lifespan():
+        await asyncio.sleep(0.05)
+        time.sleep(0.3)  # noqa: ASYNC251 — блокируем loop нарочно
+        await asyncio.sleep(0.05)
+
+    (offender,) = monitor.offenders
+    assert offender.coro == "test_blocking_step_is_captured"
+    assert any("time.sleep(0.3)" in line for line in offender.stack)
+    assert offender.duration_ms >= 200
+    assert monitor.max_lag_ms >= 200
+    statistics.inc.assert_any_call(StatsType.SLOW_CALLBACKS, subtype="test_blocking_step_is_captured")
+    statistics.inc_timing.assert_any_call(StatsType.EVENT_LOOP_LAG, value_ms=monitor.max_lag_ms)
+
+
+@pytest.mark.asyncio
+async def test_stale_capture_is_discarded_by_sampler():
+    monitor = LoopMonitor(interval=0.01, threshold=10)
+    # Захват для пробуждения, которого сэмплер уже не ждёт.
+    monitor._stall = slow_callback(100, expected_wakeup=-1)
+    async with monitor.lifespan():
+        await asyncio.sleep(0.05)
+    assert monitor._stall is None
+    assert not monitor.offenders
+
+
+def test_watchdog_drops_capture_after_loop_moved_on():
+    monitor = LoopMonitor(threshold=0.01)
+    monitor._expected_wakeup = time.monotonic() - 1
+
+    def capture(expected_wakeup: float) -> SlowCallback:
+        # Пока снимался стек, сэмплер проснулся и ждёт уже следующего пробуждения.
+        monitor._expected_wakeup = time.monotonic() + 1
+        monitor._stop.set()
+        return slow_callback(100, expected_wakeup)
+
+    monitor._capture = capture  # type: ignore[method-assign]
+    monitor._watchdog()
+    assert monitor._stall is None
+
+
+def test_offenders_sorted_by_duration():
+    monitor = LoopMonitor(max_offenders=3)
+    for duration_ms in (150, 900, 120, 400):
+        monitor._offenders.append(slow_callback(duration_ms))
+    # Самый старый (150) вытеснен, остальные — от долгих к коротким.
+    assert [o.duration_ms for o in monitor.offenders] == [900, 400, 120]
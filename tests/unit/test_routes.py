@@ -41,6 +41,15 @@ async def test_admin_api_cookie(client, test_user_cookie):
     assert resp.status_code == 401
 
 
+@pytest.mark.asyncio()
+async def test_admin_stats_top_cookie(client, test_user_cookie):
+    # Топ каналов/чаттеров по всему сервису — только для админа, cookie пользователя мало.
+    resp = await client.get("/api/admin/stats/top?kind=chatters", cookies=test_user_cookie)
+    assert resp.status_code == 401
+    resp = await client.get("/api/user/stats/top?kind=chatters", cookies=test_user_cookie)
+    assert resp.status_code == 404
+
+
 @pytest.mark.asyncio()
 async def test_admin_api_invalid_creds(client):
     encoded_credentials = b64encode(
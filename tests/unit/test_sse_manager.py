@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+
+from routers.sse import _parse_last_event_id
+from services import sse_manager as sse_module
+from services.sse_manager import SSEConnection, SSEEvent, SSEManager
+from tests.unit.fixtures.fake_redis import FakeRedis
+from utils.enums import SSEChannel
+
+
+@pytest.mark.asyncio
+async def test_might_have_clients_local_and_grace(monkeypatch):
+    ssem = SSEManager()
+    assert not ssem.might_have_clients(1, SSEChannel.TTS)
+
+    conn = await ssem.connect(1, SSEChannel.TTS)
+    assert ssem.might_have_clients(1, SSEChannel.TTS)
+    assert not ssem.might_have_clients(1, SSEChannel.MESSAGE)
+
+    await ssem.disconnect(1, SSEChannel.TTS, conn)
+    # Грейс-период после ухода последнего клиента.
+    assert ssem.might_have_clients(1, SSEChannel.TTS)
+    monkeypatch.setattr(sse_module, "monotonic", lambda: float("inf"))
+    assert not ssem.might_have_clients(1, SSEChannel.TTS)
+
+
+@pytest.mark.asyncio
+async def test_might_have_clients_remote_announcement():
+    redis = FakeRedis()
+    local, remote = SSEManager(distributed=True), SSEManager(distributed=True)
+    await local.startup(redis)  # type: ignore[arg-type]
+    await remote.startup(redis)  # type: ignore[arg-type]
+    async with local.lifespan():
+        while not redis.subscribers:
+            await sse_module.asyncio.sleep(0.01)
+        await remote.connect(1, SSEChannel.TTS)
+        await sse_module.asyncio.sleep(0.05)
+        assert local.might_have_clients(1, SSEChannel.TTS)
+        assert not local.might_have_clients(2, SSEChannel.TTS)
+
+
+async def distributed_pair(redis: FakeRedis) -> tuple[SSEManager, SSEManager]:
+    a, b = SSEManager(distributed=True), SSEManager(distributed=True)
+    await a.startup(redis)  # type: ignore[arg-type]
+    await b.startup(redis)  # type: ignore[arg-type]
+    return a, b
+
+
+async def settle() -> None:
+    await sse_module.asyncio.sleep(0.05)
+
+
+def drain(conn) -> list[str]:
+    items = []
+    while not conn.queue.empty():
+        items.append(conn.queue.get_nowait().data)
+    return items
+
+
+@pytest.mark.asyncio
+async def test_distributed_broadcast_fans_out_once():
+    redis = FakeRedis()
+    a, b = await distributed_pair(redis)
+    async with a.lifespan(), b.lifespan():
+        await settle()
+        conn_a = await a.connect(1, SSEChannel.MESSAGE)
+        conn_b = await b.connect(1, SSEChannel.MESSAGE)
+        other = await b.connect(2, SSEChannel.MESSAGE)
+        await settle()
+
+        await a.broadcast(1, SSEChannel.MESSAGE, "hello")
+        await settle()
+        # Свой клиент получает напрямую, чужой — через pub/sub, без дублей.
+        assert drain(conn_a) == ["hello"]
+        assert drain(conn_b) == ["hello"]
+        assert drain(other) == []
+
+
+@pytest.mark.asyncio
+async def test_distributed_has_clients_sees_other_instance():
+    redis = FakeRedis()
+    a, b = await distributed_pair(redis)
+    assert not await a.has_clients(1, SSEChannel.TTS)
+    assert not await a.has_clients(1, None)
+
+    conn = await b.connect(1, SSEChannel.TTS)
+    assert await a.has_clients(1, SSEChannel.TTS)
+    assert await a.has_clients(1, None)
+    assert not await a.has_clients(1, SSEChannel.MESSAGE)
+
+    await b.disconnect(1, SSEChannel.TTS, conn)
+    assert not redis.data.get("sse:presence:1:tts")
+    # Присутствия больше нет, но ещё действует грейс-ключ.
+    assert await a.has_clients(1, SSEChannel.TTS)
+    await redis.delete("sse:grace:1:tts")
+    assert not await a.has_clients(1, SSEChannel.TTS)
+
+
+@pytest.mark.asyncio
+async def test_distributed_replay_from_redis():
+    redis = FakeRedis()
+    a, b = await distributed_pair(redis)
+    for text in ("one", "two", "three"):
+        await a.broadcast(1, SSEChannel.TTS, text)
+    first_id = int(redis.data["sse:replay:1:tts"][0].split(":", 1)[0])
+
+    # Реконнект на другой инстанс после первого события — досылаются остальные.
+    conn = await b.connect(1, SSEChannel.TTS, last_event_id=first_id)
+    assert drain(conn) == ["two", "three"]
+
+
+@pytest.mark.asyncio
+async def test_distributed_lifespan_removes_presence():
+    redis = FakeRedis()
+    a, _ = await distributed_pair(redis)
+    async with a.lifespan():
+        await a.connect(1, SSEChannel.TTS)
+        assert await redis.zcount("sse:presence:1:tts", "-inf", "+inf") == 1
+    assert not await redis.exists("sse:presence:1:tts")
+
+
+def make_conn(maxsize: int = 10) -> SSEConnection:
+    return SSEConnection(queue=asyncio.Queue(maxsize=maxsize))
+
+
+def test_resume_puts_missed_events_first():
+    conn = make_conn()
+    conn.offer(SSEEvent(id=5, data="live"))
+    conn.resume([SSEEvent(id=3, data="three"), SSEEvent(id=4, data="four")])
+    assert drain(conn) == ["three", "four", "live"]
+
+
+def test_resume_dedups_by_id_and_sorts():
+    conn = make_conn()
+    conn.offer(SSEEvent(id=4, data="four"))
+    conn.offer(SSEEvent(id=2, data="two"))
+    # Событие 4 пришло и вживую, и из буфера — остаётся одно.
+    conn.resume([SSEEvent(id=4, data="four"), SSEEvent(id=3, data="three"), SSEEvent(id=1, data="one")])
+    assert drain(conn) == ["one", "two", "three", "four"]
+
+
+def test_resume_keeps_newest_on_overflow():
+    conn = make_conn(maxsize=2)
+    conn.offer(SSEEvent(id=3, data="three"))
+    conn.resume([SSEEvent(id=1, data="one"), SSEEvent(id=2, data="two")])
+    assert drain(conn) == ["two", "three"]
+
+
+def test_resume_on_closed_connection_is_noop():
+    conn = make_conn()
+    conn.closed = True
+    conn.resume([SSEEvent(id=1, data="one")])
+    assert conn.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_local_replay_on_reconnect():
+    ssem = SSEManager()
+    for text in ("one", "two", "three"):
+        await ssem.broadcast(1, SSEChannel.TTS, text)
+    first_id = ssem._replay[(1, SSEChannel.TTS)][0].id
+
+    conn = await ssem.connect(1, SSEChannel.TTS, last_event_id=first_id)
+    assert drain(conn) == ["two", "three"]
+
+
+@pytest.mark.asyncio
+async def test_evict_stale_local_replay(monkeypatch):
+    ssem = SSEManager()
+    await ssem.broadcast(1, SSEChannel.TTS, "old")
+    old_id = ssem._last_ids[(1, SSEChannel.TTS)]
+    ssem._evict_stale()
+    assert (1, SSEChannel.TTS) in ssem._replay
+
+    now = sse_module.time() + sse_module.SSE_REPLAY_TTL_S + 1
+    monkeypatch.setattr(sse_module, "time", lambda: now)
+    ssem._evict_stale()
+    assert not ssem._last_ids
+    assert not ssem._replay
+
+    # После забывания id пары не откатываются назад: они не меньше времени в мс.
+    await ssem.broadcast(1, SSEChannel.TTS, "new")
+    assert ssem._last_ids[(1, SSEChannel.TTS)] > old_id
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [(None, None), ("1700000000123", 1700000000123), ("²", None), ("abc", None), ("-1", None), ("", None)],
+)
+def test_parse_last_event_id(header, expected):
+    assert _parse_last_event_id(header) == expected
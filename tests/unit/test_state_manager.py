@@ -0,0 +1,99 @@
+import pytest
+
+from services.redis_state_manager import RedisStateManager
+from tests.unit.fixtures.fake_redis import FakeRedis
+from twitch.state_manager import SMKey, SMParam
+
+
+@pytest.mark.asyncio
+async def test_cooldown_limit(state_manager):
+    for _ in range(2):
+        assert await state_manager.try_acquire_cooldown(30, channel="Chan", user=1, command="bite", limit=2)
+    assert not await state_manager.try_acquire_cooldown(30, channel="chan", user=1, command="bite", limit=2)
+    assert 29 < await state_manager.cooldown_remaining(channel="chan", user=1, command="bite") <= 30
+    # Другой пользователь и другой канал — свои окна.
+    assert await state_manager.try_acquire_cooldown(30, channel="chan", user=2, command="bite")
+    assert await state_manager.try_acquire_cooldown(30, channel="other", user=1, command="bite")
+
+
+@pytest.mark.asyncio
+async def test_cooldown_release(state_manager):
+    assert await state_manager.try_acquire_cooldown(30, channel="chan", command="dice")
+    assert not await state_manager.try_acquire_cooldown(30, channel="chan", command="dice")
+    await state_manager.release_cooldown(channel="chan", command="dice")
+    assert await state_manager.cooldown_remaining(channel="chan", command="dice") == 0
+    assert await state_manager.try_acquire_cooldown(30, channel="chan", command="dice")
+
+
+@pytest.mark.asyncio
+async def test_batch_states(state_manager):
+    user_key = SMKey(channel="chan", command="pyramid", param=SMParam.USER)
+    height_key = SMKey(channel="chan", command="pyramid", param=SMParam.HEIGHT)
+    await state_manager.set_states({user_key: "vasya", height_key: 3})
+    assert await state_manager.get_states([height_key, user_key]) == [3, "vasya"]
+    await state_manager.set_states({user_key: None, height_key: None})
+    assert await state_manager.get_states([user_key, height_key]) == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache(state_manager):
+    from services.tiered_state_manager import TieredStateManager
+
+    tiered = TieredStateManager(backend=state_manager)  # type: ignore[arg-type]
+    await tiered.set_state(3, channel="chan", command="pyramid", param=SMParam.HEIGHT)
+    assert await tiered.get_state(channel="chan", command="pyramid", param=SMParam.HEIGHT) == 3
+    # Запись мимо L1 не видна до инвалидации.
+    await state_manager.set_state(4, channel="chan", command="pyramid", param=SMParam.HEIGHT)
+    assert await tiered.get_state(channel="chan", command="pyramid", param=SMParam.HEIGHT) == 3
+    tiered._l1_drop(["chan", None, "pyramid", None])
+    assert await tiered.get_state(channel="chan", command="pyramid", param=SMParam.HEIGHT) == 4
+    assert (tiered._hits, tiered._misses) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_in_memory_bounds():
+    from twitch.state_manager import InMemoryStateManager
+
+    sm = InMemoryStateManager(channels_size=2, users_size=2)
+    for user in (1, 2, 3):
+        await sm.set_state(user, channel="a", user=user)
+    assert await sm.get_state(channel="a", user=1) is None  # вытеснен LRU
+    await sm.set_state(1, channel="b")
+    await sm.get_state(channel="a", user=3)
+    await sm.set_state(1, channel="c")
+    assert list(sm._storage) == ["a", "c"]
+
+    # Общий канал не вытесняется вместе с обычными и ограничен отдельно.
+    bounded = InMemoryStateManager(channels_size=1, users_size=1, common_users_size=3)
+    for user in (1, 2, 3):
+        await bounded.set_state(user, user=user, command="bite", param=SMParam.PREVIOUS_VALUE)
+    for channel in ("a", "b"):
+        await bounded.set_state(1, channel=channel)
+    assert list(bounded._storage) == ["common", "b"]
+    for user in (1, 2, 3):
+        assert await bounded.get_state(user=user, command="bite", param=SMParam.PREVIOUS_VALUE) == user
+    await bounded.set_state(4, user=4, command="bite", param=SMParam.PREVIOUS_VALUE)
+    assert await bounded.get_state(user=1, command="bite", param=SMParam.PREVIOUS_VALUE) is None
+
+    expiring = InMemoryStateManager(default_ttl=0)
+    await expiring.set_state(1, channel="a")
+    assert await expiring.get_state(channel="a") is None
+    assert not expiring._storage and not expiring._expires
+
+
+@pytest.mark.asyncio
+async def test_legacy_migration_runs_once():
+    redis = FakeRedis()
+    await redis.set("sm:chan:dice:5:default", "i1")
+    manager = RedisStateManager()
+    await manager.startup(redis)  # type: ignore[arg-type]
+    async with manager.lifespan():
+        pass
+    assert redis.data["smh:chan"] == {"dice:5:default": "i1"}
+    assert "sm:chan:dice:5:default" not in redis.data
+
+    # Перенос уже отмечен — следующий старт keyspace не сканирует.
+    await redis.set("sm:chan:dice:6:default", "i1")
+    async with manager.lifespan():
+        pass
+    assert "sm:chan:dice:6:default" in redis.data
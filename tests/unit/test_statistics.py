@@ -0,0 +1,267 @@
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from database.models import Statistics, StatisticsDaily, StatisticsHourly
+from schemas.api import StatsType
+from services.statistics import (
+    BUCKET_SECONDS,
+    PARTITION_MONTHS_AHEAD,
+    StatisticsService,
+    _floor_to_bucket,
+    _table_for_step,
+    _value_expr_for,
+)
+from tests.unit.fixtures.fake_redis import FakeRedis
+
+
+def make_service(redis, db_session_factory=None) -> StatisticsService:
+    """Сервис без Prometheus; ``startup`` не нужен — Redis подставляем напрямую."""
+    service = StatisticsService(db_session_factory=db_session_factory, prometheus=None)  # type: ignore[arg-type]
+    service._r = redis
+    return service
+
+
+def recording_db(fail_on: str | None = None) -> tuple[list[str], object]:
+    """Фабрика сессий, которая запоминает SQL выполненных запросов и отдаёт пустой результат.
+
+    Запрос, в SQL или параметрах которого есть ``fail_on``, падает (и в ``statements`` не попадает).
+    """
+    statements: list[str] = []
+    session = MagicMock()
+
+    async def execute(stmt):
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        if fail_on is not None and fail_on in sql + repr(compiled.params):
+            raise RuntimeError("partition overlaps default")
+        statements.append(sql)
+        return MagicMock()
+
+    session.execute = execute
+    session.commit = AsyncMock()
+
+    @asynccontextmanager
+    async def factory():
+        yield session
+
+    return statements, factory
+
+
+def failing_redis() -> MagicMock:
+    redis = MagicMock()
+    redis.pipeline.return_value.execute = AsyncMock(side_effect=ConnectionError("redis is down"))
+    return redis
+
+
+def bucket_hash(redis: FakeRedis) -> dict[str, str]:
+    (key,) = [key for key in redis.data if key.startswith(StatisticsService.HASH_KEY_PREFIX)]
+    return redis.data[key]
+
+
+@pytest.mark.asyncio
+async def test_inc_is_buffered_until_flush():
+    redis = FakeRedis()
+    service = make_service(redis)
+    service.inc(StatsType.MESSAGE_INCOMING)
+    service.inc(StatsType.MESSAGE_INCOMING, amount=2)
+    service.inc(StatsType.MESSAGE_INCOMING, channel_id=42)
+    assert not redis.data
+    assert sorted(service._pending.values()) == [1, 3]
+
+    await service.flush()
+    assert not service._pending
+    fields = bucket_hash(redis)
+    assert fields[f"{StatsType.MESSAGE_INCOMING}::"] == "3"
+    assert fields[f"{StatsType.MESSAGE_INCOMING}::42"] == "1"
+    # Бакет попал в индекс недозаписанных и получил TTL.
+    (key,) = redis.data[StatisticsService.BUCKET_INDEX_KEY]
+    assert redis.ttl[key] == StatisticsService.HASH_TTL_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_flush_merges_back_on_redis_error():
+    service = make_service(failing_redis())
+    service.inc(StatsType.MESSAGE_INCOMING, amount=2)
+    service.mark_unique(StatsType.UNIQUE_CHATTERS, "vasya")
+    await service.flush()
+
+    # Дельты вернулись в буфер и складываются с пришедшими после ошибки.
+    service.inc(StatsType.MESSAGE_INCOMING, amount=3)
+    service.mark_unique(StatsType.UNIQUE_CHATTERS, "petya")
+    assert list(service._pending.values()) == [5]
+    assert list(service._pending_unique.values()) == [{"vasya", "petya"}]
+
+    redis = FakeRedis()
+    service._r = redis
+    await service.flush()
+    assert bucket_hash(redis)[f"{StatsType.MESSAGE_INCOMING}::"] == "5"
+    (pending_hll,) = redis.data[StatisticsService.HLL_PENDING_KEY]
+    assert await redis.pfcount(pending_hll) == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_unique_writes_closed_buckets_only():
+    redis = FakeRedis()
+    statements, factory = recording_db()
+    service = make_service(redis, db_session_factory=factory)
+    service.mark_unique(StatsType.UNIQUE_CHATTERS, "vasya")
+    service.mark_unique(StatsType.UNIQUE_CHATTERS, "petya")
+    await service.flush()
+    bucket = _floor_to_bucket(datetime.now(UTC), BUCKET_SECONDS)
+
+    # Бакет ещё открыт — в БД ничего не пишется, ключ ждёт.
+    await service._flush_unique(bucket)
+    assert not statements
+    assert redis.data[StatisticsService.HLL_PENDING_KEY]
+
+    await service._flush_unique(bucket + timedelta(seconds=BUCKET_SECONDS))
+    (sql,) = statements
+    assert sql.startswith("INSERT INTO statistics")
+    assert StatisticsService.HLL_PENDING_KEY not in redis.data
+
+
+@pytest.mark.asyncio
+async def test_lifespan_flushes_on_shutdown():
+    redis = FakeRedis()
+    service = make_service(redis)
+    service.FLUSH_INTERVAL_SECONDS = 60
+    async with service.lifespan():
+        service.inc(StatsType.MESSAGE_INCOMING)
+        assert not redis.data
+    assert not service._pending
+    assert bucket_hash(redis)[f"{StatsType.MESSAGE_INCOMING}::"] == "1"
+
+
+@pytest.mark.parametrize(
+    ("type_", "channel_id", "clause"),
+    [
+        (StatsType.UNIQUE_CHATTERS, None, "channel_id IS NULL"),
+        (StatsType.UNIQUE_CHATTERS, 42, "channel_id = "),
+        (StatsType.MESSAGE_INCOMING, None, None),
+    ],
+)
+@pytest.mark.parametrize("step_seconds", [10 * 60, 60 * 60, 24 * 60 * 60])
+@pytest.mark.asyncio
+async def test_query_rows_separates_channel_rows(type_, channel_id, clause, step_seconds):
+    statements, db = recording_db()
+    service = make_service(None, db)
+    end = datetime(2025, 8, 1, tzinfo=UTC)
+    await service._query_rows(
+        type_str=str(type_),
+        subtype_filter=None,
+        channel_id=channel_id,
+        start=end - timedelta(days=1),
+        end=end,
+        step_seconds=step_seconds,
+    )
+    (sql,) = statements
+    if clause is None:
+        assert "channel_id" not in sql
+    else:
+        assert clause in sql
+
+
+@pytest.mark.parametrize(
+    ("step_seconds", "table"),
+    [
+        (10 * 60, Statistics),
+        (20 * 60, Statistics),
+        (60 * 60, StatisticsHourly),
+        (3 * 60 * 60, StatisticsHourly),
+        (24 * 60 * 60, StatisticsDaily),
+        (7 * 24 * 60 * 60, StatisticsDaily),
+    ],
+)
+def test_table_for_step(step_seconds, table):
+    assert _table_for_step(step_seconds) is table
+
+
+def compiled(expr) -> str:
+    return str(expr.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.parametrize("table", [StatisticsHourly, StatisticsDaily])
+def test_gauge_value_over_rollup_is_weighted_by_samples(table):
+    # avg по 10-минутным бакетам = sum(count) / sum(samples) на любой гранулярности.
+    sql = compiled(_value_expr_for(str(StatsType.SSE_CONNECTIONS), table))
+    assert f"sum({table.__tablename__}.count)" in sql
+    assert f"sum({table.__tablename__}.samples)" in sql
+    assert f"sum({table.__tablename__}.count)" in compiled(_value_expr_for(str(StatsType.MESSAGE_INCOMING), table))
+
+
+@pytest.mark.asyncio
+async def test_rollup_carries_samples_through_levels():
+    statements, db = recording_db()
+    service = make_service(None, db)
+    await service.rollup()
+    hourly, daily = [sql for sql in statements if sql.startswith("INSERT")]
+
+    assert hourly.startswith("INSERT INTO statistics_hourly")
+    # Из 10-минутной таблицы каждая строка — один сэмпл.
+    assert "sum(%(param_1)s::INTEGER) AS sum_3" in hourly
+    assert "statistics.channel_id" in hourly.split("GROUP BY")[1]
+
+    assert daily.startswith("INSERT INTO statistics_daily")
+    # Сутки собираются из часов: сэмплы суммируются, а не считаются строками.
+    assert "sum(statistics_hourly.samples)" in daily
+    assert "ON CONFLICT (bucket_ts, type, subtype, channel_id) DO UPDATE" in daily
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_isolates_failing_month():
+    now = datetime.now(UTC)
+    next_month = datetime(now.year + now.month // 12, now.month % 12 + 1, 1, tzinfo=UTC)
+    statements, db = recording_db(fail_on=f"statistics_p{next_month:%Y_%m}")
+    service = make_service(None, db)
+    await service.ensure_partitions()
+    # Упал только следующий месяц, текущий и дальнейшие созданы.
+    created = [sql.split()[5] for sql in statements]
+    assert len(created) == PARTITION_MONTHS_AHEAD
+    assert created[0] == f"statistics_p{now:%Y_%m}"
+    assert f"statistics_p{next_month:%Y_%m}" not in created
+
+
+async def fill_buckets(redis: FakeRedis, service: StatisticsService, buckets: list[datetime]) -> None:
+    for bucket in buckets:
+        service._add_pending(bucket, f"{StatsType.MESSAGE_INCOMING}::", 1)
+    await service.flush()
+    assert len(redis.data[StatisticsService.BUCKET_INDEX_KEY]) == len(buckets)
+
+
+@pytest.mark.asyncio
+async def test_dump_buckets_index_flow():
+    redis = FakeRedis()
+    statements, db = recording_db()
+    service = make_service(redis, db)
+    current = datetime(2025, 8, 1, 12, tzinfo=UTC)
+    closed = current - timedelta(minutes=10)
+    await fill_buckets(redis, service, [closed, current])
+
+    assert await service._dump_buckets(current) == 1
+    (insert,) = statements
+    assert insert.startswith("INSERT INTO statistics ")
+    # Записанный бакет убран и из хэшей, и из индекса; текущий ждёт следующего запуска.
+    assert service._bucket_key(closed) not in redis.data
+    assert list(redis.data[StatisticsService.BUCKET_INDEX_KEY]) == [service._bucket_key(current)]
+    assert service._bucket_key(current) in redis.data
+
+
+@pytest.mark.asyncio
+async def test_dump_buckets_falls_back_to_one_by_one():
+    redis = FakeRedis()
+    current = datetime(2025, 8, 1, 12, tzinfo=UTC)
+    poisoned, good = current - timedelta(minutes=20), current - timedelta(minutes=10)
+    statements, db = recording_db(fail_on=repr(poisoned))
+    service = make_service(redis, db)
+    await fill_buckets(redis, service, [poisoned, good])
+
+    assert await service._dump_buckets(current) == 1
+    assert len(statements) == 1
+    # Упавший бакет остаётся в индексе и в Redis до следующего запуска.
+    assert list(redis.data[StatisticsService.BUCKET_INDEX_KEY]) == [service._bucket_key(poisoned)]
+    assert service._bucket_key(poisoned) in redis.data
+    assert service._bucket_key(good) not in redis.data
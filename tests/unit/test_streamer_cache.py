@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from database.models import User
+from services.streamer_cache import StreamerCache
+from tests.unit.fixtures.fake_redis import FakeRedis
+
+
+def make_cache(ttl: float = 60) -> tuple[StreamerCache, list[str]]:
+    """Кеш без БД: ``_load`` отдаёт нового ``User`` и считает обращения."""
+    loads: list[str] = []
+    cache = StreamerCache(db_session_factory=None, ttl=ttl)  # type: ignore[arg-type]
+
+    async def load(twitch_id: str) -> User:
+        loads.append(twitch_id)
+        await asyncio.sleep(0.01)
+        return User(twitch_id=twitch_id, login_name=f"user{len(loads)}")
+
+    cache._load = load  # type: ignore[method-assign]
+    return cache, loads
+
+
+@pytest.mark.asyncio
+async def test_streamer_cache_hit_and_ttl():
+    cache, loads = make_cache(ttl=0.05)
+    first = await cache.get(1)
+    assert await cache.get("1") is first
+    assert loads == ["1"]
+
+    await asyncio.sleep(0.06)
+    assert await cache.get(1) is not first
+    assert loads == ["1", "1"]
+
+
+@pytest.mark.asyncio
+async def test_streamer_cache_single_flight():
+    cache, loads = make_cache()
+    users = await asyncio.gather(*(cache.get(1) for _ in range(10)))
+    assert loads == ["1"]
+    assert all(user is users[0] for user in users)
+
+
+@pytest.mark.asyncio
+async def test_streamer_cache_invalidate_during_load():
+    cache, loads = make_cache()
+    pending = asyncio.create_task(cache.get(1))
+    await asyncio.sleep(0)
+    # Загрузка началась до инвалидации — её результат в кеш не попадает.
+    cache.invalidate(1)
+    await pending
+    await cache.get(1)
+    assert loads == ["1", "1"]
+
+
+@pytest.mark.asyncio
+async def test_streamer_cache_invalidation_pubsub():
+    redis = FakeRedis()
+    cache_a, loads_a = make_cache()
+    cache_b, loads_b = make_cache()
+    await cache_a.startup(redis)  # type: ignore[arg-type]
+    await cache_b.startup(redis)  # type: ignore[arg-type]
+    async with cache_a.lifespan(), cache_b.lifespan():
+        await cache_a.get(1)
+        await cache_b.get(1)
+        # Ждём, пока слушатели подпишутся на канал инвалидаций.
+        while len(redis.subscribers) < 2:
+            await asyncio.sleep(0.01)
+
+        cache_a.invalidate(1)
+        await asyncio.sleep(0.05)
+
+        await cache_a.get(1)
+        await cache_b.get(1)
+    assert loads_a == ["1", "1"]
+    assert loads_b == ["1", "1"]
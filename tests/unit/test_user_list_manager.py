@@ -0,0 +1,109 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import redis.asyncio as aioredis
+
+from container import Container
+from services.redis_user_list_manager import RedisUserListManager
+from tests.unit.fixtures.fake_redis import FakeRedis
+from twitch.user_list_manager import UserListManager
+
+
+def chat_message(name: str, login: str | None = None) -> SimpleNamespace:
+    return SimpleNamespace(chatter_user_name=name, chatter_user_login=login or name.lower())
+
+
+class FailingRedis(FakeRedis):
+    def pipeline(self, transaction: bool = True):  # noqa: ARG002
+        raise aioredis.ConnectionError("redis is down")
+
+
+@pytest.mark.asyncio
+async def test_cleanup_drops_quiet_channels():
+    manager = UserListManager(forget_timeout=0.05)
+    await manager.handle("Quiet", chat_message("Vasya"))
+    await manager.handle("Busy", chat_message("Petya"))
+    await asyncio.sleep(0.06)
+    await manager.handle("Busy", chat_message("Masha"))
+
+    manager.cleanup()
+    assert list(manager._last_messages) == ["busy"]
+    assert [name for name, _ in manager.get_active_users("busy")] == ["Masha"]
+
+
+@pytest.mark.asyncio
+async def test_lifespan_sweeps_periodically():
+    manager = UserListManager(forget_timeout=0.01, cleanup_interval=0.02)
+    async with manager.lifespan():
+        await manager.handle("Quiet", chat_message("Vasya"))
+        await asyncio.sleep(0.1)
+        assert not manager._last_messages
+
+
+@pytest.mark.asyncio
+async def test_lookup_by_login_returns_display_name():
+    manager = UserListManager()
+    await manager.handle("Chan", chat_message("Кот", login="kot_login"))
+    assert manager.is_user_active("chan", "Kot_Login")
+    assert await manager.last_active("chan", "kot_login")
+    assert not manager.is_user_active("chan", "Кот")
+    assert [name for name, _ in await manager.active_users("chan")] == ["Кот"]
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_returns_display_names():
+    redis = FakeRedis()
+    writer, reader = RedisUserListManager(), RedisUserListManager()
+    await writer.startup(redis)  # type: ignore[arg-type]
+    await reader.startup(redis)  # type: ignore[arg-type]
+
+    await writer.handle("Chan", chat_message("Vasya"))
+    await writer.handle("Chan", chat_message("Кот", login="kot_login"))
+    await writer.flush()
+    assert not writer._pending
+
+    # Другой инстанс видит имена как в чате, а не логины.
+    assert [name for name, _ in await reader.active_users("chan")] == ["Кот", "Vasya"]
+    assert await reader.last_active("chan", "kot_login") == redis.data["chatters:chan"]["kot_login"]
+    assert redis.ttl["chatters:names:chan"] == redis.ttl["chatters:chan"]
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_trims_names_with_window():
+    redis = FakeRedis()
+    manager = RedisUserListManager(max_users_per_channel=2)
+    await manager.startup(redis)  # type: ignore[arg-type]
+    for name in ("Vasya", "Petya", "Masha"):
+        await manager.handle("chan", chat_message(name))
+        await manager.flush()
+    # Логин, выпавший из окна, удаляется и из хеша имён.
+    assert set(redis.data["chatters:chan"]) == {"petya", "masha"}
+    assert set(redis.data["chatters:names:chan"]) == {"petya", "masha"}
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_last_active_by_login_while_pending():
+    manager = RedisUserListManager()
+    await manager.startup(FakeRedis())  # type: ignore[arg-type]
+    await manager.handle("chan", chat_message("Кот", login="kot_login"))
+    assert manager._pending["chan"]
+    assert await manager.last_active("chan", "kot_login")
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_keeps_pending_on_failure():
+    manager = RedisUserListManager()
+    await manager.startup(FailingRedis())  # type: ignore[arg-type]
+    await manager.handle("chan", chat_message("Vasya"))
+    await manager.flush()
+    assert list(manager._pending["chan"]) == ["vasya"]
+    # Redis недоступен — ответ из L1.
+    assert [name for name, _ in await manager.active_users("chan")] == ["Vasya"]
+
+
+@pytest.mark.parametrize(("backend", "cls"), [("memory", UserListManager), ("redis", RedisUserListManager)])
+def test_user_list_backend_selector(backend, cls):
+    container = Container()
+    with container.user_list_manager.selector.override(backend):
+        assert type(container.user_list_manager()) is cls
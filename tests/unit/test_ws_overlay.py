@@ -0,0 +1,99 @@
+import asyncio
+import struct
+from contextlib import ExitStack
+
+import pytest
+from dependency_injector import providers
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from container import Container
+from routers.ws import overlay
+from routers.ws.overlay import WS_CHANNEL_CODES, encode_batch
+from services.sse_manager import SSEEvent, SSEManager
+from utils.enums import SSEChannel, SSEOverflowPolicy
+
+HEADER = struct.Struct("!BQI")
+
+
+def decode_batch(data: bytes) -> list[tuple[int, int, str]]:
+    records = []
+    offset = 0
+    while offset < len(data):
+        code, event_id, length = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        records.append((code, event_id, data[offset : offset + length].decode()))
+        offset += length
+    return records
+
+
+@pytest.fixture
+def overlay_client():
+    """Только WS-роутер; ``sse_manager`` подменяется фабрикой ``make(policies)``."""
+    container = Container()
+    container.wire(modules=[overlay])
+    app = FastAPI()
+    app.include_router(overlay.router)
+
+    with ExitStack() as stack:
+
+        def make(policies=None) -> tuple[TestClient, SSEManager]:
+            ssem = SSEManager(policies=policies)
+            container.sse_manager.override(providers.Object(ssem))
+            return stack.enter_context(TestClient(app)), ssem
+
+        yield make
+    container.sse_manager.reset_override()
+    container.unwire()
+
+
+async def wait_disconnected(ssem: SSEManager) -> None:
+    while ssem._connections:
+        await asyncio.sleep(0.01)
+
+
+def test_encode_batch_layout():
+    data = encode_batch([(SSEChannel.HEAT, SSEEvent(id=7, data="{}")), (SSEChannel.TTS, SSEEvent(id=8, data="привет"))])
+    payload = "привет".encode()
+    assert data == (
+        HEADER.pack(3, 7, 2) + b"{}" + HEADER.pack(WS_CHANNEL_CODES[SSEChannel.TTS], 8, len(payload)) + payload
+    )
+    assert decode_batch(data) == [(3, 7, "{}"), (5, 8, "привет")]
+
+
+def test_overlay_ws_batches_events(overlay_client):
+    client, ssem = overlay_client()
+    with client.websocket_connect("/ws/overlay/1?channel=msg&channel=tts") as ws:
+        assert ssem.might_have_clients(1, SSEChannel.MESSAGE)
+        assert ssem.might_have_clients(1, SSEChannel.TTS)
+
+        async def burst() -> None:
+            await ssem.broadcast(1, SSEChannel.MESSAGE, "hi chat")
+            await ssem.broadcast(1, SSEChannel.TTS, "hello")
+
+        ws.portal.call(burst)
+        records = decode_batch(ws.receive_bytes())
+
+        # Клиент закрывает сокет — подписки снимаются. Ждём этого явно: выход
+        # из ``with`` сразу отменяет задачу приложения.
+        ws.close()
+        ws.portal.call(wait_disconnected, ssem)
+        assert set(ssem._grace_until) == {(1, SSEChannel.MESSAGE), (1, SSEChannel.TTS)}
+
+    # Оба события укладываются в одно окно и приходят одним сообщением.
+    assert [(code, data) for code, _, data in records] == [(2, "hi chat"), (5, "hello")]
+    assert records[0][1] == ssem._last_ids[(1, SSEChannel.MESSAGE)]
+
+
+def test_overlay_ws_closes_on_disconnect_overflow(overlay_client):
+    client, ssem = overlay_client({SSEChannel.TTS: (SSEOverflowPolicy.DISCONNECT, 1)})
+    with client.websocket_connect("/ws/overlay/1?channel=tts") as ws:
+
+        async def overflow() -> None:
+            await ssem.broadcast(1, SSEChannel.TTS, "one")
+            await ssem.broadcast(1, SSEChannel.TTS, "two")
+
+        ws.portal.call(overflow)
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_bytes()
+    assert exc.value.code == 1013
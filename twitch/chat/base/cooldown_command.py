@@ -1,13 +1,12 @@
 import logging
 from abc import abstractmethod
-from time import time
+from math import ceil
 
 from opentelemetry import trace
 
 from database.models import User
 from schemas.twitch import ChatMessageWebhookEventSchema
 from twitch.chat.base.base_command import Command
-from twitch.state_manager import SMParam
 
 logger = logging.getLogger(__name__)
 tracer = trace.get_tracer(__name__)
@@ -30,61 +29,46 @@ class SimpleCDCommand(Command):
         user: str = message.chatter_user_name
         user_id: int = message.chatter_user_id
 
-        last_command_call_user = await self._state_manager.get_state(
+        if self.cooldown_timer_per_user and not await self._state_manager.try_acquire_cooldown(
+            self.cooldown_timer_per_user,
             channel=streamer.login_name,
             user=user_id,
             command=self.command_name,
-            param=SMParam.COOLDOWN,
-        )
-        last_command_call_channel = await self._state_manager.get_state(
-            channel=streamer.login_name,
-            command=self.command_name,
-            param=SMParam.COOLDOWN,
-        )
-
-        if (
-            last_command_call_user
-            and self.cooldown_timer_per_user
-            and time() - last_command_call_user < self.cooldown_timer_per_user
         ):
             logger.debug(
                 f"Skip command {self.command_name} because of per-user cooldown"
             )
-            delay = self.cooldown_timer_per_user - int(time() - last_command_call_user)
-            response = await self._cooldown_reply(user, delay)
+            remaining = await self._state_manager.cooldown_remaining(
+                channel=streamer.login_name,
+                user=user_id,
+                command=self.command_name,
+            )
+            response = await self._cooldown_reply(user, ceil(remaining))
             await self.send_response(chat=streamer, message=response)
             return
 
-        if (
-            last_command_call_channel
-            and self.cooldown_timer_per_chat
-            and time() - last_command_call_channel < self.cooldown_timer_per_chat
+        if self.cooldown_timer_per_chat and not await self._state_manager.try_acquire_cooldown(
+            self.cooldown_timer_per_chat,
+            channel=streamer.login_name,
+            command=self.command_name,
         ):
             logger.debug(
                 f"Skip command {self.command_name} because of per-channel cooldown"
             )
-            delay = self.cooldown_timer_per_chat - int(
-                time() - last_command_call_channel
-            )
-            response = await self._cooldown_reply(user, delay)
-            await self.send_response(chat=streamer, message=response)
-            return
-
-        if self.cooldown_timer_per_chat:
-            await self._state_manager.set_state(
+            # Команда не выполнится — личный КД пользователю не засчитываем.
+            if self.cooldown_timer_per_user:
+                await self._state_manager.release_cooldown(
+                    channel=streamer.login_name,
+                    user=user_id,
+                    command=self.command_name,
+                )
+            remaining = await self._state_manager.cooldown_remaining(
                 channel=streamer.login_name,
                 command=self.command_name,
-                param=SMParam.COOLDOWN,
-                value=time(),
-            )
-        if self.cooldown_timer_per_user:
-            await self._state_manager.set_state(
-                channel=streamer.login_name,
-                user=user_id,
-                command=self.command_name,
-                param=SMParam.COOLDOWN,
-                value=time(),
             )
+            response = await self._cooldown_reply(user, ceil(remaining))
+            await self.send_response(chat=streamer, message=response)
+            return
 
         logger.debug(f"Handling with command handler")
         response = await self._handle(streamer, user, message.message.text)
@@ -1,6 +1,7 @@
 import logging
 from abc import abstractmethod
 from functools import partial
+from math import ceil
 from time import time
 from typing import Any
 
@@ -9,7 +10,7 @@ from opentelemetry import trace
 from database.models import User
 from schemas.twitch import ChatMessageWebhookEventSchema
 from twitch.chat.base.base_command import Command
-from twitch.state_manager import SMParam
+from twitch.state_manager import SMKey, SMParam
 from twitch.utils import extract_targets
 
 logger = logging.getLogger(__name__)
@@ -37,53 +38,36 @@ class SavingResultCommand(Command):
         user: str = message.chatter_user_name
         user_id: int = message.chatter_user_id
 
-        last_command_call = await self._state_manager.get_state(
-            channel=streamer.login_name,
-            user=user_id,
-            command=self.command_name,
-            param=SMParam.COOLDOWN,
-        )
-        last_result_value = await self._state_manager.get_state(
-            user=user_id,
-            command=self.command_name,
-            param=SMParam.PREVIOUS_VALUE,
-        )
-        last_result_time = await self._state_manager.get_state(
-            user=user_id,
-            command=self.command_name,
-            param=SMParam.PREVIOUS_VALUE_TIME,
-        )
+        value_key = SMKey(user=user_id, command=self.command_name, param=SMParam.PREVIOUS_VALUE)
+        time_key = SMKey(user=user_id, command=self.command_name, param=SMParam.PREVIOUS_VALUE_TIME)
+        last_result_value, last_result_time = await self._state_manager.get_states([value_key, time_key])
 
         targets = await extract_targets(
             message.message.text,
             message.broadcaster_user_name,
             message.chatter_user_name,
             partial(self.chat_bot.get_random_active_user, streamer),
-            partial(self.chat_bot._user_list_manager.get_active_users, streamer.login_name),
+            partial(self.chat_bot._user_list_manager.active_users, streamer.login_name),
         )
         if targets:
             response = await self._target_selected(user, targets)
             await self.send_response(chat=streamer, message=response)
             return
 
-        if (
-            last_command_call
-            and self.cooldown_timer
-            and time() - last_command_call < self.cooldown_timer
+        if self.cooldown_timer and not await self._state_manager.try_acquire_cooldown(
+            self.cooldown_timer,
+            channel=streamer.login_name,
+            user=user_id,
+            command=self.command_name,
         ):
-            delay = self.cooldown_timer - int(time() - last_command_call)
-            response = await self._cooldown_reply(user, delay)
+            remaining = await self._state_manager.cooldown_remaining(
+                channel=streamer.login_name,
+                user=user_id,
+                command=self.command_name,
+            )
+            response = await self._cooldown_reply(user, ceil(remaining))
             await self.send_response(chat=streamer, message=response)
             return
-        else:
-            if self.cooldown_timer:
-                await self._state_manager.set_state(
-                    channel=streamer.login_name,
-                    user=user_id,
-                    command=self.command_name,
-                    param=SMParam.COOLDOWN,
-                    value=time(),
-                )
 
         if (
             self.refresh_result_timer
@@ -99,18 +83,7 @@ class SavingResultCommand(Command):
             )
         else:
             new_value = await self.result_generator(last_result_value, user_id=user_id)
-            await self._state_manager.set_state(
-                user=user_id,
-                command=self.command_name,
-                param=SMParam.PREVIOUS_VALUE,
-                value=new_value,
-            )
-            await self._state_manager.set_state(
-                user=user_id,
-                command=self.command_name,
-                param=SMParam.PREVIOUS_VALUE_TIME,
-                value=time(),
-            )
+            await self._state_manager.set_states({value_key: new_value, time_key: time()})
             response = await self._handle_new(
                 streamer, user, message.message.text, new_value
             )
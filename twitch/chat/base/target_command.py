@@ -1,6 +1,7 @@
 import logging
 from abc import ABC, abstractmethod
 from functools import partial
+from math import ceil
 from time import time
 
 from opentelemetry import trace
@@ -46,7 +47,7 @@ class SimpleTargetCommand(Command, ABC):
                     message.broadcaster_user_name,
                     message.chatter_user_name,
                     partial(self.chat_bot.get_random_active_user, streamer),
-                    partial(self.chat_bot._user_list_manager.get_active_users, streamer.login_name),
+                    partial(self.chat_bot._user_list_manager.active_users, streamer.login_name),
                 )
             )
             if len(targets) == 0:
@@ -59,50 +60,21 @@ class SimpleTargetCommand(Command, ABC):
                 elif streamer.settings.chatbot_default_target_behaviour == ChatbotDefaultTargetBehaviour.RANDOM:
                     targets = ["@" + await self.chat_bot.get_random_active_user(streamer)]
 
-        last_command_call = await self._state_manager.get_state(
+        if self.cooldown_timer and not await self._state_manager.try_acquire_cooldown(
+            self.cooldown_timer,
             channel=streamer.login_name,
             user=user_id,
             command=self.command_name,
-            param=SMParam.COOLDOWN,
-        )
-        command_calls_count = await self._state_manager.get_state(
-            channel=streamer.login_name,
-            user=user_id,
-            command=self.command_name,
-            param=SMParam.CALL_COUNT,
-        )
-
-        if last_command_call and self.cooldown_timer and time() - last_command_call < self.cooldown_timer:
-            if self.cooldown_count == 1 or (command_calls_count or 1) >= self.cooldown_count:
-                delay = self.cooldown_timer - int(time() - last_command_call)
-                response = await self._cooldown_reply(user, delay)
-                await self.send_response(chat=streamer, message=response)
-                return
-            if self.cooldown_count > 1:
-                await self._state_manager.set_state(
-                    channel=streamer.login_name,
-                    user=user_id,
-                    command=self.command_name,
-                    param=SMParam.CALL_COUNT,
-                    value=command_calls_count + 1,
-                )
-        else:
-            if self.cooldown_timer:
-                await self._state_manager.set_state(
-                    channel=streamer.login_name,
-                    user=user_id,
-                    command=self.command_name,
-                    param=SMParam.COOLDOWN,
-                    value=time(),
-                )
-                if self.cooldown_count > 1:
-                    await self._state_manager.set_state(
-                        channel=streamer.login_name,
-                        user=user_id,
-                        command=self.command_name,
-                        param=SMParam.CALL_COUNT,
-                        value=1,
-                    )
+            limit=self.cooldown_count,
+        ):
+            remaining = await self._state_manager.cooldown_remaining(
+                channel=streamer.login_name,
+                user=user_id,
+                command=self.command_name,
+            )
+            response = await self._cooldown_reply(user, ceil(remaining))
+            await self.send_response(chat=streamer, message=response)
+            return
 
         if len(targets) == 1 and user.lower() == targets[0][1:].lower():
             response = await self._self_call_reply(user)
@@ -2,8 +2,7 @@ import asyncio
 import logging.config
 import random
 from collections import deque
-from collections.abc import AsyncIterator, Callable
-from contextlib import asynccontextmanager
+from collections.abc import Callable
 from contextvars import ContextVar
 from time import monotonic, time
 from typing import Any
@@ -12,16 +11,16 @@ from uuid import UUID
 import sqlalchemy as sa
 from opentelemetry import trace
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 from twitchAPI.chat import Chat
 
 from config import settings
 from database.models import TwitchUserSettings, User
-from exceptions import ToManyChatUnsubscribesStartupException, UserNotFoundInDatabase
-from schemas.api import StatsType
+from exceptions import ToManyChatUnsubscribesStartupException
+from schemas.api import StatsTopKind, StatsType
 from schemas.twitch import ChatMessageWebhookEventSchema
 from services.mqtt import MQTTClient
 from services.statistics import StatisticsService
+from services.streamer_cache import StreamerCache
 from twitch.chat.command_manager import CommandsManager
 from twitch.chat.commands import *
 from twitch.chat.handlers import PantsRaffleHandler, ThanksHandler
@@ -67,11 +66,14 @@ class ChatBot:
         state_manager: StateManager,
         mqtt: MQTTClient,
         statistics: StatisticsService | None = None,
+        streamer_cache: StreamerCache | None = None,
+        user_list_manager: UserListManager | None = None,
     ) -> None:
-        self._user_list_manager = UserListManager()
+        self._user_list_manager = user_list_manager or UserListManager()
         self._twitch: Twitch = None  # type: ignore
         self._db_session_factory = db_session_factory
         self._statistics = statistics
+        self._streamer_cache = streamer_cache or StreamerCache(db_session_factory)
         self._handler_manager: MessagesHandlerManager = MessagesHandlerManager(
             state_manager, self.send_message, self._db_session_factory
         )
@@ -212,30 +214,23 @@ class ChatBot:
             reply_parent_message_id=None,
         )
 
-    @asynccontextmanager
     @tracer.start_as_current_span("ChatBot: Get User")
-    async def _get_user_with_settings_by_twitch_id(self, channel_id: str) -> AsyncIterator[User]:
-        async with self._db_session_factory() as session:
-            result = await session.execute(
-                sa.select(User)
-                # .with_for_update()
-                .options(
-                    joinedload(User.settings),
-                    joinedload(User.links),
-                    joinedload(User.memealerts),
-                    joinedload(User.tts),
-                )
-                .filter_by(twitch_id=str(channel_id))
-            )
-            user = result.scalar_one_or_none()
-            if not user:
-                logger.error(f"User id={channel_id} not found")
-                raise UserNotFoundInDatabase
-            # if not user.in_beta_test:
-            #     logger.error(f"User {channel_name} not in beta test")
-            #     raise NotInBetaTest
-            yield user
-            await session.commit()
+    async def _get_user_with_settings_by_twitch_id(self, channel_id: str) -> User:
+        """Снапшот стримера с настройками из ``StreamerCache`` (без сессии на сообщение)."""
+        return await self._streamer_cache.get(channel_id)
+
+    def invalidate_streamer(self, channel_id: str | int) -> None:
+        """Сбросить закешированный снапшот стримера после изменения его настроек."""
+        self._streamer_cache.invalidate(channel_id)
+
+    @tracer.start_as_current_span("ChatBot: Prefilter")
+    def _could_match(self, message: ChatMessageWebhookEventSchema) -> bool:
+        """Префильтр до загрузки стримера: может ли сообщение заинтересовать команду или handler.
+
+        Основная масса сообщений чата — не команды и не триггеры, для них
+        не нужны ни БД, ни проход по всем handler'ам.
+        """
+        return self._command_manager.could_match(message) or self._handler_manager.could_match(message)
 
     @tracer.start_as_current_span("ChatBot: Processing Message")
     async def on_message(self, raw_message: ChatMessageWebhookEventSchema | dict[str, Any]):
@@ -264,19 +259,31 @@ class ChatBot:
             current_span.set_attribute("msg.channel", message.broadcaster_user_login)
             current_span.set_attribute("msg.chatter", message.chatter_user_login)
 
-        async with self._get_user_with_settings_by_twitch_id(message.broadcaster_user_id) as user:
+        # Уникальный канал для метрики ACTIVE_CHANNELS (subtype=incoming) и
+        # уникальные чаттеры — по сервису и по каналу.
+        if self._statistics is not None:
+            try:
+                channel_id = int(message.broadcaster_user_id)
+                self._statistics.mark_channel("incoming", channel_id)
+                self._statistics.mark_unique(StatsType.UNIQUE_CHATTERS, message.chatter_user_id)
+                self._statistics.mark_unique(StatsType.UNIQUE_CHATTERS, message.chatter_user_id, channel_id=channel_id)
+                self._statistics.track_top(StatsTopKind.CHANNELS, message.broadcaster_user_login)
+                self._statistics.track_top(StatsTopKind.CHATTERS, message.chatter_user_login)
+            except (TypeError, ValueError):
+                pass
+        # Список активных чаттеров нужен для случайных целей команд — в него
+        # попадает каждое сообщение, даже отсеянное префильтром.
+        await self._user_list_manager.handle(channel, message)
+
+        if self._could_match(message):
+            user = await self._get_user_with_settings_by_twitch_id(message.broadcaster_user_id)
             if user.login_name != message.broadcaster_user_login:
-                user.login_name = message.broadcaster_user_login
+                self._streamer_cache.rename(user, message.broadcaster_user_login)
             user_settings: TwitchUserSettings = user.settings
-            # Уникальный канал для метрики ACTIVE_CHANNELS (subtype=incoming).
-            if self._statistics is not None and user.twitch_id is not None:
-                try:
-                    self._statistics.mark_channel("incoming", int(user.twitch_id))
-                except (TypeError, ValueError):
-                    pass
-            await self._user_list_manager.handle(channel, message)
             await self._command_manager.handle(user_settings, user, message)
             await self._handler_manager.handle(user_settings, user, message)
+        elif self._statistics is not None:
+            self._statistics.inc(StatsType.MESSAGE_PREFILTERED)
 
         # Если ни один handler не ответил — всё равно сбрасываем ContextVar,
         # чтобы потенциально активная контекстная переменная не «протекла» в
@@ -349,17 +356,17 @@ class ChatBot:
     async def get_last_active_users(self, user: User | str) -> list[tuple[str, str]]:
         result = []
         dt = time()
-        for name, last_active in self._user_list_manager.get_active_users(
+        for name, last_active in await self._user_list_manager.active_users(
             user.login_name if isinstance(user, User) else user
         ):
             result.append((name, delay_to_seconds(dt - last_active) + " назад"))
         return result
 
     async def get_user_last_active(self, channel: str, user: str) -> float:
-        return self._user_list_manager.get_last_active(channel, user)
+        return await self._user_list_manager.last_active(channel, user)
 
     async def get_random_active_user(self, channel: User | str, max_period_sec: float = 30 * 60) -> str:
-        users = self._user_list_manager.get_active_users(
+        users = await self._user_list_manager.active_users(
             channel.login_name if isinstance(channel, User) else channel,
             timeout=max_period_sec,
         )
@@ -1,12 +1,13 @@
 import logging
 from collections.abc import Callable
 from typing import Awaitable
+from weakref import WeakKeyDictionary
 
 from opentelemetry import trace
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import TwitchUserSettings, User
-from schemas.api import StatsType
+from schemas.api import StatsTopKind, StatsType
 from schemas.twitch import ChatMessageWebhookEventSchema
 from services.statistics import StatisticsService
 from twitch.chat.base.base_command import Command
@@ -15,6 +16,9 @@ from twitch.state_manager import StateManager
 logger = logging.getLogger(__name__)
 tracer = trace.get_tracer(__name__)
 
+# Префикс, с которого начинаются все команды чата.
+COMMAND_PREFIX = "!"
+
 
 class CommandsManager:
     def __init__(
@@ -25,15 +29,71 @@ class CommandsManager:
         statistics: StatisticsService | None = None,
     ):
         self.commands: list[Command] = []
+        # Индекс диспетчеризации: alias в нижнем регистре -> индексы команд в
+        # ``self.commands``. Алиасы могут совпадать у нескольких команд (например,
+        # ``horny`` у HornyGood/HornyBad) — тогда срабатывают все включённые, в
+        # порядке регистрации, как и при линейном переборе.
+        self._alias_index: dict[str, list[int]] = {}
+        # Кеш битовых масок включённых команд: бит i = ``commands[i].is_enabled``.
+        # Ключ — сам объект настроек (weak), поэтому маска живёт ровно столько,
+        # сколько объект настроек, и не переживает их изменение в другой сессии.
+        self._enabled_masks: WeakKeyDictionary[TwitchUserSettings, int] = WeakKeyDictionary()
         self._sm = storage
         self._send_message = send_message
         self._db_session_factory = db_session_factory
         self._statistics = statistics
 
     def register(self, command: type[Command]):
-        self.commands.append(command(self._sm, self._send_message, self._db_session_factory))
+        cmd = command(self._sm, self._send_message, self._db_session_factory)
+        idx = len(self.commands)
+        self.commands.append(cmd)
+        for alias in cmd.command_aliases:
+            self._alias_index.setdefault(alias.lower(), []).append(idx)
+        # Набор команд изменился — ранее посчитанные маски больше невалидны.
+        self._enabled_masks.clear()
         logger.info(f"Command {command} was registered")
 
+    def enabled_mask(self, user_settings: TwitchUserSettings) -> int:
+        """Битовая маска команд, включённых в ``user_settings`` (бит i — ``commands[i]``)."""
+        try:
+            return self._enabled_masks[user_settings]
+        except (KeyError, TypeError):
+            pass
+        mask = 0
+        for i, cmd in enumerate(self.commands):
+            if cmd.is_enabled(user_settings):
+                mask |= 1 << i
+        try:
+            self._enabled_masks[user_settings] = mask
+        except TypeError:
+            # Объект не поддерживает weakref — просто не кешируем.
+            pass
+        return mask
+
+    def find_commands(self, text: str) -> list[int]:
+        """Возвращает индексы команд, чей алиас совпадает с первым словом сообщения.
+
+        Сообщение считается командой, если оно равно ``!alias`` или начинается с
+        ``!alias `` (с пробелом) — как и раньше, но вместо перебора всех алиасов
+        первое слово ищется в словаре за O(1).
+        """
+        if not text.startswith(COMMAND_PREFIX):
+            return []
+        token = text[len(COMMAND_PREFIX) :].split(" ", 1)[0].lower()
+        return self._alias_index.get(token, [])
+
+    @staticmethod
+    def _strip_reply(message: ChatMessageWebhookEventSchema) -> str:
+        """Текст сообщения без автоматического ``@parent `` в начале реплая."""
+        text = message.message.text
+        if message.reply and message.reply.parent_user_name and text.startswith(f"@{message.reply.parent_user_name} "):
+            return text[len(message.reply.parent_user_name) + 2 :]
+        return text
+
+    def could_match(self, message: ChatMessageWebhookEventSchema) -> bool:
+        """Префильтр: похоже ли сообщение на вызов какой-либо команды (по алиасам)."""
+        return bool(self.find_commands(self._strip_reply(message)))
+
     @tracer.start_as_current_span("ChatBot: Command Manager: Handle")
     async def handle(
         self,
@@ -45,39 +105,31 @@ class CommandsManager:
         if not user_settings.allow_shared_chat and message.source_broadcaster_user_id:
             logger.debug(f"Skip message because of common chat. Source: {message.source_broadcaster_user_login}, Broadcaster: {message.broadcaster_user_login}")
             return
-        for cmd in self.commands:
-            if not cmd.is_enabled(user_settings):
+        # Обработка реплаев
+        message.message.text = self._strip_reply(message)
+
+        candidates = self.find_commands(message.message.text)
+        if not candidates:
+            return
+
+        mask = self.enabled_mask(user_settings)
+        for i in candidates:
+            if not mask & (1 << i):
                 continue
-            # Обработка реплаев
-            if (
-                message.reply
-                and message.reply.parent_user_name
-                and message.message.text.startswith(
-                    f"@{message.reply.parent_user_name} "
-                )
-            ):
-                message.message.text = message.message.text[
-                    len(message.reply.parent_user_name) + 2 :
-                ]
-
-            if any(
-                # текст сообщения начинается с "!cmd " или = "!cmd"
-                (
-                    message.message.text.lower().startswith(x + " ")
-                    or message.message.text.lower() == x
-                )
-                for x in [f"!{alias}" for alias in cmd.command_aliases]
-            ):
-                logger.info(f"Handler for command was found: {cmd.__class__.__name__}")
-                await cmd.handle(streamer, message)
-                if self._statistics is not None:
-                    self._statistics.inc(StatsType.COMMAND_HANDLED, subtype=cmd.command_name)
+            cmd = self.commands[i]
+            logger.info(f"Handler for command was found: {cmd.__class__.__name__}")
+            await cmd.handle(streamer, message)
+            if self._statistics is not None:
+                self._statistics.inc(StatsType.COMMAND_HANDLED, subtype=cmd.command_name)
+                self._statistics.mark_unique(StatsType.UNIQUE_COMMAND_USERS, message.chatter_user_id)
+                self._statistics.track_top(StatsTopKind.COMMANDS, cmd.command_name)
 
     async def get_commands_of_user(self, user) -> list[tuple[str, str, str]]:
         user_settings: TwitchUserSettings = user.settings
+        mask = self.enabled_mask(user_settings)
         result = []
-        for cmd in self.commands:
-            if cmd.is_enabled(user_settings):
+        for i, cmd in enumerate(self.commands):
+            if mask & (1 << i):
                 result.append(
                     (
                         cmd.command_name,
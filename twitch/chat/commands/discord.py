@@ -44,3 +44,4 @@ class LinkDisCommand(SimpleCDCommand):
                 sa.update(Links).where(Links.user_id == streamer.id).values({"discord": link})
             )
             await session.commit()
+        self.chat_bot.invalidate_streamer(streamer.twitch_id)
@@ -1,8 +1,10 @@
 import random
 from time import time
+from typing import ClassVar
 
 from database.models import TwitchUserSettings, User
 from twitch.chat.base.cooldown_command import SimpleCDCommand
+from twitch.state_manager import DEFAULT_STATE_TTL, StateManager
 
 
 class LurkCommand(SimpleCDCommand):
@@ -12,6 +14,59 @@ class LurkCommand(SimpleCDCommand):
     cooldown_timer_per_user = 30
     cooldown_timer_per_chat = None
 
+    # Сколько помнить лурк в индексе — как TTL состояний в StateManager.
+    LURK_TTL = DEFAULT_STATE_TTL
+    # Как часто перечитывать лурки канала из StateManager. Меньше
+    # ``UnlurkHandler.UNLURK_AFTER``: лурк, объявленный до рестарта или через
+    # другой инстанс, попадает в индекс раньше, чем его пора снимать.
+    LURK_INDEX_REFRESH = 60
+    # Индекс лурков этого процесса для префильтра ``UnlurkHandler``:
+    # (канал, логин) -> время ухода в лурк. Сам лурк хранится в StateManager,
+    # и ``UnlurkHandler.handle`` сверяется с ним; индекс лишь избавляет от
+    # похода в Redis на каждое сообщение чата.
+    _lurkers: ClassVar[dict[tuple[str, str], float]] = {}
+    # Канал -> когда его лурки последний раз перечитывались из StateManager.
+    _loaded_at: ClassVar[dict[str, float]] = {}
+
+    @classmethod
+    def mark_lurk(cls, channel: str, user: str) -> None:
+        now = time()
+        for key in [key for key, since in cls._lurkers.items() if now - since > cls.LURK_TTL]:
+            del cls._lurkers[key]
+        cls._lurkers[(channel.lower(), user.lower())] = now
+
+    @classmethod
+    def mark_unlurk(cls, channel: str, user: str) -> None:
+        cls._lurkers.pop((channel.lower(), user.lower()), None)
+
+    @classmethod
+    def is_lurking(cls, channel: str, user: str) -> bool:
+        since = cls._lurkers.get((channel.lower(), user.lower()))
+        return since is not None and time() - since <= cls.LURK_TTL
+
+    @classmethod
+    def is_index_fresh(cls, channel: str) -> bool:
+        loaded_at = cls._loaded_at.get(channel.lower())
+        return loaded_at is not None and time() - loaded_at < cls.LURK_INDEX_REFRESH
+
+    @classmethod
+    async def load_lurkers(cls, state_manager: StateManager, channel: str) -> None:
+        """Перестраивает индекс канала по состояниям лурка из StateManager."""
+        channel = channel.lower()
+        # Отмечаем заранее: сообщения, пришедшие во время загрузки, не запускают её повторно.
+        cls._loaded_at[channel] = time()
+        lurkers: dict[tuple[str, str], float] = {}
+        try:
+            async for user, command, _, value in state_manager.get_all_from_channel(channel=channel):
+                if command == cls.command_name and isinstance(value, int | float):
+                    lurkers[(channel, str(user).lower())] = float(value)
+        except Exception:
+            cls._loaded_at.pop(channel, None)
+            raise
+        for key in [key for key in cls._lurkers if key[0] == channel]:
+            del cls._lurkers[key]
+        cls._lurkers.update(lurkers)
+
     command_name = "lurk"
     command_aliases = ["lurk", "unlurk", "лурк", "анлурк"]
     command_description = (
@@ -42,6 +97,7 @@ class LurkCommand(SimpleCDCommand):
                 command=self.command_name,
                 value=time(),
             )
+            self.mark_lurk(streamer.login_name, user)
             variants = [
                 f"@{user} прячется за холодильник и наблюдает за стримом оттуда. Спасибо за лурк!",
                 f"@{user} спотыкается об камушек, падает и проваливается в лурк",
@@ -74,6 +130,7 @@ class LurkCommand(SimpleCDCommand):
                 command=self.command_name,
                 value=None,
             )
+            self.mark_unlurk(streamer.login_name, user)
             unlurk_variants = [
                 f"@{user} выплывает из лурка. С возвращением!",
                 f"@{user} возвращается из тени и снова с нами!",
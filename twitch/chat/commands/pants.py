@@ -12,7 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import TwitchUserSettings, User, PantsDeny
 from twitch.chat.base.cooldown_command import SimpleCDCommand
-from twitch.state_manager import SMParam, StateManager
+from twitch.state_manager import SMKey, SMParam, StateManager
 from twitch.utils import extract_targets
 from utils.misc import call_with_delay, run_in_clean_otel_context
 
@@ -75,7 +75,7 @@ class PantsCommand(SimpleCDCommand):
                 streamer.login_name,
                 user,
                 partial(self.chat_bot.get_random_active_user, streamer),
-                partial(self.chat_bot._user_list_manager.get_active_users, streamer.login_name),
+                partial(self.chat_bot._user_list_manager.active_users, streamer.login_name),
             )  # TODO replace with display name
             logger.info(f"Target = {targets}")
             if len(targets) > 1:
@@ -93,14 +93,13 @@ class PantsCommand(SimpleCDCommand):
         # Выбор рандомной цели
         if not target:
             # Проверяем для каждого КД
-            users_last_ts: dict[str, float | None] = {
-                usr: await self._state_manager.get_state(
-                    channel=streamer.login_name,
-                    command=self.command_name,
-                    user=usr,
-                    param=SMParam.TARGET_COOLDOWN,
-                ) for usr in active_users
-            }
+            last_ts_values = await self._state_manager.get_states(
+                [
+                    SMKey(channel=streamer.login_name, command=self.command_name, user=usr, param=SMParam.TARGET_COOLDOWN)
+                    for usr in active_users
+                ]
+            )
+            users_last_ts: dict[str, float | None] = dict(zip(active_users, last_ts_values, strict=True))
             # Фильтруем
             targets = [usr for usr in active_users if (users_last_ts[usr] is None) or (time() - users_last_ts[usr] > self.cooldown_timer_per_target)]
             # Фильтруем запрещённые
@@ -134,21 +133,19 @@ class PantsCommand(SimpleCDCommand):
         if last_ts and time() - last_ts < self.cooldown_timer_per_target:
             return f"Трусы @{target} уже были недавно разыграны. Давайте позволим @{target} сперва найти и надеть новые трусы, а потом уже разыграем их"
 
-        # Запускаем розыгрыш
-        await self._state_manager.set_state(channel=streamer.login_name, command=self.command_name, param=SMParam.USER, value=target)
-        await self._state_manager.set_state(channel=streamer.login_name, command=self.command_name, param=SMParam.PARTICIPANTS, value=set())
+        # Запускаем розыгрыш и ставим кулдаун цели
+        await self._state_manager.set_states(
+            {
+                SMKey(channel=streamer.login_name, command=self.command_name, param=SMParam.USER): target,
+                SMKey(channel=streamer.login_name, command=self.command_name, param=SMParam.PARTICIPANTS): set(),
+                SMKey(
+                    channel=streamer.login_name, command=self.command_name, user=target, param=SMParam.TARGET_COOLDOWN
+                ): time(),
+            }
+        )
 
         # Запускаем асинхронный таймер
         asyncio.create_task(call_with_delay(60, run_in_clean_otel_context(self.finish_raffle(streamer, target))))
-
-        # Ставим кулдаун
-        await self._state_manager.set_state(
-            value=time(),
-            channel=streamer.login_name,
-            command=self.command_name,
-            user=target,
-            param=SMParam.TARGET_COOLDOWN,
-        )
         return f"Внимание, объявляется розыгрыш трусов @{target}! Ставьте '+' в чат, чтобы принять участие в розыгрыше!"
 
     async def _cooldown_reply(self, user: str, delay: int) -> str | None:
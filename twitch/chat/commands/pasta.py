@@ -42,4 +42,5 @@ class PastaCommand(SimpleCDCommand):
                 sa.update(TwitchUserSettings).where(TwitchUserSettings.user_id == streamer.id).values({"personal_pasta": pasta})
             )
             await session.commit()
+        self.chat_bot.invalidate_streamer(streamer.twitch_id)
         return "Паста сохранена."
\ No newline at end of file
@@ -48,3 +48,4 @@ class LinkYoutubeCommand(SimpleCDCommand):
         async with self.db_session() as session:
             await session.execute(sa.update(Links).where(Links.user_id == streamer.id).values({"youtube": link}))
             await session.commit()
+        self.chat_bot.invalidate_streamer(streamer.twitch_id)
@@ -7,13 +7,15 @@ from collections.abc import AsyncIterator, Awaitable, Callable
 from contextlib import asynccontextmanager
 from enum import Enum, auto
 from time import time
+from typing import ClassVar
 
 from opentelemetry import trace
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import TwitchUserSettings, User
 from schemas.twitch import ChatMessageWebhookEventSchema
-from twitch.state_manager import SMParam, StateManager
+from twitch.chat.commands.lurk import LurkCommand
+from twitch.state_manager import SMKey, SMParam, StateManager
 from utils.misc import call_with_delay
 
 logger = logging.getLogger(__name__)
@@ -27,10 +29,26 @@ class HandlerResult(Enum):
 
 
 class CommonMessagesHandler:
+    # Префильтр: регэксп (``re.search`` по тексту сообщения в нижнем регистре),
+    # описывающий сообщения, которые handler в принципе может обработать. Из всех
+    # паттернов MessagesHandlerManager собирает один общий регэксп. ``None`` —
+    # по тексту не определить, решает ``could_match``.
+    interest_pattern: ClassVar[str | None] = None
+
     @abstractmethod
     def is_enabled(self, streamer_settings: TwitchUserSettings) -> bool:
         raise NotImplementedError
 
+    def could_match(self, message: ChatMessageWebhookEventSchema) -> bool:
+        """Дешёвая нетекстовая проверка для сообщений, не прошедших ``interest_pattern``.
+
+        Вызывается на каждое сообщение чата до загрузки стримера, поэтому может
+        опираться только на само сообщение и состояние в памяти процесса — без
+        походов в Redis/БД (потому и не async). Ложное «да» допустимо: точную
+        проверку делает ``handle``. По умолчанию handler без паттерна интересуется всем.
+        """
+        return self.interest_pattern is None
+
     def __init__(
         self,
         sm: StateManager,
@@ -62,6 +80,10 @@ class PyramidHandler(CommonMessagesHandler):
     def is_enabled(self, streamer_settings: TwitchUserSettings) -> bool:
         return False  # streamer_settings.enable_pyramid or streamer_settings.enable_pyramid_breaker
 
+    def could_match(self, message: ChatMessageWebhookEventSchema) -> bool:
+        # Handler выключен. При включении: ломать пирамидку может любое сообщение.
+        return False
+
     async def handle(self, streamer: User, message: ChatMessageWebhookEventSchema) -> HandlerResult:
         # Check if pyramid part
         user = message.chatter_user_name
@@ -89,23 +111,18 @@ class PyramidHandler(CommonMessagesHandler):
 
         # Load previous state
         channel = streamer.login_name
-        state_user = await self._state_manager.get_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.USER)
-        state_emote = await self._state_manager.get_state(
-            channel=channel, command=self.COMMAND_NAME, param=SMParam.EMOTE
-        )
-        state_height = await self._state_manager.get_state(
-            channel=channel, command=self.COMMAND_NAME, param=SMParam.HEIGHT
-        )
-        state_dir = await self._state_manager.get_state(
-            channel=channel, command=self.COMMAND_NAME, param=SMParam.DIRECTION
+        user_key = SMKey(channel=channel, command=self.COMMAND_NAME, param=SMParam.USER)
+        emote_key = SMKey(channel=channel, command=self.COMMAND_NAME, param=SMParam.EMOTE)
+        height_key = SMKey(channel=channel, command=self.COMMAND_NAME, param=SMParam.HEIGHT)
+        dir_key = SMKey(channel=channel, command=self.COMMAND_NAME, param=SMParam.DIRECTION)
+        state_user, state_emote, state_height, state_dir = await self._state_manager.get_states(
+            [user_key, emote_key, height_key, dir_key]
         )
         state_exists = bool(state_user) or bool(state_emote) or bool(state_height) or bool(state_dir)
+        reset_state = {user_key: None, emote_key: None, height_key: None, dir_key: None}
 
         if state_exists and (not emote or emote != state_emote):
-            await self._state_manager.del_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.USER)
-            await self._state_manager.del_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.EMOTE)
-            await self._state_manager.del_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.HEIGHT)
-            await self._state_manager.del_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.DIRECTION)
+            await self._state_manager.set_states(reset_state)
             if state_height >= 3 or state_dir == "DOWN":
                 await self.send_response(
                     chat=streamer,
@@ -117,93 +134,25 @@ class PyramidHandler(CommonMessagesHandler):
 
         if not state_exists and emote and emote_count == 1:
             # Начало пирамидки
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.USER,
-                value=user,
-            )
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.EMOTE,
-                value=emote,
-            )
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.HEIGHT,
-                value=emote_count,
-            )
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.DIRECTION,
-                value="UP",
+            await self._state_manager.set_states(
+                {user_key: user, emote_key: emote, height_key: emote_count, dir_key: "UP"}
             )
             return HandlerResult.HANDLED_AND_CONTINUE
         if emote == state_emote and (emote_count == state_height + 1) and state_dir == "UP":
             # +1 вверх
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.USER,
-                value=user,
-            )
-            # await self._state_manager.set_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.EMOTE, value=emote)
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.HEIGHT,
-                value=emote_count,
-            )
-            # await self._state_manager.set_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.DIRECTION, value="UP")
+            await self._state_manager.set_states({user_key: user, height_key: emote_count})
             return HandlerResult.HANDLED_AND_CONTINUE
         elif emote == state_emote and (emote_count == state_height - 1) and state_dir == "UP":
             # развернулись вниз
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.USER,
-                value=user,
-            )
-            # await self._state_manager.set_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.EMOTE, value=emote)
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.HEIGHT,
-                value=emote_count,
-            )
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.DIRECTION,
-                value="DOWN",
-            )
+            await self._state_manager.set_states({user_key: user, height_key: emote_count, dir_key: "DOWN"})
             return HandlerResult.HANDLED_AND_CONTINUE
         elif emote == state_emote and (emote_count == state_height - 1) and emote_count > 1 and state_dir == "DOWN":
             # -1
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.USER,
-                value=user,
-            )
-            # await self._state_manager.set_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.EMOTE, value=emote)
-            await self._state_manager.set_state(
-                channel=channel,
-                command=self.COMMAND_NAME,
-                param=SMParam.HEIGHT,
-                value=emote_count,
-            )
-            # await self._state_manager.set_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.DIRECTION, value="DOWN")
+            await self._state_manager.set_states({user_key: user, height_key: emote_count})
             return HandlerResult.HANDLED_AND_CONTINUE
         elif emote == state_emote and (emote_count == 1) and state_dir == "DOWN":
             # закончили пирамидку
-            await self._state_manager.del_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.USER)
-            await self._state_manager.del_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.EMOTE)
-            await self._state_manager.del_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.HEIGHT)
-            await self._state_manager.del_state(channel=channel, command=self.COMMAND_NAME, param=SMParam.DIRECTION)
+            await self._state_manager.set_states(reset_state)
             await self.send_response(chat=streamer, message=f"@{user} достроил пирамидку! Молодец!")
             return HandlerResult.HANDLED
 
@@ -218,12 +167,21 @@ class MessagesHandlerManager:
         db_session_factory: Callable[[], AsyncSession] | None = None,
     ):
         self.handlers: list[CommonMessagesHandler] = []
+        self._interest_re: re.Pattern[str] | None = None
         self._sm = storage
         self._send_message = send_message
         self._db_session_factory = db_session_factory
 
     def register(self, command: type[CommonMessagesHandler]):
         self.handlers.append(command(self._sm, self._send_message, self._db_session_factory))
+        patterns = [f"(?:{h.interest_pattern})" for h in self.handlers if h.interest_pattern is not None]
+        self._interest_re = re.compile("|".join(patterns)) if patterns else None
+
+    def could_match(self, message: ChatMessageWebhookEventSchema) -> bool:
+        """Может ли хоть один handler заинтересоваться сообщением (без учёта настроек стримера)."""
+        if self._interest_re is not None and self._interest_re.search(message.message.text.lower()):
+            return True
+        return any(handler.could_match(message) for handler in self.handlers)
 
     @tracer.start_as_current_span("ChatBot: Messages Handler Manager: Handle")
     async def handle(
@@ -265,16 +223,32 @@ class UnlurkHandler(CommonMessagesHandler):
     def is_enabled(self, streamer_settings: TwitchUserSettings) -> bool:
         return True or streamer_settings.enable_lurk
 
+    def could_match(self, message: ChatMessageWebhookEventSchema) -> bool:
+        # Интересны только сообщения тех, кто сейчас в лурке (по индексу в памяти).
+        # Пока индекс канала не перечитан из StateManager — пропускаем всех.
+        channel = message.broadcaster_user_login
+        return not LurkCommand.is_index_fresh(channel) or LurkCommand.is_lurking(
+            channel, message.chatter_user_login
+        )
+
     async def handle(self, streamer: User, message: ChatMessageWebhookEventSchema) -> HandlerResult:
         if any(x in message.message.text for x in ("!lurk", "!unlurk", "!лурк", "!анлурк")):
             return HandlerResult.SKIPED
 
         user = message.chatter_user_login
 
+        if not LurkCommand.is_index_fresh(streamer.login_name):
+            await LurkCommand.load_lurkers(self._state_manager, streamer.login_name)
+            if not LurkCommand.is_lurking(streamer.login_name, user):
+                return HandlerResult.SKIPED
+
         previous_state: float = await self._state_manager.get_state(
             channel=streamer.login_name, user=user, command=self.COMMAND_NAME
         )
-        if previous_state is not None and time() - previous_state > self.UNLURK_AFTER:
+        if previous_state is None:
+            LurkCommand.mark_unlurk(streamer.login_name, user)
+        elif time() - previous_state > self.UNLURK_AFTER:
+            LurkCommand.mark_unlurk(streamer.login_name, user)
             await self._state_manager.set_state(
                 channel=streamer.login_name,
                 user=user,
@@ -289,6 +263,8 @@ class UnlurkHandler(CommonMessagesHandler):
 
 
 class HelloHandler(CommonMessagesHandler):
+    interest_pattern = "привет|дарова|здравствуй|кваствуй|здорова"
+
     def is_enabled(self, streamer_settings: TwitchUserSettings) -> bool:
         return True
 
@@ -322,6 +298,9 @@ class HelloHandler(CommonMessagesHandler):
 
 
 class IAmBotHandler(CommonMessagesHandler):
+    # "бот?" ловит и упоминание, и реплай на бота (упоминание дописывает HelloHandler).
+    interest_pattern = r"бот\?|^(кто )?боты? "
+
     def is_enabled(self, streamer_settings: TwitchUserSettings) -> bool:
         return True
 
@@ -11,6 +11,8 @@ logger = logging.getLogger(__name__)
 
 
 class PantsRaffleHandler(CommonMessagesHandler):
+    interest_pattern = r"^\s*[+-]\s*$"
+
     def is_enabled(self, streamer_settings: TwitchUserSettings) -> bool:
         return streamer_settings.enable_pants
 
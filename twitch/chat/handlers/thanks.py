@@ -32,9 +32,14 @@ _THANKS_WORDS = {
 
 
 class ThanksHandler(CommonMessagesHandler):
+    interest_pattern = "@quantum075bot"
+
     def is_enabled(self, streamer_settings: TwitchUserSettings) -> bool:
         return True
 
+    def could_match(self, message: ChatMessageWebhookEventSchema) -> bool:
+        return bool(message.reply and message.reply.parent_user_name == "quantum075bot")
+
     async def handle(self, streamer: User, message: ChatMessageWebhookEventSchema) -> HandlerResult:
         text = message.message.text.lower()
         # Если сообщение адресовано боту (реплай на бота или упоминание)
@@ -23,7 +23,7 @@ from schemas.twitch import ChatMessageWebhookEventSchema
 from services.moderation import ModerationService
 from services.sse_manager import SSEManager
 from twitch.chat.handlers.handlers import CommonMessagesHandler, HandlerResult
-from twitch.state_manager import SMParam
+from twitch.state_manager import SMKey, SMParam
 from utils.chat_roles import classify_chatter
 from utils.enums import SSEChannel
 from utils.tts import clean_tts_text, clean_tts_username, get_tts_settings, truncate_tts
@@ -62,6 +62,15 @@ class TTSHandler(CommonMessagesHandler):
         # целиком, чтобы простая смена тоггла не требовала перезапуска.
         return True
 
+    def could_match(self, message: ChatMessageWebhookEventSchema) -> bool:
+        # Без подключённого TTS-оверлея handle ничего не делает (даже для "!!!"),
+        # а с ним триггер ALL делает интересным любое сообщение. Точную проверку
+        # (с Redis) делает handle; здесь — только то, что инстанс знает в памяти.
+        if message.channel_points_custom_reward_id:
+            return False
+        ssem: SSEManager = self._container.sse_manager()
+        return ssem.might_have_clients(int(message.broadcaster_user_id), SSEChannel.TTS)
+
     @tracer.start_as_current_span("ChatBot: TTS Handler")
     async def handle(self, streamer: User, message: ChatMessageWebhookEventSchema) -> HandlerResult:
         tts = get_tts_settings(streamer)
@@ -138,44 +147,27 @@ class TTSHandler(CommonMessagesHandler):
             return None
 
         now = time()
+        user_key = SMKey(
+            channel=streamer.login_name, user=message.chatter_user_id, command=_TTS_CD_COMMAND, param=SMParam.COOLDOWN
+        )
+        chan_key = SMKey(channel=streamer.login_name, command=_TTS_CD_COMMAND, param=SMParam.COOLDOWN)
+        last_user, last_chan = await self._state_manager.get_states([user_key, chan_key])
 
-        if per_user:
-            last_user = await self._state_manager.get_state(
-                channel=streamer.login_name,
-                user=message.chatter_user_id,
-                command=_TTS_CD_COMMAND,
-                param=SMParam.COOLDOWN,
-            )
-            if last_user and now - last_user < per_user:
-                remaining = int(per_user - (now - last_user))
-                logger.debug("TTS skip: per-user cooldown (%ds left)", remaining)
-                return f"@{message.chatter_user_login}, подожди {remaining} сек, прежде чем отправлять ещё TTS"
+        if per_user and last_user and now - last_user < per_user:
+            remaining = int(per_user - (now - last_user))
+            logger.debug("TTS skip: per-user cooldown (%ds left)", remaining)
+            return f"@{message.chatter_user_login}, подожди {remaining} сек, прежде чем отправлять ещё TTS"
 
-        if per_channel:
-            last_chan = await self._state_manager.get_state(
-                channel=streamer.login_name,
-                command=_TTS_CD_COMMAND,
-                param=SMParam.COOLDOWN,
-            )
-            if last_chan and now - last_chan < per_channel:
-                logger.debug("TTS skip: per-channel cooldown")
-                return ""
+        if per_channel and last_chan and now - last_chan < per_channel:
+            logger.debug("TTS skip: per-channel cooldown")
+            return ""
 
+        updates = {}
         if per_user:
-            await self._state_manager.set_state(
-                channel=streamer.login_name,
-                user=message.chatter_user_id,
-                command=_TTS_CD_COMMAND,
-                param=SMParam.COOLDOWN,
-                value=now,
-            )
+            updates[user_key] = now
         if per_channel:
-            await self._state_manager.set_state(
-                channel=streamer.login_name,
-                command=_TTS_CD_COMMAND,
-                param=SMParam.COOLDOWN,
-                value=now,
-            )
+            updates[chan_key] = now
+        await self._state_manager.set_states(updates)
         return None
 
     @property
@@ -1,12 +1,18 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from collections.abc import AsyncIterator
 from enum import StrEnum, auto
-from typing import OrderedDict
+from heapq import heapify, heappop, heappush
+from time import monotonic
+from typing import NamedTuple
 
 
 class SMParam(StrEnum):
     DEFAULT = auto()
     COOLDOWN = auto()
+    # Окно КД для try_acquire_cooldown: значение — число вызовов в текущем окне,
+    # живёт ровно ttl секунд (нативное истечение).
+    COOLDOWN_LOCK = auto()
     CALL_COUNT = auto()
     # COUNT_RECEIVED = auto()
     PREVIOUS_VALUE = auto()
@@ -34,6 +40,23 @@ COMMON_CHANNEL: CHANNEL_TYPE = "COMMON"
 COMMON_USER: USER_TYPE = -1
 COMMON_COMMAND: COMMAND_TYPE = "ALL_COMMANDS"
 
+# Сколько по умолчанию живёт значение — одинаково для всех реализаций StateManager.
+DEFAULT_STATE_TTL = 24 * 60 * 60
+
+# Полный адрес значения в InMemoryStateManager: (channel, user, command, param).
+_StorageKey = tuple[CHANNEL_TYPE, USER_TYPE, COMMAND_TYPE, str]
+# COMMON_CHANNEL в том виде, в каком он лежит в ключах InMemoryStateManager.
+_COMMON = COMMON_CHANNEL.lower()
+
+
+class SMKey(NamedTuple):
+    """Адрес одного значения в StateManager — для пакетных get_states/set_states."""
+
+    channel: CHANNEL_TYPE = COMMON_CHANNEL
+    user: USER_TYPE = COMMON_USER
+    command: COMMAND_TYPE = COMMON_COMMAND
+    param: PARAM_TYPE = PARAM_TYPE.DEFAULT
+
 
 class StateManager(ABC):
     @abstractmethod
@@ -70,6 +93,16 @@ class StateManager(ABC):
     ):
         raise NotImplementedError
 
+    @abstractmethod
+    async def get_states(self, keys: list[SMKey]) -> list[VALUE_TYPE]:
+        """Значения по списку ключей (в том же порядке) за один запрос к хранилищу."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_states(self, values: dict[SMKey, VALUE_TYPE]) -> None:
+        """Записать несколько значений за один запрос; ``None`` — удалить значение."""
+        raise NotImplementedError
+
     @abstractmethod
     async def get_all_from_channel(
         self,
@@ -78,28 +111,144 @@ class StateManager(ABC):
     ) -> AsyncIterator[tuple[USER_TYPE, COMMAND_TYPE, PARAM_TYPE, VALUE_TYPE]]:
         raise NotImplementedError
 
+    @abstractmethod
+    async def try_acquire_cooldown(
+        self,
+        ttl: float,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+        limit: int = 1,
+    ) -> bool:
+        """Атомарно занять слот КД: не больше ``limit`` вызовов за окно в ``ttl`` секунд.
+
+        Окно начинается с первого вызова. Возвращает ``False``, если лимит в текущем
+        окне уже исчерпан (команду выполнять не нужно).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def cooldown_remaining(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+    ) -> float:
+        """Сколько секунд осталось до конца окна КД (0 — КД нет)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release_cooldown(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+    ) -> None:
+        """Снять КД досрочно (например, если команда в итоге не выполнилась)."""
+        raise NotImplementedError
+
     @abstractmethod
     async def cleanup(self):
         raise NotImplementedError
 
 
 class InMemoryStateManager(StateManager):
+    """StateManager без Redis: всё в памяти процесса.
+
+    Память ограничена: каналов не больше ``channels_size``, пользователей в канале —
+    не больше ``users_size`` (вытесняются давно не использованные, LRU). Общий канал
+    ``COMMON_CHANNEL`` (результаты ``SavingResultCommand`` по всем пользователям сразу)
+    не вытесняется и ограничен отдельно — ``common_users_size``. Каждое
+    значение живёт ``default_ttl`` секунд, как и в ``RedisStateManager``. Истечения
+    лежат в min-куче, поэтому запись — O(log n), а не обход всего хранилища.
+    """
+
+    def __init__(
+        self,
+        channels_size: int = 30,
+        users_size: int = 100,
+        default_ttl: int = DEFAULT_STATE_TTL,
+        common_users_size: int = 10_000,
+    ):
+        self.channels_size = channels_size
+        self.users_size = users_size
+        self.common_users_size = common_users_size
+        self._default_ttl = default_ttl
+        self._storage: OrderedDict[
+            CHANNEL_TYPE,
+            OrderedDict[
+                USER_TYPE,
+                dict[COMMAND_TYPE, dict[PARAM_TYPE, VALUE_TYPE]],
+            ],
+        ] = OrderedDict()
+        # (channel, user, command, param) -> момент истечения по monotonic.
+        self._expires: dict[_StorageKey, float] = {}
+        # Куча (момент истечения, порядковый номер, ключ). Записи, которые уже
+        # перезаписаны/удалены/вытеснены, не чистим сразу — пропускаем при выемке
+        # (сверяя с ``_expires``) и перестраиваем кучу, когда их становится много.
+        self._heap: list[tuple[float, int, _StorageKey]] = []
+        self._seq = 0
+        # (channel, command, user) -> (момент конца окна по monotonic, число вызовов)
+        self._cooldowns: dict[tuple[CHANNEL_TYPE, COMMAND_TYPE, USER_TYPE], tuple[float, int]] = {}
+
+    @staticmethod
+    def _key(channel: str, user: int, command: str, param: PARAM_TYPE) -> _StorageKey:
+        if isinstance(user, str):
+            user = user.lower()
+        return channel.lower(), user, command.lower(), param.lower()
+
+    def _remove(self, key: _StorageKey) -> None:
+        """Удалить значение и опустевшие уровни над ним."""
+        channel, user, command, param = key
+        self._expires.pop(key, None)
+        users = self._storage.get(channel)
+        if users is None or user not in users or command not in users[user]:
+            return
+        params = users[user][command]
+        params.pop(param, None)
+        if not params:
+            del users[user][command]
+            if not users[user]:
+                del users[user]
+                if not users:
+                    del self._storage[channel]
+
+    def _forget_user(self, channel: CHANNEL_TYPE, user: USER_TYPE, commands: dict) -> None:
+        for command, params in commands.items():
+            for param in params:
+                self._expires.pop((channel, user, command, param), None)
+
+    def _expire(self) -> None:
+        now = monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, _, key = heappop(self._heap)
+            if self._expires.get(key) == expires_at:
+                self._remove(key)
+        if len(self._heap) > 2 * len(self._expires) + 1024:
+            self._heap = [item for item in self._heap if self._expires.get(item[2]) == item[0]]
+            heapify(self._heap)
+
     async def get_all_from_channel(
         self,
         *,
         channel: str = COMMON_CHANNEL,
     ) -> AsyncIterator[tuple[USER_TYPE, COMMAND_TYPE, PARAM_TYPE, VALUE_TYPE]]:
+        self._expire()
+        channel = channel.lower()
         if channel not in self._storage:
             return
-        for user in self._storage[channel]:
-            for command in self._storage[channel][user]:
-                for param in self._storage[channel][user][command]:
-                    yield (
-                        user,
-                        command,
-                        param,
-                        self._storage[channel][user][command][param],
-                    )
+        # Снимок: вызывающий код может писать в хранилище между итерациями.
+        items = [
+            (user, command, param, value)
+            for user, commands in self._storage[channel].items()
+            for command, params in commands.items()
+            for param, value in params.items()
+        ]
+        for item in items:
+            yield item
 
     async def del_state(
         self,
@@ -113,23 +262,6 @@ class InMemoryStateManager(StateManager):
             value=None, channel=channel, user=user, command=command, param=param
         )
 
-    def __init__(self, channels_size: int = 30, users_size: int = 100):
-        self.channels_size = channels_size
-        self.users_size = users_size
-        self._storage: OrderedDict[
-            CHANNEL_TYPE,
-            OrderedDict[
-                USER_TYPE,
-                OrderedDict[COMMAND_TYPE, OrderedDict[PARAM_TYPE, VALUE_TYPE]],
-            ],
-        ] = OrderedDict[
-            CHANNEL_TYPE,
-            OrderedDict[
-                USER_TYPE,
-                OrderedDict[COMMAND_TYPE, OrderedDict[PARAM_TYPE, VALUE_TYPE]],
-            ],
-        ]()
-
     async def get_state(
         self,
         *,
@@ -138,17 +270,17 @@ class InMemoryStateManager(StateManager):
         command: str = COMMON_COMMAND,
         param: PARAM_TYPE = PARAM_TYPE.DEFAULT,
     ) -> VALUE_TYPE:
-        channel = channel.lower()
-        command = command.lower()
-        param = param.lower()
-        if isinstance(user, str):
-            user = user.lower()
-        if channel in self._storage:
-            if user in self._storage[channel]:
-                if command in self._storage[channel][user]:
-                    if param in self._storage[channel][user][command]:
-                        return self._storage[channel][user][command][param]
-        return None
+        key = self._key(channel, user, command, param)
+        expires_at = self._expires.get(key)
+        if expires_at is None:
+            return None
+        if expires_at <= monotonic():
+            self._remove(key)
+            return None
+        channel, user, command, param = key
+        self._storage.move_to_end(channel)
+        self._storage[channel].move_to_end(user)
+        return self._storage[channel][user][command][param]
 
     async def set_state(
         self,
@@ -159,30 +291,88 @@ class InMemoryStateManager(StateManager):
         command: str = COMMON_COMMAND,
         param: PARAM_TYPE = PARAM_TYPE.DEFAULT,
     ):
-        channel = channel.lower()
-        command = command.lower()
-        param = param.lower()
-        if isinstance(user, str):
-            user = user.lower()
-        if channel not in self._storage:
-            self._storage[channel] = OrderedDict[
-                int, OrderedDict[str, OrderedDict[SMParam, VALUE_TYPE]]
-            ]()
-        if user not in self._storage[channel]:
-            self._storage[channel][user] = OrderedDict[
-                str, OrderedDict[SMParam, VALUE_TYPE]
-            ]()
-        if command not in self._storage[channel][user]:
-            self._storage[channel][user][command] = OrderedDict[SMParam, VALUE_TYPE]()
-        if value is None and param in self._storage[channel][user][command]:
-            del self._storage[channel][user][command][param]
+        key = self._key(channel, user, command, param)
+        if value is None:
+            self._remove(key)
         else:
-            self._storage[channel][user][command][param] = value
+            channel, user, command, param = key
+            users = self._storage.get(channel)
+            if users is None:
+                users = self._storage[channel] = OrderedDict()
+                if len(self._storage) - (_COMMON in self._storage) > self.channels_size:
+                    old_channel = next(name for name in self._storage if name != _COMMON)
+                    for old_user, commands in self._storage.pop(old_channel).items():
+                        self._forget_user(old_channel, old_user, commands)
+            else:
+                self._storage.move_to_end(channel)
+            if user not in users:
+                users[user] = {}
+                if len(users) > (self.common_users_size if channel == _COMMON else self.users_size):
+                    old_user, commands = users.popitem(last=False)
+                    self._forget_user(channel, old_user, commands)
+            else:
+                users.move_to_end(user)
+            users[user].setdefault(command, {})[param] = value
+            expires_at = monotonic() + self._default_ttl
+            self._expires[key] = expires_at
+            self._seq += 1
+            heappush(self._heap, (expires_at, self._seq, key))
         await self.cleanup()
 
+    async def get_states(self, keys: list[SMKey]) -> list[VALUE_TYPE]:
+        return [await self.get_state(**key._asdict()) for key in keys]
+
+    async def set_states(self, values: dict[SMKey, VALUE_TYPE]) -> None:
+        for key, value in values.items():
+            await self.set_state(value, **key._asdict())
+
+    @staticmethod
+    def _cooldown_key(channel: str, user: int, command: str) -> tuple[CHANNEL_TYPE, COMMAND_TYPE, USER_TYPE]:
+        if isinstance(user, str):
+            user = user.lower()
+        return channel.lower(), command.lower(), user
+
+    async def try_acquire_cooldown(
+        self,
+        ttl: float,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+        limit: int = 1,
+    ) -> bool:
+        key = self._cooldown_key(channel, user, command)
+        now = monotonic()
+        expires_at, calls = self._cooldowns.get(key, (0.0, 0))
+        if expires_at <= now:
+            # Окно истекло (или его не было) — заодно выметаем остальные протухшие.
+            if len(self._cooldowns) > self.channels_size * self.users_size:
+                self._cooldowns = {k: v for k, v in self._cooldowns.items() if v[0] > now}
+            self._cooldowns[key] = (now + ttl, 1)
+            return True
+        if calls >= limit:
+            return False
+        self._cooldowns[key] = (expires_at, calls + 1)
+        return True
+
+    async def cooldown_remaining(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+    ) -> float:
+        expires_at, _ = self._cooldowns.get(self._cooldown_key(channel, user, command), (0.0, 0))
+        return max(expires_at - monotonic(), 0.0)
+
+    async def release_cooldown(
+        self,
+        *,
+        channel: str = COMMON_CHANNEL,
+        user: int = COMMON_USER,
+        command: str = COMMON_COMMAND,
+    ) -> None:
+        self._cooldowns.pop(self._cooldown_key(channel, user, command), None)
+
     async def cleanup(self):
-        for channel, users_dict in self._storage.items():
-            for user, commands_dict in users_dict.items():
-                for command, param_dict in commands_dict.items():
-                    for param, value in param_dict.items():
-                        pass  # TODO: придумать чота
+        self._expire()
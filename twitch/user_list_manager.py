@@ -1,5 +1,7 @@
+import asyncio
 import logging
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
 from time import time
 
 from opentelemetry import trace
@@ -11,76 +13,109 @@ tracer = trace.get_tracer(__name__)
 
 
 class UserListManager:
-    def __init__(self, max_users_per_channel: int = 300, forget_timeout: float = 3600):
-        self._last_messages: dict[str, list[tuple[str, float]]] = defaultdict(
-            list
-        )  # TODO: replace with Queue or Deque?
-        self._last_cleanup: float = time()
+    def __init__(self, max_users_per_channel: int = 300, forget_timeout: float = 3600, cleanup_interval: float = 300):
+        # channel -> {login в нижнем регистре: (имя как в чате, время последнего сообщения)}.
+        # Порядок — от давно писавших к недавним: touch = move_to_end, O(1).
+        self._last_messages: dict[str, OrderedDict[str, tuple[str, float]]] = defaultdict(OrderedDict)
         self._forget_timeout: float = forget_timeout
         self._max_users_per_channel: int = max_users_per_channel
+        # Ленивая очистка в ``handle`` трогает только канал, куда пришло сообщение, —
+        # замолчавшие каналы подчищает периодический ``cleanup``.
+        self._cleanup_interval: float = cleanup_interval
+
+    async def startup(self, redis) -> None:
+        """Для совместимости с ``RedisUserListManager``: in-memory версии Redis не нужен."""
+
+    async def _sweeper(self) -> None:
+        while True:
+            await asyncio.sleep(self._cleanup_interval)
+            try:
+                self.cleanup()
+            except Exception:
+                logger.error("Active chatters cleanup failed", exc_info=True)
+
+    @asynccontextmanager
+    async def lifespan(self):
+        sweeper = asyncio.create_task(self._sweeper())
+        try:
+            yield
+        finally:
+            sweeper.cancel()
+            await asyncio.gather(sweeper, return_exceptions=True)
+
+    def _cleanup_channel(self, q: OrderedDict[str, tuple[str, float]], dt: float) -> None:
+        # Самые старые — в начале, поэтому останавливаемся на первом свежем.
+        while q:
+            _, (_, last_active) = next(iter(q.items()))
+            if dt - last_active <= self._forget_timeout:
+                break
+            q.popitem(last=False)
 
     def cleanup(self) -> None:
-        q: list[tuple[str, float]]
         dt = time()
-        for q in self._last_messages.values():
-            while len(q):
-                if dt - q[0][1] > self._forget_timeout:
-                    del q[0]
-                else:
-                    break
-        self._last_cleanup = dt
+        for channel, q in list(self._last_messages.items()):
+            self._cleanup_channel(q, dt)
+            if not q:
+                del self._last_messages[channel]
 
     @tracer.start_as_current_span("ChatBot: Handle User List")
     async def handle(self, channel: str, message: ChatMessageWebhookEventSchema):
-        user = message.chatter_user_name
         dt = time()
         q = self._last_messages[channel.lower()]
+        # Ключ — login: по нему ищут is_user_active/get_last_active (и Redis-бэкенд),
+        # а имя как в чате (может быть кириллицей) лежит в значении.
+        key = message.chatter_user_login.lower()
 
-        # Очищаем, если пора
-        if dt - self._last_cleanup > 60:
-            self.cleanup()
-
-        # Обновляем время и переносим в начало, если нашли
-        for i, item in enumerate(q):
-            if item[0] == user:
-                del q[i]
-                q.append((user, dt))
-                self._last_messages[channel.lower()] = q
-                return
+        # Обновляем время и переносим в конец (самые свежие)
+        if key in q:
+            q.move_to_end(key)
+        q[key] = (message.chatter_user_name, dt)
 
-        # Раз не нашли: просто добавляем в начало
-        q.append((user, dt))
-
-        # Если вышли за максимальный размер - удаляем первый элемент
+        # Если вышли за максимальный размер - удаляем самого давнего
         if len(q) > self._max_users_per_channel:
-            del q[0]
+            q.popitem(last=False)
 
-        self._last_messages[channel.lower()] = q
+        # Очистка ленивая и только по своему каналу
+        self._cleanup_channel(q, dt)
 
     def is_user_active(
         self, channel: str, user: str, timeout: float | None = None
     ) -> bool:
-        for item in self._last_messages[channel.lower()]:
-            if item[0].lower() == user.lower():
-                return timeout is None or time() - item[1] < timeout
-        return False
+        item = self._last_messages.get(channel.lower(), {}).get(user.lower())
+        if item is None:
+            return False
+        return timeout is None or time() - item[1] < timeout
 
     def get_last_active(
         self, channel: str, user: str, timeout: float | None = None
     ) -> float | None:
-        for item in self._last_messages[channel.lower()]:
-            if item[0].lower() == user.lower():
-                if timeout is not None and time() - item[1] > timeout:
-                    return None
-                return item[1]
-        return False
+        item = self._last_messages.get(channel.lower(), {}).get(user.lower())
+        if item is None:
+            return False
+        if timeout is not None and time() - item[1] > timeout:
+            return None
+        return item[1]
 
     def get_active_users(
         self, channel: str, timeout: float | None = None
     ) -> list[tuple[str, float]]:
+        q = self._last_messages.get(channel.lower())
+        if not q:
+            return []
+        dt = time()
         result = []
-        for item in self._last_messages[channel.lower()][::-1]:
-            if timeout is not None and time() - item[1] > timeout:
+        # От свежих к старым; на первом протухшем дальше можно не смотреть.
+        for name, last_active in reversed(q.values()):
+            if timeout is not None and dt - last_active > timeout:
                 break
-            result.append((item[0], item[1]))
+            result.append((name, last_active))
         return result
+
+    # Асинхронный интерфейс для ChatBot/команд: реализации с общим хранилищем
+    # (``RedisUserListManager``) переопределяют именно его.
+
+    async def active_users(self, channel: str, timeout: float | None = None) -> list[tuple[str, float]]:
+        return self.get_active_users(channel, timeout)
+
+    async def last_active(self, channel: str, user: str, timeout: float | None = None) -> float | None:
+        return self.get_last_active(channel, user, timeout)
@@ -11,7 +11,7 @@ async def extract_targets(
     streamer_name: str,
     self_name: str,
     func_get_random_user: Callable[..., Awaitable[str]],
-    func_get_active_users: Callable[..., list[tuple[str, float]]],
+    func_get_active_users: Callable[..., Awaitable[list[tuple[str, float]]]],
 ) -> list[str]:
     # m = re.match("!\\w+ @.*[ $]", text)
     # if m:
@@ -64,7 +64,7 @@ async def extract_targets(
             o = "@" + await func_get_random_user()
             logger.debug(f"`o` replaces to `{o}`")
         if o in all_users:
-            all_users = func_get_active_users(timeout=30*60)  # берём последних за пол часа
+            all_users = await func_get_active_users(timeout=30*60)  # берём последних за пол часа
             if len(all_users) < 7:
                 result.extend("@" + usr[0] for usr in all_users)
                 continue
@@ -7,6 +7,17 @@ class UserRole(StrEnum):
     OWNER = "owner"
 
 
+class SSEOverflowPolicy(StrEnum):
+    """Что делать, когда очередь SSE-подключения переполнена (клиент не успевает читать)."""
+
+    # Выкинуть самое старое сообщение (поток событий, где важны свежие).
+    DROP_OLDEST = "drop-oldest"
+    # Выкинуть всё накопленное, оставить только новое (важно последнее состояние).
+    COALESCE_LATEST = "coalesce-latest"
+    # Закрыть подключение: каждое сообщение важно, пусть клиент переподключится.
+    DISCONNECT = "disconnect"
+
+
 class SSEChannel(StrEnum):
     AI_STICKER = "ai-sticker"
     MESSAGE = "msg"